@@ -0,0 +1,280 @@
+"""
+Batched DCA tick execution.
+
+Cron triggers for individual DCA jobs only mark the job as due. Every
+``TICK_WINDOW_SECONDS`` the engine drains the due set, expands each job's
+basket into legs and groups the legs by route
+``(src_chain, dst_chain, token_in, token_out)``. Each route is quoted once for
+the combined input amount and the quoted output is split back across jobs
+pro rata, so Relay calls per tick scale with distinct routes, not jobs.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.metrics import log_event
+from app.db.db import db, mongo_available, redis_available, redis_client
+from app.medusa_core.relay import get_quote as relay_get_quote, summarize_quote
+from app.medusa_core.token_map import resolve_token_addresses_async
+from app.schedulers.cluster import add_distributed_job
+from app.schedulers.scheduler import rehydrate_on_startup
+
+logger = logging.getLogger(__name__)
+
+DUE_KEY = "dca:due"
+TICK_JOB_ID = "dca_engine_tick"
+TICK_WINDOW_SECONDS = int(os.getenv("DCA_TICK_WINDOW_SECONDS", "10"))
+QUOTE_CONCURRENCY = int(os.getenv("DCA_QUOTE_CONCURRENCY", "8"))
+EXECUTION_CONCURRENCY = int(os.getenv("DCA_EXECUTION_CONCURRENCY", "16"))
+
+DEFAULT_TOKEN_IN = "USDC"
+# Decimals for common funding tokens; anything else defaults to 18
+TOKEN_DECIMALS = {"USDC": 6, "USDT": 6}
+
+Route = Tuple[int, int, str, str]
+
+# Fallback due set while Redis is unreachable (this process only)
+_local_due: set[str] = set()
+_local_due_lock = threading.Lock()
+
+
+def enqueue_due_job(job_id: str) -> None:
+    """Cron callback for a DCA job: mark it due for the next engine tick."""
+    if redis_available():
+        try:
+            redis_client.sadd(DUE_KEY, job_id)
+            return
+        except Exception as exc:
+            logger.error("Failed to mark DCA job %s due: %s", job_id, exc)
+    with _local_due_lock:
+        _local_due.add(job_id)
+
+
+def _drain_due() -> List[str]:
+    ids: List[str] = []
+    if redis_available():
+        try:
+            pipe = redis_client.pipeline()
+            pipe.smembers(DUE_KEY)
+            pipe.delete(DUE_KEY)
+            members, _ = pipe.execute()
+            ids = [m.decode() if isinstance(m, bytes) else str(m) for m in members]
+        except Exception as exc:
+            logger.error("Failed to drain due DCA jobs: %s", exc)
+    with _local_due_lock:
+        ids.extend(_local_due)
+        _local_due.clear()
+    return ids
+
+
+def due_count() -> int:
+    """Number of DCA jobs waiting for the next engine tick."""
+    count = 0
+    if redis_available():
+        try:
+            count = int(redis_client.scard(DUE_KEY))
+        except Exception as exc:
+            logger.error("Failed to read due DCA job count: %s", exc)
+    with _local_due_lock:
+        return count + len(_local_due)
+
+
+def _to_object_ids(ids: Iterable[Any]) -> List[Any]:
+    out = []
+    for i in ids:
+        if isinstance(i, ObjectId):
+            out.append(i)
+            continue
+        try:
+            out.append(ObjectId(i))
+        except Exception:
+            out.append(i)
+    return out
+
+
+def _to_base_units(amount: float, symbol: str) -> int:
+    decimals = TOKEN_DECIMALS.get(symbol.upper(), 18)
+    return int(Decimal(str(amount)) * (Decimal(10) ** decimals))
+
+
+def build_legs(
+    jobs: List[Dict[str, Any]], baskets: Dict[Any, Dict[str, Any]]
+) -> Dict[Route, List[Tuple[str, int]]]:
+    """Group each job's basket coins by route as ``(job_id, amount_in)`` legs."""
+    legs: Dict[Route, List[Tuple[str, int]]] = defaultdict(list)
+    for job in jobs:
+        basket = baskets.get(job.get("basket_id"))
+        if not basket:
+            continue
+        try:
+            src_chain = int(job.get("src_chain"))
+            dst_chain = int(job.get("dst_chain", src_chain))
+        except (TypeError, ValueError):
+            continue
+        token_in = job.get("token_in") or DEFAULT_TOKEN_IN
+        budget = float(job.get("budget_per_tick", 0))
+        for coin in basket.get("coins", []):
+            amount = _to_base_units(budget * float(coin.get("weight", 0)) / 100.0, token_in)
+            if amount <= 0 or not coin.get("symbol"):
+                continue
+            route = (src_chain, dst_chain, token_in.upper(), coin["symbol"].upper())
+            legs[route].append((str(job["_id"]), amount))
+    return legs
+
+
+class DcaEngine:
+    """Quote each route once per tick and fan the result out to jobs."""
+
+    def __init__(
+        self,
+        quote_fn: Callable[[Dict[str, Any]], Dict[str, Any] | None] = relay_get_quote,
+        quote_concurrency: int = QUOTE_CONCURRENCY,
+        execution_concurrency: int = EXECUTION_CONCURRENCY,
+    ):
+        self.quote_fn = quote_fn
+        self.quote_concurrency = quote_concurrency
+        self.execution_concurrency = execution_concurrency
+
+    def _load(self, job_ids: List[str]) -> Tuple[List[Dict[str, Any]], Dict[Any, Dict[str, Any]]]:
+        jobs = list(db.dca_jobs.find({"_id": {"$in": _to_object_ids(job_ids)}, "status": "active"}))
+        basket_ids = {job.get("basket_id") for job in jobs if job.get("basket_id") is not None}
+        baskets = {
+            b["_id"]: b
+            for b in db.baskets.find({"_id": {"$in": _to_object_ids(basket_ids)}}, {"coins": 1})
+        }
+        # Jobs may reference baskets by string id
+        baskets.update({str(k): v for k, v in baskets.items()})
+        return jobs, baskets
+
+    async def _quote_route(
+        self,
+        sem: asyncio.Semaphore,
+        route: Route,
+        tokens: Tuple[str, str],
+        legs: List[Tuple[str, int]],
+        user: str,
+    ) -> Dict[str, Any] | None:
+        src_chain, dst_chain, _, _ = route
+        params = {
+            "originChainId": src_chain,
+            "destinationChainId": dst_chain,
+            "inputToken": tokens[0],
+            "outputToken": tokens[1],
+            "inputAmount": str(sum(amount for _, amount in legs)),
+            "user": user,
+            "receiver": user,
+            "tradeType": "EXACT_INPUT",
+        }
+        async with sem:
+            try:
+                quote = await asyncio.to_thread(self.quote_fn, params)
+            except Exception as exc:
+                logger.error("DCA quote failed for route %s: %s", route, exc)
+                return None
+        return summarize_quote(quote)
+
+    def _execute_job(self, job: Dict[str, Any], fills: List[Dict[str, Any]], latency: float) -> None:
+        """Record the job's share of this tick; override to submit transactions."""
+        success = bool(fills) and all(f.get("quoted") for f in fills)
+        log_event({
+            "type": "dca_tick",
+            "job_id": str(job["_id"]),
+            "latency": latency,
+            "success": success,
+            "fills": fills,
+        })
+
+    async def run(self, job_ids: List[str]) -> Dict[str, Any]:
+        started = time.monotonic()
+        if not job_ids or not mongo_available():
+            return {"jobs": 0, "routes": 0}
+        jobs, baskets = await asyncio.to_thread(self._load, job_ids)
+        legs = build_legs(jobs, baskets)
+        jobs_by_id = {str(job["_id"]): job for job in jobs}
+
+        quote_sem = asyncio.Semaphore(self.quote_concurrency)
+        routes = list(legs.keys())
+        # One lookup for every route's symbols, with at most one token map refresh
+        resolved = iter(await resolve_token_addresses_async([
+            pair for src, dst, token_in, token_out in routes for pair in ((src, token_in), (dst, token_out))
+        ]))
+        quotes = await asyncio.gather(*(
+            self._quote_route(
+                quote_sem,
+                route,
+                (next(resolved), next(resolved)),
+                legs[route],
+                jobs_by_id[legs[route][0][0]].get("user", ""),
+            )
+            for route in routes
+        ))
+
+        fills: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for route, quote in zip(routes, quotes):
+            total_in = sum(amount for _, amount in legs[route])
+            total_out = None
+            if quote and quote.get("outputAmount") is not None:
+                try:
+                    total_out = int(quote["outputAmount"])
+                except (TypeError, ValueError):
+                    total_out = None
+            for job_id, amount in legs[route]:
+                fill = {
+                    "src_chain": route[0],
+                    "dst_chain": route[1],
+                    "token_in": route[2],
+                    "token_out": route[3],
+                    "amount_in": str(amount),
+                    "quoted": total_out is not None,
+                }
+                if total_out is not None:
+                    fill["amount_out"] = str(total_out * amount // total_in)
+                fills[job_id].append(fill)
+
+        latency = time.monotonic() - started
+        exec_sem = asyncio.Semaphore(self.execution_concurrency)
+
+        async def execute(job):
+            async with exec_sem:
+                await asyncio.to_thread(self._execute_job, job, fills.get(str(job["_id"]), []), latency)
+
+        await asyncio.gather(*(execute(job) for job in jobs))
+
+        now = datetime.utcnow()
+        ops = [UpdateOne({"_id": job["_id"]}, {"$set": {"last_run": now}}) for job in jobs]
+        if ops:
+            await asyncio.to_thread(db.dca_jobs.bulk_write, ops, ordered=False)
+
+        summary = {"jobs": len(jobs), "routes": len(routes), "latency": time.monotonic() - started}
+        logger.info("DCA tick processed %(jobs)d jobs over %(routes)d routes", summary)
+        return summary
+
+
+engine = DcaEngine()
+
+
+def run_tick() -> Dict[str, Any]:
+    """Scheduler entry point: process every DCA job that became due."""
+    return asyncio.run(engine.run(_drain_due()))
+
+
+def start_dca_engine() -> None:
+    """Schedule the engine tick and make sure every active DCA job is registered."""
+    add_distributed_job(
+        run_tick,
+        "interval",
+        TICK_JOB_ID,
+        once_ms=TICK_WINDOW_SECONDS * 1000 - 500,
+        seconds=TICK_WINDOW_SECONDS,
+    )
+    rehydrate_on_startup(enqueue_due_job)
@@ -0,0 +1,116 @@
+"""
+Background health prober.
+
+Load balancers poll ``/health`` every second or so. Probing Relay and pinging
+the databases on every hit would put constant traffic on them, and a slow
+upstream would stall each request. Instead one asyncio task probes each
+dependency every ``HEALTH_PROBE_INTERVAL_SECONDS``. Handlers read the cached
+results, which carry their age so stale data is visible.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from app.db.db import async_db, connection_state, redis_client
+from app.medusa_core.http import request_json
+from app.medusa_core.relay import RELAY_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+# Results older than this many intervals are reported as stale
+STALE_AFTER_INTERVALS = 3
+
+Probe = Callable[[], Awaitable[Any]]
+
+
+async def ping_mongo() -> None:
+    await async_db.command("ping")
+
+
+async def ping_redis() -> None:
+    await asyncio.to_thread(redis_client.ping)
+
+
+async def probe_relay() -> None:
+    status, _, _ = await request_json(
+        "GET", f"{RELAY_BASE_URL}/health", timeout=HEALTH_CHECK_TIMEOUT_SECONDS
+    )
+    if status >= 400:
+        raise RuntimeError(f"relay health returned HTTP {status}")
+
+
+async def run_check(probe: Probe, timeout: float = HEALTH_CHECK_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Run ``probe`` with a timeout and describe the outcome."""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(probe(), timeout)
+        result: Dict[str, Any] = {"status": "ok"}
+    except asyncio.TimeoutError:
+        result = {"status": "error", "error": f"timed out after {timeout}s"}
+    except Exception as exc:
+        result = {"status": "error", "error": str(exc)}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+class HealthProber:
+    """Probe dependencies on an interval and cache the latest results."""
+
+    def __init__(self, probes: Dict[str, Probe], interval: float = HEALTH_PROBE_INTERVAL_SECONDS):
+        self.probes = probes
+        self.interval = interval
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self, name: str) -> None:
+        outcome = await run_check(self.probes[name])
+        if outcome["status"] != "ok" and self.results.get(name, {}).get("status") == "ok":
+            logger.warning("Health probe %s failed: %s", name, outcome.get("error"))
+        self.results[name] = {**outcome, "checked_at": time.time()}
+        if name in connection_state:
+            connection_state[name] = outcome["status"] == "ok"
+
+    async def probe_all(self) -> Dict[str, Dict[str, Any]]:
+        # Each result is published as soon as its probe finishes
+        await asyncio.gather(*(self._probe(name) for name in self.probes))
+        return self.results
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Health probe round failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """Return the cached result for ``name`` with its age."""
+        result = self.results.get(name)
+        if result is None:
+            return {"status": "unknown", "error": "not probed yet"}
+        age = time.time() - result["checked_at"]
+        cached = {**result, "age_seconds": round(age, 1)}
+        if age > self.interval * STALE_AFTER_INTERVALS:
+            cached.update({"status": "error", "error": "probe result is stale"})
+        return cached
+
+
+prober = HealthProber({"relay": probe_relay, "mongo": ping_mongo, "redis": ping_redis})
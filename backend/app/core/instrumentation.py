@@ -0,0 +1,209 @@
+"""
+Prometheus instrumentation.
+
+Metric objects live here so every module records into the same registry.
+Use :func:`timed` on upstream calls and repository methods, and
+:class:`PrometheusMiddleware` for per-route request latency. Gauges that
+read Redis or Mongo (queue depths) are computed only when ``/metrics/prometheus``
+is scraped, so request handling does not pay for them.
+"""
+
+import functools
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Upstream calls sit between a few ms and the 10s client timeout
+UPSTREAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "medusa_http_request_seconds", "API request latency", ["method", "route", "status"]
+)
+RELAY_REQUEST_SECONDS = Histogram(
+    "medusa_relay_request_seconds", "Relay API latency", ["operation", "status"],
+    buckets=UPSTREAM_BUCKETS,
+)
+RPC_REQUEST_SECONDS = Histogram(
+    "medusa_rpc_request_seconds", "JSON-RPC latency", ["chain_id", "method", "status"],
+    buckets=UPSTREAM_BUCKETS,
+)
+ALCHEMY_REQUEST_SECONDS = Histogram(
+    "medusa_alchemy_request_seconds", "Alchemy balance latency", ["chain_id", "status"],
+    buckets=UPSTREAM_BUCKETS,
+)
+PRICE_REQUEST_SECONDS = Histogram(
+    "medusa_price_request_seconds", "Token price batch latency", ["source", "status"],
+    buckets=UPSTREAM_BUCKETS,
+)
+PROVIDER_QUOTE_SECONDS = Histogram(
+    "medusa_provider_quote_seconds", "Quote latency per provider", ["provider", "status"],
+    buckets=UPSTREAM_BUCKETS,
+)
+MONGO_OPERATION_SECONDS = Histogram(
+    "medusa_mongo_operation_seconds", "Mongo operation latency", ["collection", "operation"],
+    buckets=MONGO_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "medusa_cache_requests", "Cache lookups by outcome", ["cache", "result"]
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "medusa_websocket_connections", "Open WebSocket connections", ["endpoint"]
+)
+
+
+def _ok_unless_none(result: Any) -> str:
+    return "error" if result is None else "ok"
+
+
+def timed(
+    histogram: Histogram,
+    labels: Callable[..., Dict[str, Any]] | Dict[str, Any] | None = None,
+    status: Callable[[Any], str] | None = None,
+) -> Callable:
+    """Record the duration of a sync or async function in ``histogram``.
+
+    ``labels`` is a fixed mapping or a callable receiving the function's
+    arguments. When the histogram has a ``status`` label it is set from
+    ``status(result)`` (default: ``"error"`` for ``None``), or ``"error"``
+    if the call raises.
+    """
+    with_status = "status" in histogram._labelnames
+    status = status or _ok_unless_none
+
+    def label_values(args: tuple, kwargs: dict) -> Dict[str, Any]:
+        if labels is None:
+            return {}
+        return labels(*args, **kwargs) if callable(labels) else labels
+
+    def record(start: float, values: Dict[str, Any], outcome: str | None) -> None:
+        if with_status:
+            values = {**values, "status": outcome}
+        histogram.labels(**values).observe(time.perf_counter() - start)
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                values = label_values(args, kwargs)
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    record(start, values, "error")
+                    raise
+                record(start, values, status(result))
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            values = label_values(args, kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(start, values, "error")
+                raise
+            record(start, values, status(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def mongo_span_attributes(collection: str, operation: str) -> Dict[str, Any]:
+    return {"db.system": "mongodb", "db.collection.name": collection, "db.operation.name": operation}
+
+
+def mongo_timed(collection: str, operation: str) -> Callable:
+    """Record a Mongo operation in the latency histogram and as a trace span."""
+    metric = timed(MONGO_OPERATION_SECONDS, {"collection": collection, "operation": operation})
+    span = traced(f"mongo.{operation}", mongo_span_attributes(collection, operation), kind="client")
+    return lambda func: metric(span(func))
+
+
+def cache_result(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency by route template.
+
+    Labels use the matched route path (``/swap/{swap_id}``), not the raw URL,
+    to keep cardinality bounded. Unmatched paths are grouped as ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
+
+
+class _QueueDepthCollector:
+    """Read scheduler and dispatch queue depths at scrape time."""
+
+    def _family(self) -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            "medusa_scheduler_queue_depth", "Scheduler queue depth", labels=["queue"]
+        )
+
+    def describe(self) -> Iterable[GaugeMetricFamily]:
+        # Lets the registry check names without reading Redis at import time
+        yield self._family()
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        from app.core.dca_engine import due_count
+        from app.schedulers.cluster import cluster
+        from app.schedulers.dispatch import dispatcher
+
+        family = self._family()
+        try:
+            depth = dispatcher.queue_depth()
+            family.add_metric(["worker"], cluster.queue_depth())
+            family.add_metric(["dispatch_pending"], depth["pending"])
+            family.add_metric(["dispatch_due"], depth["due"])
+            family.add_metric(["dca_due"], due_count())
+        except Exception as exc:
+            logger.error("Failed to collect queue depths: %s", exc)
+        yield family
+
+
+REGISTRY.register(_QueueDepthCollector())
+
+
+def render_latest() -> bytes:
+    return generate_latest(REGISTRY)
+
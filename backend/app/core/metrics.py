@@ -1,31 +1,54 @@
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
+
+from app.db.db import async_db, db, local_scheduler, mongo_available, redis_available, redis_client
+from app.medusa_core.prices import price_service
+from app.medusa_core.token_map import TOKEN_MAP, resolve_token_addresses_async
+from app.repositories.async_repositories import AsyncBasketRepository, AsyncDcaJobRepository
+
+logger = logging.getLogger(__name__)
 
-from app.db.db import db, scheduler
-from app.medusa_core.token_map import TOKEN_MAP
 
 def log_event(event: Dict[str, Any]) -> None:
-    if db is None:
+    if not mongo_available():
         return
-    db.events.insert_one({
+    result = db.events.insert_one({
         **event,
         "timestamp": datetime.utcnow()
     })
-
-logger = logging.getLogger(__name__)
+    # Wake long-polling ``/events`` readers
+    if redis_available() and event.get("type"):
+        try:
+            redis_client.publish(f"events:{event['type']}", str(result.inserted_id))
+        except Exception as exc:
+            logger.error("Redis publish failed: %s", exc)
 
 metrics_cache: Dict[str, Any] = {}
 
+dca_jobs_repo = AsyncDcaJobRepository(async_db)
+baskets_repo = AsyncBasketRepository(async_db)
 
-def compute_tvl(token_map: Dict[int, Dict[str, str]]) -> float:
-    """Compute total value locked based on active DCA jobs."""
-    if db is None:
-        return 0.0
+
+TVL_STATUSES = ["active", "paused"]
+_TVL_JOB_PROJECTION = {"basket_id": 1, "budget_per_tick": 1}
+_TVL_USD_JOB_PROJECTION = {**_TVL_JOB_PROJECTION, "src_chain": 1, "token_in": 1}
+_TVL_BASKET_PROJECTION = {"coins": 1}
+# Jobs without ``token_in`` spend USDC, as in the DCA engine
+TVL_DEFAULT_TOKEN_IN = "USDC"
+
+
+def _sum_tvl(
+    jobs: List[Dict[str, Any]],
+    baskets: Dict[Any, Dict[str, Any]],
+    token_map: Dict[int, Dict[str, str]],
+) -> float:
+    """Sum tracked basket allocations of ``jobs``; ``baskets`` is keyed by ``str(_id)``."""
     tracked = {s for m in token_map.values() for s in m.keys()}
     total = 0.0
-    for job in db.dca_jobs.find({"status": {"$in": ["active", "paused"]}}):
-        basket = db.baskets.find_one({"_id": job.get("basket_id")})
+    for job in jobs:
+        basket = baskets.get(str(job.get("basket_id")))
         if not basket:
             continue
         budget = float(job.get("budget_per_tick", 0))
@@ -37,9 +60,73 @@ def compute_tvl(token_map: Dict[int, Dict[str, str]]) -> float:
     return total
 
 
+def _tvl_allocations(
+    jobs: List[Dict[str, Any]],
+    baskets: Dict[Any, Dict[str, Any]],
+    token_map: Dict[int, Dict[str, str]],
+) -> Dict[Tuple[int, str], float]:
+    """Tracked basket allocations of ``jobs`` summed per ``(src_chain, token_in)``."""
+    tracked = {s for m in token_map.values() for s in m.keys()}
+    allocations: Dict[Tuple[int, str], float] = defaultdict(float)
+    for job in jobs:
+        basket = baskets.get(str(job.get("basket_id")))
+        if not basket:
+            continue
+        try:
+            src_chain = int(job.get("src_chain"))
+        except (TypeError, ValueError):
+            continue
+        token_in = (job.get("token_in") or TVL_DEFAULT_TOKEN_IN).upper()
+        budget = float(job.get("budget_per_tick", 0))
+        for coin in basket.get("coins", []):
+            if coin.get("symbol") not in tracked:
+                continue
+            allocations[(src_chain, token_in)] += budget * float(coin.get("weight", 0)) / 100.0
+    return allocations
+
+
+def compute_tvl(token_map: Dict[int, Dict[str, str]]) -> float:
+    """Compute total value locked based on active DCA jobs."""
+    if not mongo_available():
+        return 0.0
+    jobs = list(db.dca_jobs.find({"status": {"$in": TVL_STATUSES}}, _TVL_JOB_PROJECTION))
+    basket_ids = {job.get("basket_id") for job in jobs if job.get("basket_id") is not None}
+    baskets = {
+        str(b["_id"]): b
+        for b in db.baskets.find({"_id": {"$in": list(basket_ids)}}, _TVL_BASKET_PROJECTION)
+    }
+    return _sum_tvl(jobs, baskets, token_map)
+
+
+async def compute_tvl_async(token_map: Dict[int, Dict[str, str]]) -> float:
+    """Async variant of :func:`compute_tvl` for request handlers."""
+    jobs = await dca_jobs_repo.find_by_status(TVL_STATUSES, _TVL_JOB_PROJECTION)
+    baskets = await baskets_repo.get_many(
+        {job.get("basket_id") for job in jobs if job.get("basket_id") is not None},
+        _TVL_BASKET_PROJECTION,
+    )
+    return _sum_tvl(jobs, {str(k): v for k, v in baskets.items()}, token_map)
+
+
+async def compute_tvl_usd_async(token_map: Dict[int, Dict[str, str]]) -> float:
+    """TVL in USD: budgets are priced in their input token, in one price lookup."""
+    jobs = await dca_jobs_repo.find_by_status(TVL_STATUSES, _TVL_USD_JOB_PROJECTION)
+    baskets = await baskets_repo.get_many(
+        {job.get("basket_id") for job in jobs if job.get("basket_id") is not None},
+        _TVL_BASKET_PROJECTION,
+    )
+    allocations = _tvl_allocations(jobs, {str(k): v for k, v in baskets.items()}, token_map)
+    keys = list(allocations)
+    addresses = await resolve_token_addresses_async(keys)
+    amounts: Dict[Tuple[int, str], float] = defaultdict(float)
+    for (chain_id, symbol), address in zip(keys, addresses):
+        amounts[(chain_id, address)] += allocations[(chain_id, symbol)]
+    return await price_service.value_amounts(amounts)
+
+
 def compute_metrics() -> None:
     """Calculate DCA metrics and store in-memory."""
-    if db is None:
+    if not mongo_available():
         return
 
     now = datetime.utcnow()
@@ -87,8 +174,9 @@ def compute_metrics() -> None:
 def start_metrics_collection() -> None:
     """Begin periodic metrics computation."""
     compute_metrics()
-    if scheduler:
-        scheduler.add_job(
+    # metrics_cache lives in process memory, so every replica refreshes its own
+    if local_scheduler:
+        local_scheduler.add_job(
             compute_metrics,
             "interval",
             seconds=30,
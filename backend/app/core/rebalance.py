@@ -0,0 +1,190 @@
+"""
+Basket rebalance planning.
+
+Given wallet holdings, USD prices and basket target weights, work out how far
+each coin is from its target and the trades that close the gap. Deltas for a
+whole batch of baskets are computed at once on ``baskets x coins`` NumPy
+arrays; only the short per-basket trade matching runs in Python.
+
+Trades are matched greedily, largest first: proceeds of each overweight coin
+(and any new cash) fund the underweight ones, so a basket with ``s`` coins to
+sell and ``b`` to buy needs at most ``s + b - 1`` trades. Moves smaller than
+``min_trade_usd`` are skipped so a nearly balanced basket produces no dust
+trades. Coins held in the wallet but not in the basket are left alone.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+REBALANCE_MIN_TRADE_USD = float(os.getenv("REBALANCE_MIN_TRADE_USD", "1"))
+# Token new cash is held in (DCA budgets are spent from it)
+CASH_SYMBOL = "USDC"
+
+
+def basket_weights(basket: Dict[str, Any]) -> Dict[str, float]:
+    """Target weights of a basket as fractions summing to 1, keyed by symbol."""
+    coins = [c for c in basket.get("coins", []) if c.get("symbol")]
+    if not coins:
+        return {}
+    weights: Dict[str, float] = {}
+    equal = basket.get("weighting") == "equal" or any(c.get("weight") is None for c in coins)
+    for coin in coins:
+        symbol = coin["symbol"].upper()
+        weights[symbol] = weights.get(symbol, 0.0) + (1.0 if equal else float(coin["weight"]))
+    total = sum(weights.values())
+    return {symbol: w / total for symbol, w in weights.items()} if total > 0 else {}
+
+
+def _match_trades(
+    sells: List[Tuple[str, float]],
+    buys: List[Tuple[str, float]],
+    prices: Dict[str, float],
+    min_trade_usd: float,
+) -> List[Dict[str, Any]]:
+    """Pair sell proceeds with buys, largest first; amounts are in USD."""
+    trades = []
+    sells = sorted(sells, key=lambda s: -s[1])
+    buys = sorted(buys, key=lambda b: -b[1])
+    i = j = 0
+    left_sell = sells[0][1] if sells else 0.0
+    left_buy = buys[0][1] if buys else 0.0
+    while i < len(sells) and j < len(buys):
+        usd = min(left_sell, left_buy)
+        sell, buy = sells[i][0], buys[j][0]
+        if usd >= min_trade_usd and sell != buy:
+            trades.append({
+                "sell": sell,
+                "buy": buy,
+                "usd": round(usd, 2),
+                "amount_in": usd / prices.get(sell, 1.0),
+                "amount_out": usd / prices[buy],
+            })
+        left_sell -= usd
+        left_buy -= usd
+        if left_sell <= 1e-9:
+            i += 1
+            left_sell = sells[i][1] if i < len(sells) else 0.0
+        if left_buy <= 1e-9:
+            j += 1
+            left_buy = buys[j][1] if j < len(buys) else 0.0
+    return trades
+
+
+def _deltas(
+    baskets: Sequence[Dict[str, Any]],
+    holdings: Sequence[Dict[str, float]],
+    prices: Dict[str, Optional[float]],
+    cash_usd: Optional[Sequence[float]],
+    min_trade_usd: float,
+) -> Dict[str, Any]:
+    """USD value, target and delta of every coin as ``baskets x coins`` arrays."""
+    count = len(baskets)
+    weights = [basket_weights(basket) for basket in baskets]
+    symbols = sorted({symbol for w in weights for symbol in w})
+    column = {symbol: k for k, symbol in enumerate(symbols)}
+
+    price = np.array([prices.get(s) or np.nan for s in symbols], dtype=float)
+    priced = ~np.isnan(price)
+    target_weight = np.zeros((count, len(symbols)))
+    held = np.zeros((count, len(symbols)))
+    for i, (w, wallet) in enumerate(zip(weights, holdings)):
+        for symbol, fraction in w.items():
+            k = column[symbol]
+            target_weight[i, k] = fraction
+            held[i, k] = float(wallet.get(symbol, 0.0))
+    cash = np.zeros(count) if cash_usd is None else np.asarray(cash_usd, dtype=float)
+
+    # Unpriced coins can be neither valued nor traded; spread their weight over the rest
+    target_weight[:, ~priced] = 0.0
+    weight_sum = target_weight.sum(axis=1, keepdims=True)
+    target_weight = np.divide(target_weight, weight_sum, out=np.zeros_like(target_weight), where=weight_sum > 0)
+
+    value = held * np.where(priced, price, 0.0)
+    total = value.sum(axis=1)
+    delta = target_weight * (total + cash)[:, None] - value
+    delta[np.abs(delta) < min_trade_usd] = 0.0
+    return {
+        "weights": weights,
+        "symbols": symbols,
+        "column": column,
+        "price": price,
+        "priced": priced,
+        "target_weight": target_weight,
+        "value": value,
+        "total": total,
+        "cash": cash,
+        "delta": delta,
+    }
+
+
+def plan_rebalances(
+    baskets: Sequence[Dict[str, Any]],
+    holdings: Sequence[Dict[str, float]],
+    prices: Dict[str, Optional[float]],
+    cash_usd: Optional[Sequence[float]] = None,
+    *,
+    min_trade_usd: float = REBALANCE_MIN_TRADE_USD,
+) -> List[Dict[str, Any]]:
+    """Plan rebalances for many baskets at once.
+
+    ``holdings[i]`` maps symbol to token amount for ``baskets[i]`` and
+    ``prices`` maps symbol to USD price. ``cash_usd[i]`` is new money to
+    invest into basket ``i``.
+
+    Each plan has the basket's USD value, current and target USD per coin,
+    the USD and token delta per coin, the trade list, and the coins that
+    could not be planned because they have no price.
+    """
+    d = _deltas(baskets, holdings, prices, cash_usd, min_trade_usd)
+    weights, symbols, column = d["weights"], d["symbols"], d["column"]
+    price, priced, value, delta = d["price"], d["priced"], d["value"], d["delta"]
+    delta_amount = np.divide(delta, price, out=np.zeros_like(delta), where=priced & (delta != 0))
+
+    # Plain lists from here: per-element NumPy indexing is slower than Python floats
+    rows = zip(
+        weights,
+        d["total"].round(2).tolist(),
+        d["cash"].tolist(),
+        d["target_weight"].round(6).tolist(),
+        value.round(2).tolist(),
+        (value + delta).round(2).tolist(),
+        delta.tolist(),
+        delta.round(2).tolist(),
+        delta_amount.tolist(),
+    )
+    price_of = dict(zip(symbols, price.tolist()))
+    is_priced = dict(zip(symbols, priced.tolist()))
+    plans = []
+    for w, row_total, row_cash, row_weight, row_value, row_target, row_delta, row_delta_usd, row_amount in rows:
+        in_basket = [(s, column[s]) for s in w if is_priced[s]]
+        sells = [(s, -row_delta[k]) for s, k in in_basket if row_delta[k] < 0]
+        buys = [(s, row_delta[k]) for s, k in in_basket if row_delta[k] > 0]
+        spare = row_cash
+        for n, (symbol, usd) in enumerate(buys):
+            if symbol == CASH_SYMBOL:
+                # New cash already is the cash token; only the rest needs buying
+                used = min(spare, usd)
+                buys[n] = (symbol, usd - used)
+                spare -= used
+        if spare > 0:
+            sells.append((CASH_SYMBOL, spare))
+        plans.append({
+            "total_usd": row_total,
+            "cash_usd": round(row_cash, 2),
+            "coins": {
+                s: {
+                    "weight": row_weight[k],
+                    "current_usd": row_value[k],
+                    "target_usd": row_target[k],
+                    "delta_usd": row_delta_usd[k],
+                    "delta_amount": row_amount[k],
+                }
+                for s, k in in_basket
+            },
+            "trades": _match_trades(sells, buys, price_of, min_trade_usd),
+            "unpriced": [s for s in w if not is_priced[s]],
+        })
+    return plans
+
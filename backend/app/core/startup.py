@@ -0,0 +1,77 @@
+"""
+Startup phase tracking and background warmup.
+
+The application lifespan starts serving immediately and runs warmups in the
+background. Independent warmups run concurrently, while dependent ones (the
+scheduler chain) run in order. Every phase records its duration and outcome
+so ``/health/ready`` can report what is warm.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Phase = Tuple[str, Callable[[], Any]]
+
+phases: Dict[str, Dict[str, Any]] = {}
+_started = time.monotonic()
+_state: Dict[str, Any] = {"complete": False, "completed_at": None, "duration_ms": None}
+
+
+async def run_phase(name: str, func: Callable[[], Any]) -> bool:
+    """Run a blocking warmup in a worker thread and record its timing."""
+    phases[name] = {"status": "running", "started_at": datetime.utcnow().isoformat()}
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(func)
+    except Exception as exc:
+        phases[name].update({
+            "status": "error",
+            "error": str(exc),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        logger.error("Startup phase %s failed: %s", name, exc)
+        return False
+    phases[name].update({
+        "status": "ok",
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+    logger.info("Startup phase %s finished in %.1f ms", name, phases[name]["duration_ms"])
+    return True
+
+
+async def run_chain(chain: List[Phase]) -> None:
+    """Run phases in order, skipping the rest of the chain after a failure."""
+    for i, (name, func) in enumerate(chain):
+        if not await run_phase(name, func):
+            for skipped, _ in chain[i + 1:]:
+                phases[skipped] = {"status": "skipped", "error": f"{name} failed"}
+            return
+
+
+async def warm_up(concurrent: List[Phase], chains: List[List[Phase]]) -> None:
+    """Run independent phases and phase chains concurrently."""
+    for name, _ in concurrent + [p for chain in chains for p in chain]:
+        phases.setdefault(name, {"status": "pending"})
+    await asyncio.gather(
+        *(run_phase(name, func) for name, func in concurrent),
+        *(run_chain(chain) for chain in chains),
+    )
+    _state.update({
+        "complete": True,
+        "completed_at": datetime.utcnow().isoformat(),
+        "duration_ms": round((time.monotonic() - _started) * 1000, 1),
+    })
+    logger.info("Startup warmup complete in %.1f ms", _state["duration_ms"])
+
+
+def phase_ok(name: str) -> bool:
+    return phases.get(name, {}).get("status") == "ok"
+
+
+def startup_report() -> Dict[str, Any]:
+    return {**_state, "phases": phases}
@@ -0,0 +1,447 @@
+"""
+Request tracing.
+
+A small span API modelled on OpenTelemetry. Spans carry W3C trace and span ids
+and are exported as OTLP/JSON (one ``resourceSpans`` document per line, the
+format the OpenTelemetry Collector's file receiver reads). Incoming
+``traceparent`` headers are honoured, and every response carries one.
+
+:class:`TracingMiddleware` opens a root span per HTTP request. Code below it
+adds child spans with :func:`start_span` or the :func:`traced` decorator. The
+current span lives in a context variable, so children follow the request
+through ``await``, ``asyncio.gather`` and ``asyncio.to_thread``. Outside a
+request (scheduler threads) both are no-ops.
+
+Every request is recorded, so the ``TRACE_SLOWEST_N`` slowest traces can be
+kept for offline analysis (``/metrics/traces/slowest`` or ``TRACE_DUMP_PATH``
+at shutdown). Only ``TRACE_SAMPLE_RATE`` of them are exported.
+"""
+
+import contextvars
+import functools
+import heapq
+import inspect
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Share of traces exported; a sampled ``traceparent`` from the caller is always exported
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# "none", "stdout" or "file" (appends to TRACE_EXPORT_PATH)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_SLOWEST_N = int(os.getenv("TRACE_SLOWEST_N", "20"))
+TRACE_DUMP_PATH = os.getenv("TRACE_DUMP_PATH")
+# Spans beyond this per trace are counted but not kept
+MAX_SPANS_PER_TRACE = 1000
+EXPORT_QUEUE_SIZE = 1000
+SERVICE_NAME = os.getenv("SERVICE_NAME", "medusa-backend")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans of one trace, shared by every span in it."""
+
+    __slots__ = ("trace_id", "sampled", "spans", "dropped")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.dropped = 0
+
+    def add(self, span: "Span") -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        "trace", "name", "span_id", "parent_id", "kind", "attributes",
+        "start_ns", "end_ns", "status", "status_message", "events",
+    )
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "UNSET"
+        self.status_message = ""
+        self.events: List[Dict[str, Any]] = []
+        trace.add(self)
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: str = "") -> None:
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": _otlp_attributes({
+                "exception.type": type(exc).__name__,
+                "exception.message": str(exc),
+            }),
+        })
+        self.set_status("ERROR", str(exc))
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": _STATUS_CODES[self.status], "message": self.status_message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class _NoopSpan:
+    """Returned when nothing is being traced; accepts and ignores everything."""
+
+    trace_id = span_id = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_status(self, status: str, message: str = "") -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+_STATUS_CODES = {"UNSET": 0, "OK": 1, "ERROR": 2}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def otlp_document(spans: List[Span]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """Return ``(trace_id, parent_span_id, sampled)`` from a W3C ``traceparent``."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class _ExportWorker:
+    """Write sampled traces from a background thread so requests never block on I/O."""
+
+    def __init__(self, exporter: str, path: str):
+        self.exporter = exporter
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+            self._thread.start()
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            spans = self.queue.get()
+            try:
+                line = json.dumps(otlp_document(spans), default=str)
+                if self.exporter == "file":
+                    with open(self.path, "a") as handle:
+                        handle.write(line + "\n")
+                else:
+                    sys.stdout.write(line + "\n")
+                    sys.stdout.flush()
+            except Exception as exc:
+                logger.error("Trace export failed: %s", exc)
+
+
+class Tracer:
+    """Create spans, export sampled traces and keep the slowest ones."""
+
+    def __init__(
+        self,
+        enabled: bool = TRACING_ENABLED,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        exporter: str = TRACE_EXPORTER,
+        export_path: str = TRACE_EXPORT_PATH,
+        slowest_n: int = TRACE_SLOWEST_N,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slowest_n = slowest_n
+        self._export = _ExportWorker(exporter, export_path) if exporter in ("stdout", "file") else None
+        # Min-heap of (duration, seq, root span); the fastest is evicted first
+        self._slowest: List[tuple] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def start_trace(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        kind: str = "server",
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Any]:
+        """Open a root span (continuing the caller's trace if ``traceparent`` is valid)."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        parent = parse_traceparent(traceparent)
+        if parent:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < self.sample_rate
+        span = Span(Trace(trace_id, sampled), name, parent_id, kind, dict(attributes or {}))
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def _finish(self, root: Span) -> None:
+        trace = root.trace
+        if trace.dropped:
+            root.set_attribute("medusa.dropped_spans", trace.dropped)
+        if trace.sampled and self._export is not None:
+            self._export.submit(trace.spans)
+        if self.slowest_n <= 0:
+            return
+        entry = (root.duration, next(self._seq), root)
+        with self._lock:
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, reset: bool = False) -> List[Dict[str, Any]]:
+        """The slowest recorded traces, slowest first, as OTLP/JSON documents."""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+            if reset:
+                self._slowest.clear()
+        return [
+            {"duration_ms": round(duration * 1000, 2), **otlp_document(root.trace.spans)}
+            for duration, _, root in entries
+        ]
+
+    def dump_slowest(self, path: str) -> int:
+        """Write the slowest traces to ``path``, one OTLP/JSON document per line."""
+        traces = self.slowest()
+        with open(path, "w") as handle:
+            for doc in traces:
+                handle.write(json.dumps(doc, default=str) + "\n")
+        return len(traces)
+
+    def shutdown(self) -> None:
+        if not TRACE_DUMP_PATH or not self._slowest:
+            return
+        try:
+            count = self.dump_slowest(TRACE_DUMP_PATH)
+            logger.info("Wrote %d slowest traces to %s", count, TRACE_DUMP_PATH)
+        except Exception as exc:
+            logger.error("Failed to dump slowest traces: %s", exc)
+
+
+tracer = Tracer()
+
+
+def current_span() -> Any:
+    return _current.get() or NOOP_SPAN
+
+
+def tracing_active() -> bool:
+    """Whether the caller runs inside a trace (cheap check for hot paths)."""
+    return _current.get() is not None
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal") -> Iterator[Any]:
+    """Open a child of the current span; a no-op when no trace is active."""
+    parent = _current.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    span = Span(parent.trace, name, parent.span_id, kind, dict(attributes or {}))
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+
+
+def traced(
+    name: str,
+    attributes: Callable[..., Dict[str, Any]] | Dict[str, Any] | None = None,
+    kind: str = "internal",
+) -> Callable:
+    """Run a sync or async function inside a child span.
+
+    ``attributes`` is a fixed mapping or a callable receiving the function's
+    arguments, as with :func:`app.core.instrumentation.timed`.
+    """
+
+    def span_attributes(args: tuple, kwargs: dict) -> Dict[str, Any]:
+        if attributes is None:
+            return {}
+        return attributes(*args, **kwargs) if callable(attributes) else dict(attributes)
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await func(*args, **kwargs)
+                with start_span(name, span_attributes(args, kwargs), kind):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with start_span(name, span_attributes(args, kwargs), kind):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per HTTP request.
+
+    The span is named after the matched route template (``GET /swap/{swap_id}``)
+    and the response carries a ``traceparent`` header for correlation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        method = scope["method"]
+        with tracer.start_trace(
+            f"{method} {scope['path']}",
+            traceparent,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        span.set_status("ERROR")
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", span.traceparent().encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
@@ -1,48 +1,148 @@
 import os
 import logging
+from typing import Dict
+from apscheduler.jobstores.mongodb import MongoDBJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 import redis
 
+from app.core.tracing import start_span, tracing_active
+
 logger = logging.getLogger(__name__)
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-# MongoDB connection
-try:
-    _client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000)
-    _client.admin.command("ping")
-    db = _client.medusa
-    mongo_connected = True
-    logger.info("MongoDB connected")
-except Exception as exc:
-    logger.error("MongoDB connection failed: %s", exc)
-    db = None
-    mongo_connected = False
-
-# Redis connection
-try:
-    redis_client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=5)
-    redis_client.ping()
-    redis_connected = True
-    logger.info("Redis connected")
-except Exception as exc:
-    logger.error("Redis connection failed: %s", exc)
-    redis_client = None
-    redis_connected = False
+# Pool sizing for the async client used by request handlers
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+
+# Clients connect lazily on first use, so importing this module never blocks
+# on the network. ``check_connections`` records whether each is reachable.
+_client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=5000, connect=False)
+db = _client.medusa
+
+# Async client for FastAPI handlers; the sync ``db`` stays for scheduler threads
+_async_client = AsyncMongoClient(
+    MONGO_URL,
+    serverSelectionTimeoutMS=5000,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    connect=False,
+)
+async_db = _async_client.medusa
+
+
+
+class TracedRedis(redis.Redis):
+    """Redis client recording each command as a span inside traced requests."""
+
+    def execute_command(self, *args, **options):
+        if not tracing_active():
+            return super().execute_command(*args, **options)
+        command = str(args[0]).upper() if args else ""
+        with start_span(
+            f"redis.{command.lower()}",
+            {"db.system": "redis", "db.operation.name": command},
+            kind="client",
+        ):
+            return super().execute_command(*args, **options)
+
+
+redis_client = TracedRedis.from_url(REDIS_URL, socket_connect_timeout=5)
+
+# Last known reachability, updated by ``check_connections``; ``None`` until checked
+connection_state: Dict[str, bool | None] = {"mongo": None, "redis": None}
+
+
+def mongo_available() -> bool:
+    """Whether MongoDB answered the last check; not checked yet counts as available."""
+    return connection_state["mongo"] is not False
+
+
+def redis_available() -> bool:
+    """Whether Redis answered the last check; not checked yet counts as available."""
+    return connection_state["redis"] is not False
 
 # Scheduler setup
-scheduler = None
-if mongo_connected:
-    scheduler = BackgroundScheduler()
-    scheduler.start()
-    logger.info("Scheduler started")
+# ``scheduler`` holds fleet-wide jobs in a Mongo job store shared by every
+# replica. It starts paused; app.schedulers.cluster resumes it on the elected
+# leader. ``local_scheduler`` runs per-process jobs such as cache refreshes.
+# Both are started by ``start_schedulers`` from the application lifespan.
+SCHEDULER_JOB_COLLECTION = "apscheduler_jobs"
+scheduler = BackgroundScheduler(
+    jobstores={
+        "default": MongoDBJobStore(database="medusa", collection=SCHEDULER_JOB_COLLECTION, client=_client),
+    },
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 30},
+)
+local_scheduler = BackgroundScheduler()
+
 
+def check_connections() -> Dict[str, bool | None]:
+    """Ping MongoDB and Redis and record the result in ``connection_state``."""
+    try:
+        _client.admin.command("ping")
+        connection_state["mongo"] = True
+    except Exception as exc:
+        logger.error("MongoDB connection failed: %s", exc)
+        connection_state["mongo"] = False
+    try:
+        redis_client.ping()
+        connection_state["redis"] = True
+    except Exception as exc:
+        logger.error("Redis connection failed: %s", exc)
+        connection_state["redis"] = False
+    return dict(connection_state)
+
+
+def start_schedulers() -> None:
+    if not local_scheduler.running:
+        local_scheduler.start()
+    if not scheduler.running:
+        scheduler.start(paused=True)
+        logger.info("Scheduler started")
+
+
+def shutdown_schedulers() -> None:
+    for sched in (local_scheduler, scheduler):
+        if sched.running:
+            sched.shutdown(wait=False)
+
+
+SWAP_METRICS_UNIQUE_KEY = [("swap_id", 1), ("endpoint", 1)]
+
+
+def ensure_indexes() -> None:
     # Ensure swap_metrics collection exists and has useful indexes
     try:
         swap_metrics = db.get_collection("swap_metrics")
         swap_metrics.create_index("swap_id")
         swap_metrics.create_index("started_at")
+        # One tracker (and poller job) per swap status endpoint. Existing
+        # duplicates are collapsed by the db_validator step that runs first.
+        swap_metrics.create_index(SWAP_METRICS_UNIQUE_KEY, unique=True)
     except Exception as exc:
         logger.error("Failed to initialize swap_metrics collection: %s", exc)
+
+    # Confirmation tracker scans recent swaps that are not final
+    try:
+        db.swaps.create_index([("finalized", 1), ("created_at", 1)])
+    except Exception as exc:
+        logger.error("Failed to initialize swaps indexes: %s", exc)
+
+    # Support cursor pagination of the events feed
+    try:
+        db.events.create_index([("type", 1), ("_id", 1)])
+    except Exception as exc:
+        logger.error("Failed to initialize events indexes: %s", exc)
+
+
+async def close_async_client() -> None:
+    """Close the async client's pool; called from the application lifespan."""
+    try:
+        await _async_client.close()
+    except Exception as exc:
+        logger.error("Failed to close async MongoDB client: %s", exc)
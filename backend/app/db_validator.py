@@ -1,15 +1,42 @@
 """
-Database validator to fix chain ID issues on startup.
-This module validates and fixes database inconsistencies automatically.
+Database validator to fix chain ID issues.
+
+The fixes run as server-side ``delete_many``/``update_many`` calls (using
+aggregation-pipeline updates), so no documents travel to the application.
+The exception is moving inline swap quotes into ``swap_quotes``, which has
+to compress them here; it works in batches of ``QUOTE_MIGRATION_BATCH``.
+Duplicate swap trackers are collapsed before the unique ``(swap_id,
+endpoint)`` index is built, along with the poller jobs of the removed ones.
+Each step records its completion in the ``migrations`` collection. Once every
+step at ``MIGRATION_VERSION`` is done, later runs return immediately, and an
+interrupted run resumes at the first unfinished step.
+
+Run it offline with ``python -m app.db_validator``. Set
+``DB_VALIDATION_ON_STARTUP=false`` to skip it during application startup.
 """
 
+import argparse
 import logging
-from typing import Dict, Any, Optional
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pymongo import ReplaceOne, UpdateOne
 from pymongo.database import Database
 from pymongo.collection import Collection
 
+from app.db.db import SCHEDULER_JOB_COLLECTION, SWAP_METRICS_UNIQUE_KEY
+from app.repositories.swap_repository import QUOTE_COLLECTION, encode_quote
+
 logger = logging.getLogger(__name__)
 
+MIGRATION_ID = "chain_ids"
+# Bump when steps are added or changed so deployed databases re-run them
+MIGRATION_VERSION = 4
+QUOTE_MIGRATION_BATCH = 500
+DEDUPE_BATCH = 500
+
+RUN_ON_STARTUP = os.getenv("DB_VALIDATION_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+
 # Chain name to ID mapping for fixing old data
 CHAIN_NAME_TO_ID = {
     "ethereum": 1,
@@ -27,263 +54,252 @@ CHAIN_NAME_TO_ID = {
     "optimism_goerli": 420,
 }
 
-def validate_and_fix_chain_ids(db: Optional[Database]) -> Dict[str, int]:
-    """
-    Validate and fix chain ID issues in the database.
-    
-    Args:
-        db: MongoDB database instance
-        
-    Returns:
-        Dict with statistics about what was fixed
-    """
-    if db is None:
-        logger.warning("Database not available for validation")
-        return {"fixed": 0, "deleted": 0, "errors": 0}
-    
-    stats = {"fixed": 0, "deleted": 0, "errors": 0}
-    
+CHAIN_FIELDS = ("src_chain", "dst_chain")
+
+
+def _empty_stats() -> Dict[str, int]:
+    return {"fixed": 0, "deleted": 0, "errors": 0}
+
+
+def _chain_id_expr(field: str) -> Dict[str, Any]:
+    """Aggregation expression mapping a known chain name in ``field`` to its ID."""
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": [f"${field}", name]}, "then": chain_id}
+                for name, chain_id in CHAIN_NAME_TO_ID.items()
+            ],
+            "default": f"${field}",
+        }
+    }
+
+
+def _fix_chain_fields(collection: Collection, label: str) -> Dict[str, int]:
+    """Delete documents with unknown chain names and convert known names to IDs."""
+    stats = _empty_stats()
+    known = list(CHAIN_NAME_TO_ID)
     try:
-        # Fix swaps collection
-        swaps_stats = _fix_swaps_collection(db.swaps)
-        stats["fixed"] += swaps_stats["fixed"]
-        stats["deleted"] += swaps_stats["deleted"]
-        stats["errors"] += swaps_stats["errors"]
-        
-        # Fix DCA jobs collection
-        dca_stats = _fix_dca_collection(db.dca_jobs)
-        stats["fixed"] += dca_stats["fixed"]
-        stats["deleted"] += dca_stats["deleted"]
-        stats["errors"] += dca_stats["errors"]
-        
-        # Fix baskets collection
-        baskets_stats = _fix_baskets_collection(db.baskets)
-        stats["fixed"] += baskets_stats["fixed"]
-        stats["deleted"] += baskets_stats["deleted"]
-        stats["errors"] += baskets_stats["errors"]
-        
-        if stats["fixed"] > 0 or stats["deleted"] > 0:
-            logger.info(f"Database validation completed: {stats['fixed']} records fixed, {stats['deleted']} records deleted, {stats['errors']} errors")
-        else:
-            logger.info("Database validation completed: No issues found")
-            
+        # Documents naming a chain we cannot map are unusable
+        deleted = collection.delete_many({
+            "$or": [
+                {field: {"$type": "string", "$nin": known}} for field in CHAIN_FIELDS
+            ]
+        })
+        stats["deleted"] += deleted.deleted_count
+        if deleted.deleted_count:
+            logger.warning(f"Deleted {deleted.deleted_count} {label} records with unknown chain names")
+
+        for field in CHAIN_FIELDS:
+            result = collection.update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: _chain_id_expr(field)}}],
+            )
+            stats["fixed"] += result.modified_count
+            if result.modified_count:
+                logger.info(f"Fixed {field} on {result.modified_count} {label} records")
     except Exception as e:
-        logger.error(f"Error during database validation: {e}")
+        logger.error(f"Error processing {label} collection: {e}")
         stats["errors"] += 1
-    
     return stats
 
+
 def _fix_swaps_collection(swaps_collection: Collection) -> Dict[str, int]:
     """Fix chain ID issues in swaps collection."""
-    stats = {"fixed": 0, "deleted": 0, "errors": 0}
-    
+    return _fix_chain_fields(swaps_collection, "swap")
+
+
+def _populate_swap_chain_id(swaps_collection: Collection) -> Dict[str, int]:
+    """Populate missing chain_id using src_chain when available."""
+    stats = _empty_stats()
     try:
-        # Find all swaps with string chain IDs
-        string_chain_swaps = swaps_collection.find({
-            "$or": [
-                {"src_chain": {"$type": "string"}},
-                {"dst_chain": {"$type": "string"}}
-            ]
-        })
-        
-        for swap in string_chain_swaps:
-            try:
-                swap_id = swap.get("_id")
-                src_chain = swap.get("src_chain")
-                dst_chain = swap.get("dst_chain")
-                
-                # Try to fix src_chain
-                if isinstance(src_chain, str):
-                    if src_chain in CHAIN_NAME_TO_ID:
-                        new_src_chain = CHAIN_NAME_TO_ID[src_chain]
-                        swaps_collection.update_one(
-                            {"_id": swap_id},
-                            {"$set": {"src_chain": new_src_chain}}
-                        )
-                        logger.info(f"Fixed swap {swap_id}: src_chain '{src_chain}' -> {new_src_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete swaps with unknown chain names
-                        swaps_collection.delete_one({"_id": swap_id})
-                        logger.warning(f"Deleted swap {swap_id}: unknown src_chain '{src_chain}'")
-                        stats["deleted"] += 1
-                
-                # Try to fix dst_chain
-                if isinstance(dst_chain, str):
-                    if dst_chain in CHAIN_NAME_TO_ID:
-                        new_dst_chain = CHAIN_NAME_TO_ID[dst_chain]
-                        swaps_collection.update_one(
-                            {"_id": swap_id},
-                            {"$set": {"dst_chain": new_dst_chain}}
-                        )
-                        logger.info(f"Fixed swap {swap_id}: dst_chain '{dst_chain}' -> {new_dst_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete swaps with unknown chain names
-                        swaps_collection.delete_one({"_id": swap_id})
-                        logger.warning(f"Deleted swap {swap_id}: unknown dst_chain '{dst_chain}'")
-                        stats["deleted"] += 1
-
-            except Exception as e:
-                logger.error(f"Error fixing swap {swap.get('_id')}: {e}")
-                stats["errors"] += 1
-
-        # Populate missing chain_id using src_chain when available
-        missing_chain_id = swaps_collection.find({"chain_id": {"$exists": False}})
-        for swap in missing_chain_id:
-            try:
-                swap_id = swap.get("_id")
-                src_chain = swap.get("src_chain")
-                if isinstance(src_chain, str):
-                    src_chain = CHAIN_NAME_TO_ID.get(src_chain)
-                if isinstance(src_chain, int):
-                    swaps_collection.update_one({"_id": swap_id}, {"$set": {"chain_id": src_chain}})
-                    stats["fixed"] += 1
-            except Exception as e:
-                logger.error(f"Error setting chain_id for swap {swap.get('_id')}: {e}")
-                stats["errors"] += 1
-
-                
+        result = swaps_collection.update_many(
+            {"chain_id": {"$exists": False}, "src_chain": {"$type": ["int", "long"]}},
+            [{"$set": {"chain_id": "$src_chain"}}],
+        )
+        stats["fixed"] += result.modified_count
     except Exception as e:
-        logger.error(f"Error processing swaps collection: {e}")
+        logger.error(f"Error setting chain_id for swaps: {e}")
         stats["errors"] += 1
-    
     return stats
 
-def _fix_dca_collection(dca_collection: Collection) -> Dict[str, int]:
-    """Fix chain ID issues in DCA jobs collection."""
-    stats = {"fixed": 0, "deleted": 0, "errors": 0}
-    
+
+def _offload_swap_quotes(db: Database) -> Dict[str, int]:
+    """Move quotes stored inline on swaps into compressed ``swap_quotes`` documents."""
+    stats = _empty_stats()
     try:
-        # Find all DCA jobs with string chain IDs
-        string_chain_dca = dca_collection.find({
-            "$or": [
-                {"src_chain": {"$type": "string"}},
-                {"dst_chain": {"$type": "string"}}
-            ]
-        })
-        
-        for dca in string_chain_dca:
-            try:
-                dca_id = dca.get("_id")
-                src_chain = dca.get("src_chain")
-                dst_chain = dca.get("dst_chain")
-                
-                # Try to fix src_chain
-                if isinstance(src_chain, str):
-                    if src_chain in CHAIN_NAME_TO_ID:
-                        new_src_chain = CHAIN_NAME_TO_ID[src_chain]
-                        dca_collection.update_one(
-                            {"_id": dca_id},
-                            {"$set": {"src_chain": new_src_chain}}
-                        )
-                        logger.info(f"Fixed DCA {dca_id}: src_chain '{src_chain}' -> {new_src_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete DCA jobs with unknown chain names
-                        dca_collection.delete_one({"_id": dca_id})
-                        logger.warning(f"Deleted DCA {dca_id}: unknown src_chain '{src_chain}'")
-                        stats["deleted"] += 1
-                
-                # Try to fix dst_chain
-                if isinstance(dst_chain, str):
-                    if dst_chain in CHAIN_NAME_TO_ID:
-                        new_dst_chain = CHAIN_NAME_TO_ID[dst_chain]
-                        dca_collection.update_one(
-                            {"_id": dca_id},
-                            {"$set": {"dst_chain": new_dst_chain}}
-                        )
-                        logger.info(f"Fixed DCA {dca_id}: dst_chain '{dst_chain}' -> {new_dst_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete DCA jobs with unknown chain names
-                        dca_collection.delete_one({"_id": dca_id})
-                        logger.warning(f"Deleted DCA {dca_id}: unknown dst_chain '{dst_chain}'")
-                        stats["deleted"] += 1
-                        
-            except Exception as e:
-                logger.error(f"Error fixing DCA {dca.get('_id')}: {e}")
-                stats["errors"] += 1
-                
+        while True:
+            batch = list(db.swaps.find({"quote": {"$exists": True}}, {"quote": 1}).limit(QUOTE_MIGRATION_BATCH))
+            if not batch:
+                break
+            # The quote reuses the swap's _id, so a rerun after a crash overwrites instead of duplicating
+            db[QUOTE_COLLECTION].bulk_write([
+                ReplaceOne({"_id": doc["_id"]}, {"swap_id": doc["_id"], **encode_quote(doc["quote"] or {})}, upsert=True)
+                for doc in batch
+            ], ordered=False)
+            result = db.swaps.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"quote_id": str(doc["_id"])}, "$unset": {"quote": ""}})
+                for doc in batch
+            ], ordered=False)
+            stats["fixed"] += result.modified_count
+        if stats["fixed"]:
+            logger.info(f"Moved {stats['fixed']} swap quotes to {QUOTE_COLLECTION}")
+    except Exception as e:
+        logger.error(f"Error moving swap quotes: {e}")
+        stats["errors"] += 1
+    return stats
+
+
+def _dedupe_swap_metrics(db: Database) -> Dict[str, int]:
+    """Keep the oldest tracker per swap endpoint, then build the unique index."""
+    stats = _empty_stats()
+    try:
+        groups = db.swap_metrics.aggregate([
+            {"$group": {
+                "_id": {"swap_id": "$swap_id", "endpoint": "$endpoint"},
+                "keep": {"$min": "$_id"},
+                "count": {"$sum": 1},
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+        ], allowDiskUse=True)
+        extra = []
+        for group in groups:
+            query = {**group["_id"], "_id": {"$gt": group["keep"]}}
+            extra.extend(doc["_id"] for doc in db.swap_metrics.find(query, {"_id": 1}))
+        for start in range(0, len(extra), DEDUPE_BATCH):
+            chunk = extra[start:start + DEDUPE_BATCH]
+            # Poller jobs are named after their tracker (see main._track_swap)
+            db[SCHEDULER_JOB_COLLECTION].delete_many({"_id": {"$in": [f"swap_track_{i}" for i in chunk]}})
+            stats["deleted"] += db.swap_metrics.delete_many({"_id": {"$in": chunk}}).deleted_count
+        db.swap_metrics.create_index(SWAP_METRICS_UNIQUE_KEY, unique=True)
+        if extra:
+            logger.info(f"Removed {stats['deleted']} duplicate swap trackers")
     except Exception as e:
-        logger.error(f"Error processing DCA collection: {e}")
+        logger.error(f"Error deduplicating swap trackers: {e}")
         stats["errors"] += 1
-    
     return stats
 
+
+def _fix_dca_collection(dca_collection: Collection) -> Dict[str, int]:
+    """Fix chain ID issues in DCA jobs collection."""
+    return _fix_chain_fields(dca_collection, "DCA")
+
+
 def _fix_baskets_collection(baskets_collection: Collection) -> Dict[str, int]:
     """Fix chain ID issues in baskets collection."""
-    stats = {"fixed": 0, "deleted": 0, "errors": 0}
-    
+    return _fix_chain_fields(baskets_collection, "basket")
+
+
+# Ordered migration steps; names are persisted, so do not rename them
+STEPS: List[Tuple[str, Callable[[Database], Dict[str, int]]]] = [
+    ("swaps_chain_names", lambda db: _fix_swaps_collection(db.swaps)),
+    ("swaps_chain_id", lambda db: _populate_swap_chain_id(db.swaps)),
+    ("dca_chain_names", lambda db: _fix_dca_collection(db.dca_jobs)),
+    ("baskets_chain_names", lambda db: _fix_baskets_collection(db.baskets)),
+    ("swaps_offload_quotes", _offload_swap_quotes),
+    ("swap_metrics_dedupe", _dedupe_swap_metrics),
+]
+
+
+def _load_marker(db: Database) -> Dict[str, Any]:
+    marker = db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    if marker.get("version") != MIGRATION_VERSION:
+        return {}
+    return marker
+
+
+def validate_and_fix_chain_ids(db: Optional[Database], force: bool = False) -> Dict[str, int]:
+    """
+    Validate and fix chain ID issues in the database.
+
+    Args:
+        db: MongoDB database instance
+        force: re-run every step even if the migration marker says it is done
+
+    Returns:
+        Dict with statistics about what was fixed
+    """
+    if db is None:
+        logger.warning("Database not available for validation")
+        return _empty_stats()
+
+    stats = _empty_stats()
+
     try:
-        # Find all baskets with string chain IDs
-        string_chain_baskets = baskets_collection.find({
-            "$or": [
-                {"src_chain": {"$type": "string"}},
-                {"dst_chain": {"$type": "string"}}
-            ]
-        })
-        
-        for basket in string_chain_baskets:
-            try:
-                basket_id = basket.get("_id")
-                src_chain = basket.get("src_chain")
-                dst_chain = basket.get("dst_chain")
-                
-                # Try to fix src_chain
-                if isinstance(src_chain, str):
-                    if src_chain in CHAIN_NAME_TO_ID:
-                        new_src_chain = CHAIN_NAME_TO_ID[src_chain]
-                        baskets_collection.update_one(
-                            {"_id": basket_id},
-                            {"$set": {"src_chain": new_src_chain}}
-                        )
-                        logger.info(f"Fixed basket {basket_id}: src_chain '{src_chain}' -> {new_src_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete baskets with unknown chain names
-                        baskets_collection.delete_one({"_id": basket_id})
-                        logger.warning(f"Deleted basket {basket_id}: unknown src_chain '{src_chain}'")
-                        stats["deleted"] += 1
-                
-                # Try to fix dst_chain
-                if isinstance(dst_chain, str):
-                    if dst_chain in CHAIN_NAME_TO_ID:
-                        new_dst_chain = CHAIN_NAME_TO_ID[dst_chain]
-                        baskets_collection.update_one(
-                            {"_id": basket_id},
-                            {"$set": {"dst_chain": new_dst_chain}}
-                        )
-                        logger.info(f"Fixed basket {basket_id}: dst_chain '{dst_chain}' -> {new_dst_chain}")
-                        stats["fixed"] += 1
-                    else:
-                        # Delete baskets with unknown chain names
-                        baskets_collection.delete_one({"_id": basket_id})
-                        logger.warning(f"Deleted basket {basket_id}: unknown dst_chain '{dst_chain}'")
-                        stats["deleted"] += 1
-                        
-            except Exception as e:
-                logger.error(f"Error fixing basket {basket.get('_id')}: {e}")
-                stats["errors"] += 1
-                
+        marker = {} if force else _load_marker(db)
+        if marker.get("completed_at"):
+            logger.info(f"Database validation v{MIGRATION_VERSION} already applied, skipping")
+            return stats
+        done = set(marker.get("steps", []))
+
+        for name, step in STEPS:
+            if name in done:
+                continue
+            step_stats = step(db)
+            for key in stats:
+                stats[key] += step_stats[key]
+            if step_stats["errors"]:
+                # Leave the step unrecorded so the next run retries it
+                continue
+            done.add(name)
+            db.migrations.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {"version": MIGRATION_VERSION, "steps": [n for n, _ in STEPS if n in done]}},
+                upsert=True,
+            )
+
+        if all(name in done for name, _ in STEPS):
+            db.migrations.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {"completed_at": datetime.utcnow()}},
+            )
+
+        if stats["fixed"] > 0 or stats["deleted"] > 0:
+            logger.info(f"Database validation completed: {stats['fixed']} records fixed, {stats['deleted']} records deleted, {stats['errors']} errors")
+        else:
+            logger.info("Database validation completed: No issues found")
+
     except Exception as e:
-        logger.error(f"Error processing baskets collection: {e}")
+        logger.error(f"Error during database validation: {e}")
         stats["errors"] += 1
-    
+
     return stats
 
-def run_database_validation(db: Optional[Database]) -> None:
+
+def run_database_validation(db: Optional[Database], force: bool = False) -> None:
     """
-    Run database validation on startup.
-    This function should be called when the application starts.
-    
+    Run database validation.
+    Called on application startup unless ``DB_VALIDATION_ON_STARTUP`` is
+    disabled, and by the ``python -m app.db_validator`` CLI.
+
     Args:
         db: MongoDB database instance (can be None if not connected)
+        force: ignore the migration marker and re-run every step
     """
     if db is not None:
         logger.info("Starting database validation...")
-        stats = validate_and_fix_chain_ids(db)
+        stats = validate_and_fix_chain_ids(db, force=force)
         if stats["fixed"] > 0 or stats["deleted"] > 0:
             logger.info(f"Database cleanup completed: {stats}")
     else:
-        logger.info("Database not connected, skipping validation") 
\ No newline at end of file
+        logger.info("Database not connected, skipping validation")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.medusa_core.mongo import get_db
+
+    parser = argparse.ArgumentParser(description="Fix chain ID inconsistencies in MongoDB.")
+    parser.add_argument("--mongo-url", help="MongoDB URL (defaults to MONGO_URL)")
+    parser.add_argument("--force", action="store_true", help="re-run steps already recorded as done")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    db = get_db(args.mongo_url)
+    if db is None:
+        return 1
+    stats = validate_and_fix_chain_ids(db, force=args.force)
+    logger.info(f"Database validation stats: {stats}")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
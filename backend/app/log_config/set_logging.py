@@ -1,25 +1,35 @@
 # logging_config.py  ── drop this in a module that is imported first
+import atexit
 import logging
 import logging.config
 import os
+import queue
+from logging.handlers import QueueListener
+
+from app.log_config.structured import DroppingQueueHandler, JsonFormatter
 
 # Root level – default to INFO unless you really want something chattier
 root_level = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for the classic console format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting for the writer thread; beyond this they are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of records logged with ``extra=SAMPLED`` that are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+STANDARD_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
 
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,   # keep uvicorn, etc. intact
-    "formatters": {
-        "standard": {
-            "format": "%(asctime)s [%(levelname)s] %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
+    "filters": {
+        "sampling": {"()": "app.log_config.structured.SamplingFilter", "rate": LOG_SAMPLE_RATE},
     },
     "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "standard",
-        },
+        # Only enqueues; ``listener`` below does the formatting and writing
+        "console": {"()": DroppingQueueHandler, "log_queue": log_queue, "filters": ["sampling"]},
     },
     # Root logger (everything that isn’t captured below)
     "root": {"handlers": ["console"], "level": root_level},
@@ -33,3 +43,12 @@ LOGGING_CONFIG = {
 }
 
 logging.config.dictConfig(LOGGING_CONFIG)
+
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(
+    JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(STANDARD_FORMAT, "%Y-%m-%d %H:%M:%S")
+)
+listener = QueueListener(log_queue, stream_handler)
+listener.start()
+# Flush what is still queued when the process exits
+atexit.register(listener.stop)
@@ -0,0 +1,124 @@
+"""
+Structured, non-blocking logging building blocks.
+
+Request handlers hand records to :class:`DroppingQueueHandler`, which only
+puts them on a bounded queue. A ``QueueListener`` thread formats them with
+:class:`JsonFormatter` and writes them to stdout, so handlers never block on
+stream I/O. If the queue fills up, records are dropped and counted instead of
+stalling the caller.
+
+High-volume debug events opt into sampling with ``extra=SAMPLED``. Only one
+in every ``1 / LOG_SAMPLE_RATE`` such records is kept, counted separately for
+each logger and message template.
+"""
+
+import copy
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler
+
+# Pass as ``extra`` to mark a record as high-volume and subject to sampling
+SAMPLED = {"sampled": True}
+
+# At most one "records dropped" warning per this many seconds
+DROP_NOTICE_SECONDS = 1.0
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sampled"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every ``1 / rate`` records marked with ``SAMPLED``."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.every = max(1, math.ceil(1 / rate)) if rate > 0 else 0
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False):
+            return True
+        if not self.every:
+            return False
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._seen[key]
+            self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        record.sample_rate = 1 / self.every
+        return True
+
+
+_plain = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """``QueueHandler`` that drops records instead of blocking on a full queue."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+        self._last_notice = 0.0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now, while they are still valid;
+        # the listener does the (more expensive) JSON formatting
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self._reported and time.monotonic() - self._last_notice >= DROP_NOTICE_SECONDS:
+            # Once there is room again, say how much was lost
+            notice = logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Dropped {self.dropped - self._reported} log records, queue full",
+            })
+            try:
+                self.queue.put_nowait(notice)
+                self._reported = self.dropped
+                self._last_notice = time.monotonic()
+            except queue.Full:
+                pass
@@ -1,63 +1,64 @@
 import os
 import json
-import atexit
+from contextlib import asynccontextmanager
 from datetime import datetime
 import time
 import logging
 import requests
 import asyncio
 from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict
 from bson import ObjectId
 from app.log_config.set_logging import LOGGING_CONFIG
-from fastapi import FastAPI, Query, HTTPException, WebSocket, WebSocketDisconnect
+from app.log_config.structured import SAMPLED
+from fastapi import FastAPI, Header, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from app.models import SwapMetric
 from dotenv import load_dotenv
-from app.medusa_core.resolve_balance import BalanceProvider
+from app.medusa_core.resolve_balance import BalanceProvider, providers
 from app.medusa_core.relay import (
-    get_quote as relay_get_quote,
+    get_quote_async as relay_get_quote_async,
+    get_chains_async,
     execute_route,
     get_route_status,
     approve_token,
 )
-from app.medusa_core.token_map import resolve_token_address, resolve_token_symbol, CHAIN_IDS, load_token_map
-from app.medusa_core.balance import get_token_balance, get_allowance, get_transaction_confirmations
-from app.db.db import db, redis_client, scheduler, mongo_connected, redis_connected
-from app.utils.error_handling import handle_agent_error
+from app.medusa_core.token_map import resolve_token_address_async, resolve_token_symbol, CHAIN_IDS, load_token_map
+from app.medusa_core.balance import confirmations_since_async, get_transaction_confirmations_async, head_tracker
+from app.medusa_core.confirmations import confirmation_tracker
+from app.medusa_core.prices import price_service
+from app.medusa_core.route_index import route_index
+from app.medusa_core.stream_hub import hub as stream_hub, swap_channel, wallet_channel
+from app.medusa_core.idempotency import IdempotencyError, fingerprint, idempotency_store
+from app.db.db import (
+    db,
+    async_db,
+    close_async_client,
+    redis_client,
+    scheduler,
+    check_connections,
+    ensure_indexes,
+    mongo_available,
+    redis_available,
+    start_schedulers,
+    shutdown_schedulers,
+)
+from app.utils.error_handling import handle_agent_error, handle_agent_error_sync
+from app.medusa_core.http import close_session
+from app.core.instrumentation import PrometheusMiddleware, WEBSOCKET_CONNECTIONS, cache_result
+from app.core.tracing import TracingMiddleware, tracer
 from app.repositories.swap_repository import SwapRepository
+from app.repositories.async_repositories import (
+    AsyncSwapMetricsRepository,
+    AsyncSwapQuoteRepository,
+    AsyncSwapRepository,
+)
+from app.schedulers.cluster import add_distributed_job, cluster
 
-import re
-
-def _is_evm_address(address: str) -> bool:
-    """Return True if the address looks like an EVM address."""
-    return bool(re.fullmatch(r"0x[a-fA-F0-9]{40}", address or ""))
-
-
-def _is_solana_address(address: str) -> bool:
-    """Return True if the address looks like a Solana address."""
-    if not isinstance(address, str) or address.startswith("0x"):
-        return False
-    try:
-        import base58
-        decoded = base58.b58decode(address)
-    except Exception:
-        return False
-    return len(decoded) == 32
-
-
-def is_address(address: str) -> bool:
-    """Basic non-empty address check."""
-    return isinstance(address, str) and len(address) > 0
-
-
-def is_address_for_chain(address: str, chain_id: int) -> bool:
-    """Validate the address format for the given chain."""
-    chain_name = CHAIN_IDS.get(chain_id, "").lower()
-    if chain_name == "solana":
-        return _is_solana_address(address)
-    return _is_evm_address(address)
+from app.utils.addresses import is_address, is_address_for_chain
 
 
 # Load environment variables from .env file
@@ -73,8 +74,57 @@ logger = logging.getLogger(__name__)
 logger.debug("Log level set to %s", LOG_LEVEL)
 
 swap_repo = SwapRepository(db)
+async_swap_repo = AsyncSwapRepository(async_db)
+async_metrics_repo = AsyncSwapMetricsRepository(async_db)
+async_quote_repo = AsyncSwapQuoteRepository(async_db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Accept traffic immediately and warm dependencies in the background."""
+    from app.core.metrics import start_metrics_collection
+    from app.core.dca_engine import start_dca_engine
+    from app.core.startup import warm_up
+    from app.core.health_probe import prober
+    from app.db_validator import RUN_ON_STARTUP, run_database_validation
+
+    concurrent = [
+        ("connections", check_connections),
+        ("indexes", lambda: (ensure_indexes(), swap_repo.ensure_indexes())),
+        ("token_map", load_token_map),
+        ("metrics", start_metrics_collection),
+    ]
+    # Database validation runs before anything that reads jobs
+    chain = [
+        ("schedulers", start_schedulers),
+        ("dca_engine", start_dca_engine),
+        ("cluster", cluster.start),
+    ]
+    if RUN_ON_STARTUP:
+        chain.insert(0, ("db_validation", lambda: run_database_validation(db)))
+
+    warmup = asyncio.create_task(warm_up(concurrent, [chain]))
+    prober.start()
+    price_service.start()
+    confirmation_tracker.start()
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        await prober.stop()
+        await price_service.stop()
+        await confirmation_tracker.stop()
+        await head_tracker.stop()
+        cleanup()
+        await close_async_client()
+        await close_session()
+        tracer.shutdown()
+
+
+app = FastAPI(title="Cross-Chain Swap API", lifespan=lifespan)
 
-app = FastAPI(title="Cross-Chain Swap API")
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -84,11 +134,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from .routers import basket, metrics as metrics_router, events as events_router, health as health_router
+from .routers import basket, metrics as metrics_router, events as events_router, health as health_router, quotes as quotes_router, stream as stream_router
 app.include_router(basket.router)
 app.include_router(metrics_router.router)
 app.include_router(events_router.router)
 app.include_router(health_router.router)
+app.include_router(quotes_router.router)
+app.include_router(stream_router.router)
 
 
 
@@ -100,20 +152,6 @@ app.include_router(health_router.router)
 #     "optimism": 10,
 # }
 
-@app.on_event("startup")
-def _reload_jobs():
-    from app.core.metrics import start_metrics_collection
-    from app.db_validator import run_database_validation
-
-    # Run database validation first
-    run_database_validation(db)
-
-    # Ensure indexes for swaps collection
-    swap_repo.ensure_indexes()
-
-    start_metrics_collection()
-    load_token_map()
-
 # Relay API configuration (public endpoints)
 RELAY_BASE_URL = os.getenv("RELAY_BASE_URL", "https://api.relay.link")
 
@@ -151,10 +189,38 @@ class SwapTrackRequest(BaseModel):
 def read_root():
     return {"message": "Cross-Chain Swap API"}
 
+async def _idempotent(scope: str, key: str | None, req: BaseModel, run: Callable[[], Awaitable[Any]]):
+    """Run ``run`` once per ``Idempotency-Key``; retries get the stored response."""
+    if key is None:
+        return await run()
+    body_hash = fingerprint(req.model_dump())
+    try:
+        replay = await idempotency_store.begin(scope, key, body_hash)
+    except IdempotencyError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.message)
+    if replay is not None:
+        return JSONResponse(replay, headers={"Idempotent-Replayed": "true"})
+    try:
+        response = await run()
+    except BaseException:
+        await idempotency_store.abandon(scope, key)
+        raise
+    await idempotency_store.complete(scope, key, body_hash, jsonable_encoder(response))
+    return response
+
+
 @app.post("/swap", summary="Create swap quote")
-def create_swap(req: SwapRequest):
-    """Proxy to Relay /quote and store the raw quote."""
-    if db is None:
+async def create_swap(req: SwapRequest, idempotency_key: str | None = Header(default=None)):
+    """Proxy to Relay /quote and store the raw quote.
+
+    Retries sent with the same ``Idempotency-Key`` header return the first
+    response without requesting another quote or storing another swap.
+    """
+    return await _idempotent("swap", idempotency_key, req, lambda: _create_swap(req))
+
+
+async def _create_swap(req: SwapRequest):
+    if not mongo_available():
         raise HTTPException(status_code=500, detail="Database not available")
     try:
         src_chain = int(req.source_chain)
@@ -164,8 +230,15 @@ def create_swap(req: SwapRequest):
         raise HTTPException(status_code=422, detail="invalid chain ids")
     if not is_address_for_chain(req.user, src_chain) or not is_address_for_chain(req.receiver, dst_chain):
         raise HTTPException(status_code=422, detail="invalid address")
-    params = {"originChainId": src_chain, "destinationChainId": dst_chain, "inputToken": resolve_token_address(src_chain, req.token_in), "outputToken": resolve_token_address(dst_chain, req.token_out), "inputAmount": req.amount, "user": req.user, "receiver": req.receiver, "tradeType": "EXACT_INPUT"}
-    quote = relay_get_quote(params)
+    rejected = route_index.check_chains(src_chain, dst_chain)
+    if rejected is not None:
+        raise HTTPException(status_code=422, detail=rejected["message"])
+    params = {"originChainId": src_chain, "destinationChainId": dst_chain, "inputToken": await resolve_token_address_async(src_chain, req.token_in), "outputToken": await resolve_token_address_async(dst_chain, req.token_out), "inputAmount": req.amount, "user": req.user, "receiver": req.receiver, "tradeType": "EXACT_INPUT"}
+    rejected = route_index.check(params)
+    if rejected is not None:
+        raise HTTPException(status_code=422, detail=rejected["message"])
+    quote = await relay_get_quote_async(params)
+    route_index.record(params, quote)
     if not quote:
         raise HTTPException(status_code=502, detail="quote unavailable")
     doc = {
@@ -176,12 +249,13 @@ def create_swap(req: SwapRequest):
         "token_out": req.token_out,
         "amount": req.amount,
         "receiver": req.receiver,
-        "quote": quote,
         "status": "new",
     }
     if chain_id is not None:
         doc["chain_id"] = chain_id
-    swap_id = swap_repo.create(doc)
+    doc["_id"] = ObjectId()
+    doc["quote_id"] = await async_quote_repo.create(doc["_id"], quote)
+    swap_id = await async_swap_repo.create(doc)
     container = quote.get("result") if isinstance(quote.get("result"), dict) else quote
     steps = []
     for step in container.get("steps", []):
@@ -200,90 +274,150 @@ def create_swap(req: SwapRequest):
     return {"status": "success", "ok":True, "steps": quote.get('steps'), "swap_id": swap_id, "fees":quote.get("fees"), "details":quote.get("details")}
 
 @app.get("/balances/{walletAddress}")
-async def fetch_balances(walletAddress:str):
+async def fetch_balances(walletAddress:str, usd: bool = False):
+    """Token balances of a wallet; with ``usd=true`` priced, with a USD total."""
     result = await BalanceProvider.resolve_balances(walletAddress)
-    print(result)
+    logger.debug("Resolved %d balances for %s", len(result), walletAddress, extra=SAMPLED)
+    if usd:
+        return await price_service.value_balances(result)
     return result
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _conditional(body: Dict[str, Any], etag: str, if_none_match: str | None) -> Response:
+    """Send ``body`` with its ETag, or 304 when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(body), headers=headers)
+
+
 @app.get("/swap/{swap_id}")
-def get_swap(swap_id: str):
-    """Retrieve a swap by ID"""
-    if db is None:
+async def get_swap(
+    swap_id: str,
+    include_quote: bool = True,
+    if_none_match: str | None = Header(default=None),
+):
+    """Retrieve a swap by ID; ``include_quote=false`` skips loading the raw quote.
+
+    Served from the swap summary cache. Send the returned ``ETag`` back as
+    ``If-None-Match`` to get a 304 while the swap is unchanged.
+    """
+    if not mongo_available():
         raise HTTPException(status_code=500, detail="Database not available")
 
-    doc = swap_repo.get(swap_id)
+    doc = await async_swap_repo.get_summary(swap_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Swap not found")
-
-    return {
+    # The quote never changes once stored, so the summary's ETag covers it
+    etag = f'"{doc["etag"]}{"-q" if include_quote else ""}"'
+    if _etag_matches(if_none_match, etag):
+        return _conditional({}, etag, if_none_match)
+
+    quote = None
+    if include_quote:
+        # Summaries only carry ``quote_id``; swaps stored before quotes moved out keep theirs inline
+        source = doc if doc.get("quote_id") else await async_swap_repo.get(swap_id, {"quote": 1}) or {}
+        quote = await async_quote_repo.load(source)
+
+    return _conditional({
         "swap_id": str(doc.get("_id")),
         "status": doc.get("status"),
-        "quote": doc.get("quote"),
+        "quote": quote,
         "execution": doc.get("execution"),
         "created_at": doc.get("created_at"),
         "executed_at": doc.get("executed_at"),
         "updated_at": doc.get("updated_at"),
-    }
+    }, etag, None)
 
 @app.get("/swap/{swap_id}/status", summary="Get swap status")
-def swap_status(swap_id: str):
-    if db is None:
+async def swap_status(swap_id: str, if_none_match: str | None = Header(default=None)):
+    if not mongo_available():
         raise HTTPException(status_code=500, detail="Database not available")
-    doc = swap_repo.get(swap_id)
+    doc = await async_swap_repo.get_summary(swap_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Swap not found")
     txh = doc.get("tx_hash")
     confirmations = None
     if txh and doc.get("dst_chain") is not None:
-        confirmations = get_transaction_confirmations(int(doc["dst_chain"]), txh)
-    return {
+        if doc.get("block_number") is not None:
+            # Mined block recorded by the confirmation tracker; no receipt lookup needed
+            confirmations = await confirmations_since_async(int(doc["dst_chain"]), doc["block_number"])
+        else:
+            confirmations = await get_transaction_confirmations_async(int(doc["dst_chain"]), txh)
+    # Confirmations move with the chain head, so they are part of the ETag
+    etag = f'"{doc["etag"]}-{confirmations}"'
+    return _conditional({
         "status": doc.get("status"),
         "tx_hash": txh,
         "confirmations": confirmations,
         "chain_id": doc.get("chain_id"),
-    }
+    }, etag, if_none_match)
+
+
+async def _until_closed(websocket: WebSocket) -> None:
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
 
 
 @app.websocket("/ws/swaps/{swap_id}")
 async def swap_ws(websocket: WebSocket, swap_id: str):
-    """Stream swap status updates via WebSocket."""
+    """Stream swap status updates via WebSocket.
+
+    For many swaps at once use ``/ws/stream``, which multiplexes them over
+    one connection.
+    """
     await websocket.accept()
-    if not redis_client:
+    if not redis_available():
         await websocket.close()
         return
 
-    channel = f"swap:{swap_id}"
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(channel)
+    channel = swap_channel(swap_id)
+    updates: asyncio.Queue = asyncio.Queue()
+    forward = lambda _channel, data: updates.put_nowait(data)
+    stream_hub.subscribe(channel, forward)
+    connections = WEBSOCKET_CONNECTIONS.labels(endpoint="/ws/swaps/{swap_id}")
+    connections.inc()
+    closed = asyncio.create_task(_until_closed(websocket))
     try:
-        while True:
-            msg = await asyncio.to_thread(
-                pubsub.get_message, ignore_subscribe_messages=True, timeout=1
-            )
-            if msg and msg.get("type") == "message":
-                data = msg.get("data")
-                if isinstance(data, bytes):
-                    data = data.decode()
-                await websocket.send_text(str(data))
-            await asyncio.sleep(0.1)
+        while not closed.done():
+            update = asyncio.create_task(updates.get())
+            await asyncio.wait({update, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if not update.done():
+                update.cancel()
+                break
+            await websocket.send_text(update.result())
     except WebSocketDisconnect:
         pass
     finally:
-        pubsub.close()
+        connections.dec()
+        closed.cancel()
+        stream_hub.unsubscribe(channel, forward)
+
 
 
 
 
+# Poll interval is 5s; a poll is never repeated by another replica within this window
+SWAP_POLL_HOLD_MS = 4_000
+
 
 def poll_swap_status(metric_id: str, endpoint: str) -> None:
     """Poll the provided endpoint for swap completion."""
-    if db is None:
+    if not mongo_available():
         return
     try:
         doc = db.swap_metrics.find_one({"_id": ObjectId(metric_id)})
         if not doc:
-            if scheduler:
-                scheduler.remove_job(f"swap_track_{metric_id}")
+            scheduler.remove_job(f"swap_track_{metric_id}")
             return
 
         count = int(doc.get("poll_count", 0)) + 1
@@ -302,7 +436,7 @@ def poll_swap_status(metric_id: str, endpoint: str) -> None:
                 if isinstance(status, str) and status.lower() in {"completed", "success", "failed", "error", "reverted", "cancelled"}:
                     final = True
         except Exception as exc:
-            asyncio.run(handle_agent_error("SwapTracker", exc))
+            handle_agent_error_sync("SwapTracker", exc)
 
         if count >= 12 and not final:
             status = "timeout"
@@ -319,30 +453,52 @@ def poll_swap_status(metric_id: str, endpoint: str) -> None:
             update["completed_at"] = datetime.utcnow()
         db.swap_metrics.update_one({"_id": ObjectId(metric_id)}, {"$set": update})
 
-        if redis_client:
+        swap_id = doc.get("swap_id")
+        if swap_id and (status != doc.get("status") or tx_hash != doc.get("txHash")):
+            # Mirror progress onto the swap; update() also drops its cached summary
+            fields = {"status": status}
+            if tx_hash:
+                fields["tx_hash"] = tx_hash
+            swap_repo.update(swap_id, fields)
+
+        if swap_id and redis_available():
             try:
-                swap_id = doc.get("swap_id")
-                if swap_id:
-                    payload = {"swap_id": swap_id, "status": status}
-                    if tx_hash:
-                        payload["txHash"] = tx_hash
-                    if final:
-                        payload["final"] = True
-                    redis_client.publish(f"swap:{swap_id}", json.dumps(payload))
+                payload = {"swap_id": swap_id, "status": status}
+                if tx_hash:
+                    payload["txHash"] = tx_hash
+                if final:
+                    payload["final"] = True
+                message = json.dumps(payload)
+                channels = {swap_channel(swap_id)}
+                channels.update(wallet_channel(w) for w in (doc.get("from_wallet"), doc.get("to_wallet")) if w)
+                pipe = redis_client.pipeline(transaction=False)
+                for channel in channels:
+                    pipe.publish(channel, message)
+                pipe.execute()
             except Exception as pub_exc:
                 logger.error("Redis publish failed: %s", pub_exc)
 
-        if final and scheduler:
+        if final:
             scheduler.remove_job(f"swap_track_{metric_id}")
     except Exception as exc:
         logger.exception("Error polling swap status")
-        asyncio.run(handle_agent_error("SwapTracker", exc))
+        handle_agent_error_sync("SwapTracker", exc)
 
 
 @app.post("/swap/track")
-def track_swap(req: SwapTrackRequest):
-    if db is None:
-        return {"status": "error", "message": "Database not available"}
+async def track_swap(req: SwapTrackRequest, idempotency_key: str | None = Header(default=None)):
+    """Start polling a swap's status endpoint.
+
+    A swap is tracked once per ``(swap_id, endpoint)``: repeated calls return
+    the existing tracker instead of scheduling another poller.
+    """
+    return await _idempotent("swap_track", idempotency_key, req, lambda: _track_swap(req))
+
+
+async def _track_swap(req: SwapTrackRequest):
+    # Raised, not returned, so the idempotency key is released for a retry
+    if not mongo_available():
+        raise HTTPException(status_code=503, detail="Database not available")
 
     doc = req.model_dump() if hasattr(req, "model_dump") else req.dict()
     doc.update({
@@ -353,44 +509,58 @@ def track_swap(req: SwapTrackRequest):
         "completed_at": None,
     })
     metric = SwapMetric(**doc)
-    result = db.swap_metrics.insert_one(metric.model_dump())
-    doc_id = str(result.inserted_id)
+    doc_id, created = await async_metrics_repo.create_once(
+        {"swap_id": req.swap_id, "endpoint": req.endpoint}, metric.model_dump()
+    )
+    if not created:
+        logger.info("Swap %s already tracked as %s", req.swap_id, doc_id)
+        return {"status": "tracking", "id": doc_id, "duplicate": True}
 
-    if scheduler:
-        try:
-            scheduler.add_job(
-                poll_swap_status,
-                "interval",
-                seconds=5,
-                id=f"swap_track_{doc_id}",
-                args=[doc_id, doc.get("endpoint")],
-            )
-        except Exception as exc:
-            asyncio.run(handle_agent_error("SwapTracker", exc))
+    try:
+        await asyncio.to_thread(
+            add_distributed_job,
+            poll_swap_status,
+            "interval",
+            f"swap_track_{doc_id}",
+            [doc_id, doc.get("endpoint")],
+            once_ms=SWAP_POLL_HOLD_MS,
+            seconds=5,
+        )
+    except Exception as exc:
+        await handle_agent_error("SwapTracker", exc)
+        # Without its poller the tracker would block every retry as a duplicate
+        await async_metrics_repo.delete(doc_id)
+        raise HTTPException(status_code=503, detail="Could not schedule swap tracking")
 
     return {"status": "tracking", "id": doc_id}
 
 @app.get("/history")
-def history(user: str | None = None):
-    if redis_client:
-        cache_key = f"history:{user}" if user else "history:all"
-        cached = redis_client.get(cache_key)
-        if cached:
-            return json.loads(str(cached))
-
-    if db is None:
+async def history(user: str | None = None):
+    cache_key = f"history:{user}" if user else "history:all"
+    if redis_available():
+        try:
+            cached = await asyncio.to_thread(redis_client.get, cache_key)
+            cache_result("history", bool(cached))
+            if cached:
+                return json.loads(cached)
+        except Exception as exc:
+            logger.error("History cache read failed: %s", exc)
+
+    if not mongo_available():
         return {"swaps": []}
 
-    query = {"user": user} if user else {}
     result = {
-        "swaps": list(db.swaps.find(query, {"_id": 0}).sort("_id", -1)),
+        "swaps": await async_swap_repo.history(user),
     }
-    if redis_client:
-        redis_client.setex(cache_key, 60, json.dumps(jsonable_encoder(result)))
+    if redis_available():
+        try:
+            await asyncio.to_thread(redis_client.setex, cache_key, 60, json.dumps(jsonable_encoder(result)))
+        except Exception as exc:
+            logger.error("History cache write failed: %s", exc)
     return result
 
 @app.get("/quote")
-def get_quote(
+async def get_quote(
     source_chain: str,
     destination_chain: str,
     token_in: str,
@@ -401,8 +571,10 @@ def get_quote(
 ):
     """Get quote from Relay API"""
     try:
-        logger.info(
-            f"Quote request - src:{source_chain} dst:{destination_chain} token_in:{token_in} token_out:{token_out} amount:{amount}"
+        logger.debug(
+            "Quote request - src:%s dst:%s token_in:%s token_out:%s amount:%s",
+            source_chain, destination_chain, token_in, token_out, amount,
+            extra=SAMPLED,
         )
 
         src_chain_id = int(source_chain)
@@ -420,106 +592,69 @@ def get_quote(
 
         # Use chain IDs directly
         if not src_chain_id:
-            logger.error(f"Source chain: {src_chain_id} is not available ")
+            logger.error("Source chain: %s is not available", src_chain_id)
             raise HTTPException(status_code=404,detail="Src chain not supported")
         if not dst_chain_id:
-            logger.error(f"Destination chain: {dst_chain_id} is not available ")
+            logger.error("Destination chain: %s is not available", dst_chain_id)
             raise HTTPException(status_code=404,detail="Dest chain not supported")
         input_amount = amount
-        
+
+        # Before resolving symbols: an unknown chain would refresh the token map
+        rejected = route_index.check_chains(src_chain_id, dst_chain_id)
+        if rejected is not None:
+            return {"status": "error", **rejected}
+
         params = {
             "originChainId": int(source_chain),
             "destinationChainId": int(destination_chain),
-            "inputToken": resolve_token_address(src_chain_id, token_in),
-            "outputToken": resolve_token_address(dst_chain_id, token_out),
+            "inputToken": await resolve_token_address_async(src_chain_id, token_in),
+            "outputToken": await resolve_token_address_async(dst_chain_id, token_out),
             "inputAmount": input_amount,
             "user": user_address,
             "receiver": receiver_address or user_address,
             "tradeType": "EXACT_INPUT",
         }
         
-        # Use standardized relay function
-        quote_data = relay_get_quote(params)
-
-        result_data = None
-        if isinstance(quote_data, dict):
-            if "result" in quote_data:
-                result_data = quote_data.get("result")
-            elif "steps" in quote_data or "details" in quote_data:
-                # Latest API returns the quote directly with these fields
-                result_data = quote_data
-            elif quote_data.get("status") == "error" and isinstance(quote_data.get("message"), dict):
-                # Relay sometimes returns status "error" while providing the quote
-                result_data = quote_data.get("message")
-
-        if result_data:
-            logger.info("Quote retrieved successfully")
-
-            # Extract essential fields for the frontend
-            result = result_data
-            output_amount = None
-            output_token = None
-            output_value_usd = None
-
-            if isinstance(result, dict):
-                if "outputAmount" in result:
-                    output_amount = result.get("outputAmount")
-                    output_token = result.get("outputToken")
-                    output_value_usd = result.get("outputValueInUsd")
-                elif "details" in result:
-                    out = result.get("details", {}).get("currencyOut", {})
-                    output_amount = out.get("amount")
-                    output_token = out.get("currency")
-                    output_value_usd = out.get("amountUsd")
-                elif "output" in result:
-                    out = result.get("output", {})
-                    output_amount = out.get("amount")
-                    output_token = out.get("token")
-                    output_value_usd = out.get("valueInUsd")
-
-            simplified = {"outputAmount": output_amount}
-            if output_token is not None:
-                simplified["outputToken"] = output_token
-            if output_value_usd is not None:
-                simplified["outputValueInUsd"] = output_value_usd
+        rejected = route_index.check(params)
+        if rejected is not None:
+            return {"status": "error", **rejected}
+
+        # Ask every active provider and keep the best quote
+        aggregated = await providers.quote(params)
+        simplified = aggregated["quote"]
 
+        if simplified is not None:
+            logger.debug("Quote retrieved successfully from %s", aggregated["provider"], extra=SAMPLED)
             return {
                 "status": "success",
                 "quote": simplified
             }
         else:
             logger.error(
-                "Failed to get quote from Relay - params:%s response:%s",
+                "Failed to get quote - params:%s response:%s",
                 {k: params[k] for k in params if k not in {"user", "receiver"}},
-                quote_data,
+                aggregated["message"],
             )
-            message = None
-            if isinstance(quote_data, dict):
-                message = quote_data.get("message") or quote_data.get("error")
             return {
                 "status": "error",
-                "message": message or quote_data,
+                "message": aggregated["message"],
                 "code": "QUOTE_FAILED",
             }
     except Exception as e:
         logger.exception("Error getting quote")
-        asyncio.run(handle_agent_error("CrossChainSwapRouter", e))
+        await handle_agent_error("CrossChainSwapRouter", e)
         return {
             "status": "error",
             "message": f"Error getting quote: {str(e)}"
         }
 
 @app.get("/chains")
-def get_supported_chains():
+async def get_supported_chains():
     """Get supported chains from Relay API."""
     try:
-        response = requests.get(
-            f"{RELAY_BASE_URL}/chains",
-            timeout=10,
-        )
+        status_code, data = await get_chains_async()
 
-        if response.ok:
-            data = response.json()
+        if status_code < 400 and isinstance(data, dict):
             chains = data.get("chains")
             if chains is None:
                 chains = data.get("result", [])
@@ -542,28 +677,24 @@ def get_supported_chains():
 
         return {
             "status": "error",
-            "message": f"Failed to fetch chains: {response.status_code}",
-            "details": response.text,
+            "message": f"Failed to fetch chains: {status_code}",
+            "details": data,
         }
 
     except Exception as e:
-        asyncio.run(handle_agent_error("CrossChainSwapRouter", e))
+        await handle_agent_error("CrossChainSwapRouter", e)
         return {
             "status": "error",
             "message": f"Error fetching chains: {str(e)}",
         }
 
 @app.get("/tokens/{chain_id}")
-def get_tokens_for_chain(chain_id: int):
+async def get_tokens_for_chain(chain_id: int):
     """Get tokens for a specific chain from Relay API."""
     try:
-        response = requests.get(
-            f"{RELAY_BASE_URL}/chains",
-            timeout=10,
-        )
+        status_code, data = await get_chains_async()
 
-        if response.ok:
-            data = response.json()
+        if status_code < 400 and isinstance(data, dict):
             if "chains" not in data and "result" in data and isinstance(data["result"], list) and not any(isinstance(i, dict) and "id" in i for i in data["result"]):
                 # Fallback for legacy /tokens response used in tests
                 return {"status": "success", "tokens": data["result"]}
@@ -599,12 +730,12 @@ def get_tokens_for_chain(chain_id: int):
 
         return {
             "status": "error",
-            "message": f"Failed to fetch tokens: {response.status_code}",
-            "details": response.text,
+            "message": f"Failed to fetch tokens: {status_code}",
+            "details": data,
         }
 
     except Exception as e:
-        asyncio.run(handle_agent_error("CrossChainSwapRouter", e))
+        await handle_agent_error("CrossChainSwapRouter", e)
         return {
             "status": "error",
             "message": f"Error fetching tokens: {str(e)}",
@@ -613,10 +744,8 @@ def get_tokens_for_chain(chain_id: int):
 
 # Cleanup on shutdown
 def cleanup():
-    if scheduler:
-        scheduler.shutdown()
-
-atexit.register(cleanup)
+    cluster.stop()
+    shutdown_schedulers()
 
 if __name__ == "__main__":
     import uvicorn
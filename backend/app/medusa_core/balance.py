@@ -2,8 +2,14 @@ import os
 import logging
 import requests
 import time
-from typing import Dict
+from typing import Any, Dict, List, Tuple
 
+from app.core.instrumentation import RPC_REQUEST_SECONDS, timed
+from app.core.tracing import traced
+from app.db.db import redis_client
+
+from .chain_head import HeadTracker, ReceiptCache, finality_depth
+from .http import request_json
 from .token_map import resolve_token_address
 from .relay import RELAY_BASE_URL
 
@@ -24,24 +30,27 @@ _RPC_CACHE: Dict[int, str] = {}
 _CACHE_TIMESTAMP: float = 0.0
 _CACHE_TTL = 3600  # 1 hour cache
 
+def _parse_rpc_urls(data: Dict) -> Dict[int, str]:
+    chains = data.get("chains") or []
+    rpc_map: Dict[int, str] = {}
+
+    for chain in chains:
+        chain_id = chain.get("id")
+        http_rpc_url = chain.get("httpRpcUrl")
+
+        if chain_id is not None and http_rpc_url:
+            rpc_map[int(chain_id)] = http_rpc_url
+            logger.debug("Cached RPC URL for chain %s: %s", chain_id, http_rpc_url)
+
+    return rpc_map
+
+
 def _fetch_rpc_urls_from_relay() -> Dict[int, str]:
     """Fetch RPC URLs dynamically from Relay API"""
     try:
         resp = requests.get(f"{RELAY_BASE_URL}/chains", timeout=10)
         if resp.ok and resp.headers.get("Content-Type", "").startswith("application/json"):
-            data = resp.json()
-            chains = data.get("chains") or []
-            rpc_map: Dict[int, str] = {}
-            
-            for chain in chains:
-                chain_id = chain.get("id")
-                http_rpc_url = chain.get("httpRpcUrl")
-                
-                if chain_id is not None and http_rpc_url:
-                    rpc_map[int(chain_id)] = http_rpc_url
-                    logger.debug(f"Cached RPC URL for chain {chain_id}: {http_rpc_url}")
-            
-            return rpc_map
+            return _parse_rpc_urls(resp.json())
         else:
             logger.error("Unexpected response from Relay API: %s", resp.text)
     except Exception as exc:
@@ -49,17 +58,24 @@ def _fetch_rpc_urls_from_relay() -> Dict[int, str]:
     
     return {}
 
-def _get_rpc_url(chain_id: int) -> str | None:
-    """Get RPC URL for a chain, with caching and fallback"""
-    global _RPC_CACHE, _CACHE_TIMESTAMP
-    
-    # Check if cache is expired or empty
-    now = time.time()
-    if now - _CACHE_TIMESTAMP > _CACHE_TTL or not _RPC_CACHE:
-        logger.info("Refreshing RPC URL cache from Relay API")
-        _RPC_CACHE = _fetch_rpc_urls_from_relay()
-        _CACHE_TIMESTAMP = now
-    
+
+async def _fetch_rpc_urls_from_relay_async() -> Dict[int, str]:
+    """Non-blocking :func:`_fetch_rpc_urls_from_relay`."""
+    try:
+        status, body, _ = await request_json("GET", f"{RELAY_BASE_URL}/chains")
+        if status < 400 and isinstance(body, dict):
+            return _parse_rpc_urls(body)
+        logger.error("Unexpected response from Relay API: %s", body)
+    except Exception as exc:
+        logger.error("Failed to fetch RPC URLs from Relay API: %s", exc)
+    return {}
+
+
+def _rpc_cache_stale() -> bool:
+    return time.time() - _CACHE_TIMESTAMP > _CACHE_TTL or not _RPC_CACHE
+
+
+def _resolve_rpc_url(chain_id: int) -> str | None:
     # Try dynamic RPC URL first
     if chain_id in _RPC_CACHE:
         return _RPC_CACHE[chain_id]
@@ -67,12 +83,42 @@ def _get_rpc_url(chain_id: int) -> str | None:
     # Fallback to environment variables
     fallback_url = FALLBACK_RPC_URLS.get(chain_id)
     if fallback_url:
-        logger.warning(f"Using fallback RPC URL for chain {chain_id}")
+        logger.warning("Using fallback RPC URL for chain %s", chain_id)
         return fallback_url
     
     logger.error(f"No RPC URL available for chain {chain_id}")
     return None
 
+
+def _get_rpc_url(chain_id: int) -> str | None:
+    """Get RPC URL for a chain, with caching and fallback"""
+    global _RPC_CACHE, _CACHE_TIMESTAMP
+    
+    # Check if cache is expired or empty
+    if _rpc_cache_stale():
+        logger.info("Refreshing RPC URL cache from Relay API")
+        _RPC_CACHE = _fetch_rpc_urls_from_relay()
+        _CACHE_TIMESTAMP = time.time()
+    return _resolve_rpc_url(chain_id)
+
+
+async def _get_rpc_url_async(chain_id: int) -> str | None:
+    """Non-blocking :func:`_get_rpc_url`."""
+    global _RPC_CACHE, _CACHE_TIMESTAMP
+
+    if _rpc_cache_stale():
+        logger.info("Refreshing RPC URL cache from Relay API")
+        _RPC_CACHE = await _fetch_rpc_urls_from_relay_async()
+        _CACHE_TIMESTAMP = time.time()
+    return _resolve_rpc_url(chain_id)
+
+
+def _rpc_span_attributes(chain_id: int, method: str, params: list) -> Dict[str, Any]:
+    return {"rpc.system": "jsonrpc", "rpc.method": method, "chain_id": chain_id}
+
+
+@timed(RPC_REQUEST_SECONDS, lambda chain_id, method, params: {"chain_id": chain_id, "method": method})
+@traced("rpc.call", _rpc_span_attributes, kind="client")
 def _rpc_call(chain_id: int, method: str, params: list) -> str | None:
     url = _get_rpc_url(chain_id)
     if not url:
@@ -95,8 +141,70 @@ def _rpc_call(chain_id: int, method: str, params: list) -> str | None:
         return None
 
 
+@timed(RPC_REQUEST_SECONDS, lambda chain_id, method, params: {"chain_id": chain_id, "method": method})
+@traced("rpc.call", _rpc_span_attributes, kind="client")
+async def _rpc_call_async(chain_id: int, method: str, params: list) -> Any:
+    """Non-blocking :func:`_rpc_call`."""
+    url = await _get_rpc_url_async(chain_id)
+    if not url:
+        logger.warning("No RPC URL configured for chain %s", chain_id)
+        return None
+    try:
+        status, body, _ = await request_json(
+            "POST",
+            url,
+            json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+        )
+        if status >= 400:
+            logger.error("RPC call failed for chain %s: HTTP %s", chain_id, status)
+            return None
+        if not isinstance(body, dict):
+            logger.error("Non-JSON RPC response for chain %s: %s", chain_id, body)
+            return None
+        return body.get("result")
+    except Exception as exc:
+        logger.error("RPC call failed for chain %s: %s", chain_id, exc)
+        return None
+
+
+def _rpc_batch_attributes(chain_id: int, calls: List[Tuple[str, list]]) -> Dict[str, Any]:
+    return {"rpc.system": "jsonrpc", "rpc.method": "batch", "chain_id": chain_id, "rpc.batch_size": len(calls)}
+
+
+@timed(RPC_REQUEST_SECONDS, lambda chain_id, calls: {"chain_id": chain_id, "method": "batch"})
+@traced("rpc.batch", _rpc_batch_attributes, kind="client")
+async def _rpc_batch_async(chain_id: int, calls: List[Tuple[str, list]]) -> List[Any] | None:
+    """Send ``(method, params)`` calls as one JSON-RPC batch.
+
+    Returns the results in call order, ``None`` for calls that errored, or
+    ``None`` overall if the request itself failed.
+    """
+    url = await _get_rpc_url_async(chain_id)
+    if not url:
+        logger.warning("No RPC URL configured for chain %s", chain_id)
+        return None
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+    try:
+        status, body, _ = await request_json("POST", url, json=payload)
+    except Exception as exc:
+        logger.error("RPC batch failed for chain %s: %s", chain_id, exc)
+        return None
+    if status >= 400 or not isinstance(body, list):
+        logger.error("RPC batch failed for chain %s: HTTP %s %s", chain_id, status, str(body)[:200])
+        return None
+    # Responses may come back in any order
+    results: List[Any] = [None] * len(calls)
+    for item in body:
+        if isinstance(item, dict) and isinstance(item.get("id"), int) and 0 <= item["id"] < len(calls):
+            results[item["id"]] = item.get("result")
+    return results
+
+
 def get_token_balance(chain_id: int, token: str, address: str) -> int | None:
-    logger.debug(f"get_token_balance called with chain_id={chain_id} (type={type(chain_id)})")
+    logger.debug("get_token_balance called with chain_id=%r", chain_id)
     if isinstance(chain_id, str):
         try:
             chain_id_int = int(chain_id)
@@ -125,7 +233,7 @@ def get_token_balance(chain_id: int, token: str, address: str) -> int | None:
 
 
 def get_allowance(chain_id: int, token: str, owner: str, spender: str) -> int | None:
-    logger.debug(f"get_allowance called with chain_id={chain_id} (type={type(chain_id)})")
+    logger.debug("get_allowance called with chain_id=%r", chain_id)
     if isinstance(chain_id, str):
         try:
             chain_id_int = int(chain_id)
@@ -155,17 +263,13 @@ def get_allowance(chain_id: int, token: str, owner: str, spender: str) -> int |
     except Exception:
         return None
 
-def get_transaction_confirmations(chain_id: int, tx_hash: str) -> int | None:
-    """Return confirmation count for a transaction."""
-    receipt = _rpc_call(chain_id, "eth_getTransactionReceipt", [tx_hash])
+def _confirmations(receipt: Any, current_hex: Any) -> int | None:
     if not receipt or not isinstance(receipt, dict) or receipt.get("blockNumber") is None:
         return 0
-    block_hex = receipt["blockNumber"]
     try:
-        receipt_block = int(block_hex, 16)
+        receipt_block = int(receipt["blockNumber"], 16)
     except Exception:
         return None
-    current_hex = _rpc_call(chain_id, "eth_blockNumber", [])
     if current_hex is None:
         return None
     try:
@@ -173,3 +277,51 @@ def get_transaction_confirmations(chain_id: int, tx_hash: str) -> int | None:
     except Exception:
         return None
     return max(current_block - receipt_block + 1, 0)
+
+
+@traced("chain.confirmations", lambda chain_id, tx_hash: {"chain_id": chain_id})
+def get_transaction_confirmations(chain_id: int, tx_hash: str) -> int | None:
+    """Return confirmation count for a transaction.
+
+    Uses the tracked chain head and cached final receipts when available.
+    """
+    receipt = receipt_cache.get(chain_id, tx_hash)
+    if receipt is None:
+        receipt = _rpc_call(chain_id, "eth_getTransactionReceipt", [tx_hash])
+    if not receipt or not isinstance(receipt, dict) or receipt.get("blockNumber") is None:
+        return 0
+    head = head_tracker.cached(chain_id)
+    current_hex = hex(head) if head is not None else _rpc_call(chain_id, "eth_blockNumber", [])
+    confirmations = _confirmations(receipt, current_hex)
+    if confirmations is not None and confirmations >= finality_depth(chain_id):
+        receipt_cache.put(chain_id, tx_hash, receipt)
+    return confirmations
+
+
+@traced("chain.confirmations", lambda chain_id, tx_hash: {"chain_id": chain_id})
+async def get_transaction_confirmations_async(chain_id: int, tx_hash: str) -> int | None:
+    """Non-blocking :func:`get_transaction_confirmations`.
+
+    Costs one RPC call (the receipt) while the chain head is tracked, and none
+    once the receipt is final and cached.
+    """
+    receipt = await receipt_cache.get_async(chain_id, tx_hash)
+    if receipt is None:
+        receipt = await _rpc_call_async(chain_id, "eth_getTransactionReceipt", [tx_hash])
+    if not receipt or not isinstance(receipt, dict) or receipt.get("blockNumber") is None:
+        return 0
+    head = await head_tracker.head(chain_id)
+    confirmations = _confirmations(receipt, hex(head) if head is not None else None)
+    if confirmations is not None and confirmations >= finality_depth(chain_id):
+        await receipt_cache.put_async(chain_id, tx_hash, receipt)
+    return confirmations
+
+
+async def confirmations_since_async(chain_id: int, block: int) -> int | None:
+    """Confirmations of a transaction mined in ``block``; needs only the chain head."""
+    head = await head_tracker.head(chain_id)
+    return max(head - int(block) + 1, 0) if head is not None else None
+
+
+head_tracker = HeadTracker(_rpc_call_async)
+receipt_cache = ReceiptCache(redis_client)
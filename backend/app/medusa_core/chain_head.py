@@ -0,0 +1,254 @@
+"""
+Per-chain block-head tracking and a finalized-receipt cache.
+
+Confirmation counts need the chain head. Rather than fetching
+``eth_blockNumber`` on every status request, :class:`HeadTracker` keeps one
+background task per chain that is being asked about. The task follows new
+heads over a WebSocket ``eth_subscribe("newHeads")`` subscription when a URL
+is configured in ``RPC_WS_URLS``. Otherwise it polls at the chain's block time.
+A chain nobody has asked about for ``HEAD_IDLE_SECONDS`` stops being tracked.
+
+Receipts never change once their block is final, so :class:`ReceiptCache`
+keeps them for good: in process, and in Redis so every replica shares them.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.instrumentation import cache_result
+from app.db.db import redis_available
+
+from .http import get_session
+
+logger = logging.getLogger(__name__)
+
+# Typical block times in seconds; the poll cadence follows them
+BLOCK_TIMES: Dict[int, float] = {
+    1: 12.0,
+    10: 2.0,
+    56: 3.0,
+    137: 2.0,
+    8453: 2.0,
+    42161: 0.25,
+    43114: 2.0,
+    11155111: 12.0,
+}
+DEFAULT_BLOCK_TIME = 5.0
+# Never poll more often than this, whatever the block time
+MIN_POLL_SECONDS = float(os.getenv("HEAD_MIN_POLL_SECONDS", "1"))
+HEAD_IDLE_SECONDS = float(os.getenv("HEAD_IDLE_SECONDS", "300"))
+
+# Confirmations after which a receipt is treated as final
+FINALITY_DEPTH: Dict[int, int] = {
+    1: 64,
+    56: 15,
+    137: 128,
+    11155111: 64,
+}
+DEFAULT_FINALITY_DEPTH = 64
+
+RECEIPT_CACHE_SIZE = int(os.getenv("RECEIPT_CACHE_SIZE", "10000"))
+RECEIPT_KEY = "receipt:{chain_id}:{tx_hash}"
+# Finalized receipts never change, but status pages for old swaps are rare
+RECEIPT_CACHE_TTL = int(os.getenv("RECEIPT_CACHE_TTL", str(30 * 86400)))
+
+RpcCall = Callable[[int, str, list], Awaitable[Any]]
+
+
+def _ws_urls() -> Dict[int, str]:
+    """Parse ``RPC_WS_URLS`` ("1=wss://...,137=wss://...")."""
+    urls: Dict[int, str] = {}
+    for item in os.getenv("RPC_WS_URLS", "").split(","):
+        chain, _, url = item.partition("=")
+        if chain.strip().isdigit() and url.strip():
+            urls[int(chain)] = url.strip()
+    return urls
+
+
+def poll_interval(chain_id: int) -> float:
+    return max(BLOCK_TIMES.get(chain_id, DEFAULT_BLOCK_TIME), MIN_POLL_SECONDS)
+
+
+def finality_depth(chain_id: int) -> int:
+    return FINALITY_DEPTH.get(chain_id, DEFAULT_FINALITY_DEPTH)
+
+
+class HeadTracker:
+    """Keep the latest block number for recently queried chains."""
+
+    def __init__(self, rpc: RpcCall, ws_urls: Dict[int, str] | None = None):
+        self._rpc = rpc
+        self.ws_urls = _ws_urls() if ws_urls is None else ws_urls
+        # chain_id -> (block number, monotonic time it was seen)
+        self._heads: Dict[int, Tuple[int, float]] = {}
+        self._last_used: Dict[int, float] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def cached(self, chain_id: int) -> Optional[int]:
+        """Return the tracked head if it is no older than two block intervals."""
+        entry = self._heads.get(chain_id)
+        if entry is None:
+            return None
+        block, seen = entry
+        if time.monotonic() - seen > 2 * poll_interval(chain_id) + MIN_POLL_SECONDS:
+            return None
+        return block
+
+    def _set(self, chain_id: int, block: int) -> None:
+        current = self._heads.get(chain_id)
+        # Ignore an older head reported by a lagging node
+        if current is None or block >= current[0]:
+            self._heads[chain_id] = (block, time.monotonic())
+
+    async def _fetch(self, chain_id: int) -> Optional[int]:
+        result = await self._rpc(chain_id, "eth_blockNumber", [])
+        try:
+            block = int(result, 16)
+        except (TypeError, ValueError):
+            return None
+        self._set(chain_id, block)
+        return block
+
+    async def head(self, chain_id: int) -> Optional[int]:
+        """Return the chain head, fetching it once if no fresh value is tracked."""
+        self._last_used[chain_id] = time.monotonic()
+        self._ensure_tracking(chain_id)
+        block = self.cached(chain_id)
+        cache_result("chain_head", block is not None)
+        if block is None:
+            block = await self._fetch(chain_id)
+        return block
+
+    def _ensure_tracking(self, chain_id: int) -> None:
+        task = self._tasks.get(chain_id)
+        if task is None or task.done():
+            self._tasks[chain_id] = asyncio.create_task(self._track(chain_id))
+
+    def _idle(self, chain_id: int) -> bool:
+        return time.monotonic() - self._last_used.get(chain_id, 0) > HEAD_IDLE_SECONDS
+
+    async def _track(self, chain_id: int) -> None:
+        try:
+            if chain_id in self.ws_urls:
+                try:
+                    await self._subscribe(chain_id, self.ws_urls[chain_id])
+                except Exception as exc:
+                    logger.warning("newHeads subscription for chain %s failed, polling: %s", chain_id, exc)
+            await self._poll(chain_id)
+        finally:
+            self._tasks.pop(chain_id, None)
+
+    async def _poll(self, chain_id: int) -> None:
+        interval = poll_interval(chain_id)
+        while not self._idle(chain_id):
+            await asyncio.sleep(interval)
+            try:
+                await self._fetch(chain_id)
+            except Exception as exc:
+                logger.error("Head poll failed for chain %s: %s", chain_id, exc)
+
+    async def _subscribe(self, chain_id: int, url: str) -> None:
+        async with get_session().ws_connect(url, heartbeat=30) as ws:
+            await ws.send_json(
+                {"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}
+            )
+            async for msg in ws:
+                if self._idle(chain_id):
+                    return
+                try:
+                    data = json.loads(msg.data)
+                    number = data["params"]["result"]["number"]
+                except (TypeError, ValueError, KeyError):
+                    continue
+                self._set(chain_id, int(number, 16))
+        raise ConnectionError("websocket closed")
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        now = time.monotonic()
+        return {
+            chain_id: {
+                "head": block,
+                "age_seconds": round(now - seen, 2),
+                "source": "ws" if chain_id in self.ws_urls else "poll",
+                "tracking": chain_id in self._tasks,
+            }
+            for chain_id, (block, seen) in self._heads.items()
+        }
+
+
+class ReceiptCache:
+    """Long-lived cache for receipts of finalized transactions.
+
+    Receipts stay in Redis for ``RECEIPT_CACHE_TTL`` seconds. While Redis is
+    unreachable only the in-process LRU is used.
+    """
+
+    def __init__(self, redis_client=None, size: int = RECEIPT_CACHE_SIZE, ttl: int = RECEIPT_CACHE_TTL):
+        self._redis = redis_client
+        self._size = size
+        self._ttl = ttl
+        self._local: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+
+    def _remember(self, key: Tuple[int, str], receipt: Dict[str, Any]) -> None:
+        self._local[key] = receipt
+        self._local.move_to_end(key)
+        while len(self._local) > self._size:
+            self._local.popitem(last=False)
+
+    def get(self, chain_id: int, tx_hash: str) -> Optional[Dict[str, Any]]:
+        receipt = self._get(chain_id, tx_hash)
+        cache_result("receipt", receipt is not None)
+        return receipt
+
+    def _get(self, chain_id: int, tx_hash: str) -> Optional[Dict[str, Any]]:
+        key = (chain_id, tx_hash.lower())
+        receipt = self._local.get(key)
+        if receipt is not None:
+            self._local.move_to_end(key)
+            return receipt
+        if self._redis is None or not redis_available():
+            return None
+        try:
+            raw = self._redis.get(RECEIPT_KEY.format(chain_id=chain_id, tx_hash=key[1]))
+        except Exception as exc:
+            logger.error("Receipt cache read failed: %s", exc)
+            return None
+        if not raw:
+            return None
+        receipt = json.loads(raw)
+        self._remember(key, receipt)
+        return receipt
+
+    def put(self, chain_id: int, tx_hash: str, receipt: Dict[str, Any]) -> None:
+        key = (chain_id, tx_hash.lower())
+        self._remember(key, receipt)
+        if self._redis is None or not redis_available():
+            return
+        try:
+            self._redis.set(
+                RECEIPT_KEY.format(chain_id=chain_id, tx_hash=key[1]), json.dumps(receipt), ex=self._ttl
+            )
+        except Exception as exc:
+            logger.error("Receipt cache write failed: %s", exc)
+
+    async def get_async(self, chain_id: int, tx_hash: str) -> Optional[Dict[str, Any]]:
+        receipt = self._local.get((chain_id, tx_hash.lower()))
+        if receipt is not None:
+            cache_result("receipt", True)
+            return receipt
+        return await asyncio.to_thread(self.get, chain_id, tx_hash)
+
+    async def put_async(self, chain_id: int, tx_hash: str, receipt: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.put, chain_id, tx_hash, receipt)
@@ -0,0 +1,241 @@
+"""
+Batched confirmation tracking for in-flight swaps.
+
+Instead of every status request asking the chain for its swap's receipt,
+:class:`ConfirmationTracker` follows all swaps whose transaction is not final
+yet, grouped by destination chain. On each new head of a chain it fetches the
+receipts still unknown in JSON-RPC batches of ``CONFIRMATION_BATCH_SIZE``;
+once a transaction's block is known its confirmations follow from the head
+alone. Receipts reaching finality are fetched once more to catch reorgs,
+then cached for good.
+
+Mined and finalized transactions are written to the swap documents in one
+bulk write per head, and every tracked swap's confirmation count is published
+to its ``swap:{id}`` channel and to the ``wallet:{address}`` channels of its
+sender and receiver. RPC cost grows with chains x blocks, not with
+pending swaps x polls. Only the scheduler leader tracks; the pending set is
+reloaded from Mongo every ``CONFIRMATION_REFRESH_SECONDS``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.db import async_db, redis_available, redis_client
+from app.repositories.async_repositories import AsyncSwapRepository
+from app.schedulers.cluster import cluster
+
+from .balance import _rpc_batch_async, head_tracker, receipt_cache
+from .chain_head import finality_depth, poll_interval
+from .stream_hub import swap_channel, wallet_channel
+
+logger = logging.getLogger(__name__)
+
+CONFIRMATION_BATCH_SIZE = int(os.getenv("CONFIRMATION_BATCH_SIZE", "100"))
+CONFIRMATION_REFRESH_SECONDS = float(os.getenv("CONFIRMATION_REFRESH_SECONDS", "15"))
+# Swaps older than this are not tracked anymore (the transaction was never mined)
+CONFIRMATION_MAX_AGE_HOURS = float(os.getenv("CONFIRMATION_MAX_AGE_HOURS", "24"))
+CONFIRMATION_MAX_PENDING = int(os.getenv("CONFIRMATION_MAX_PENDING", "50000"))
+
+_EVM_TX_HASH = re.compile(r"0x[0-9a-fA-F]{64}")
+
+
+def _block(receipt: Any) -> Optional[int]:
+    if not isinstance(receipt, dict) or receipt.get("blockNumber") is None:
+        return None
+    try:
+        return int(receipt["blockNumber"], 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def _receipt_status(receipt: Dict[str, Any]) -> Optional[str]:
+    return {"0x1": "success", "0x0": "reverted"}.get(receipt.get("status"))
+
+
+class ConfirmationTracker:
+    """Follow pending swap transactions per chain and check them once per block."""
+
+    def __init__(self, repo: AsyncSwapRepository, rpc_batch=_rpc_batch_async, heads=head_tracker, publisher=redis_client):
+        self._repo = repo
+        self._rpc_batch = rpc_batch
+        self._heads = heads
+        self._publisher = publisher
+        # chain_id -> tx hash (lower case) -> {"tx_hash", "swap_ids", "block", "receipt_status"},
+        # where "swap_ids" maps each swap to the wallet channels it is published on
+        self._pending: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._last_head: Dict[int, int] = {}
+        self._chains: Dict[int, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+        self._stats: Counter = Counter()
+
+    # -- pending set --------------------------------------------------------
+
+    async def refresh(self) -> None:
+        """Reload the pending set from Mongo, keeping what is already known."""
+        since = datetime.utcnow() - timedelta(hours=CONFIRMATION_MAX_AGE_HOURS)
+        docs = await self._repo.pending_confirmations(since, CONFIRMATION_MAX_PENDING)
+        pending: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for doc in docs:
+            tx_hash = doc.get("tx_hash")
+            if not isinstance(tx_hash, str) or not _EVM_TX_HASH.fullmatch(tx_hash):
+                continue
+            try:
+                chain_id = int(doc["dst_chain"])
+            except (TypeError, ValueError):
+                continue
+            key = tx_hash.lower()
+            known = self._pending.get(chain_id, {}).get(key)
+            entry = pending.setdefault(chain_id, {}).setdefault(key, {
+                "tx_hash": tx_hash,
+                "swap_ids": {},
+                "block": known["block"] if known else doc.get("block_number"),
+                "receipt_status": known["receipt_status"] if known else None,
+            })
+            wallets = (doc.get("user"), doc.get("receiver"))
+            entry["swap_ids"][str(doc["_id"])] = list(dict.fromkeys(wallet_channel(w) for w in wallets if w))
+        self._pending = pending
+        for chain_id in pending:
+            task = self._chains.get(chain_id)
+            if task is None or task.done():
+                self._chains[chain_id] = asyncio.create_task(self._follow(chain_id))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if cluster.is_leader:
+                    await self.refresh()
+                else:
+                    self._pending = {}
+            except Exception:
+                logger.exception("Confirmation tracker refresh failed")
+            await asyncio.sleep(CONFIRMATION_REFRESH_SECONDS)
+
+    async def _follow(self, chain_id: int) -> None:
+        try:
+            while self._pending.get(chain_id):
+                try:
+                    head = await self._heads.head(chain_id)
+                    if head is not None and head != self._last_head.get(chain_id):
+                        self._last_head[chain_id] = head
+                        await self.check(chain_id, head)
+                except Exception:
+                    logger.exception("Confirmation check failed for chain %s", chain_id)
+                await asyncio.sleep(poll_interval(chain_id))
+        finally:
+            self._chains.pop(chain_id, None)
+
+    # -- per block ------------------------------------------------------------
+
+    async def _receipts(self, chain_id: int, tx_hashes: List[str]) -> Dict[str, Any]:
+        receipts: Dict[str, Any] = {}
+        for start in range(0, len(tx_hashes), CONFIRMATION_BATCH_SIZE):
+            chunk = tx_hashes[start:start + CONFIRMATION_BATCH_SIZE]
+            results = await self._rpc_batch(chain_id, [("eth_getTransactionReceipt", [h]) for h in chunk])
+            self._stats["rpc_batches"] += 1
+            self._stats["receipts_requested"] += len(chunk)
+            # A failed batch leaves its transactions as they were until the next block
+            if results is not None:
+                receipts.update(zip(chunk, results))
+        return receipts
+
+    async def check(self, chain_id: int, head: int) -> None:
+        """Update every pending transaction on ``chain_id`` for block ``head``."""
+        entries = self._pending.get(chain_id, {})
+        depth = finality_depth(chain_id)
+        # Unmined transactions, plus mined ones about to be final: confirm they were not reorged out
+        ask = [
+            key for key, entry in entries.items()
+            if entry["block"] is None or head - entry["block"] + 1 >= depth
+        ]
+        receipts = await self._receipts(chain_id, ask) if ask else {}
+        self._stats["checks"] += 1
+
+        updates: Dict[str, Dict[str, Any]] = {}
+        messages: List[Tuple[List[str], Dict[str, Any]]] = []
+        finalized: List[Tuple[str, Dict[str, Any]]] = []
+        for key, entry in list(entries.items()):
+            fields: Dict[str, Any] = {}
+            if key in receipts:
+                receipt = receipts[key]
+                block = _block(receipt)
+                if block != entry["block"]:
+                    entry["block"] = block
+                    entry["receipt_status"] = _receipt_status(receipt) if block is not None else None
+                    fields.update({"block_number": block, "receipt_status": entry["receipt_status"]})
+            if entry["block"] is None:
+                for swap_id in entry["swap_ids"]:
+                    if fields:
+                        updates[swap_id] = fields
+                continue
+
+            confirmations = max(head - entry["block"] + 1, 0)
+            final = key in receipts and confirmations >= depth
+            if final:
+                fields.update({"finalized": True, "confirmations": confirmations})
+                finalized.append((entry["tx_hash"], receipts[key]))
+                del entries[key]
+            for swap_id, channels in entry["swap_ids"].items():
+                if fields:
+                    updates[swap_id] = fields
+                payload = {
+                    "swap_id": swap_id,
+                    "txHash": entry["tx_hash"],
+                    "confirmations": confirmations,
+                    "receipt_status": entry["receipt_status"],
+                }
+                if final:
+                    payload["finalized"] = True
+                messages.append(([swap_channel(swap_id), *channels], payload))
+
+        if updates:
+            await self._repo.bulk_update(updates)
+        for tx_hash, receipt in finalized:
+            await receipt_cache.put_async(chain_id, tx_hash, receipt)
+        self._stats["finalized"] += len(finalized)
+        if messages:
+            await asyncio.to_thread(self._publish, messages)
+
+    def _publish(self, messages: List[Tuple[List[str], Dict[str, Any]]]) -> None:
+        if not redis_available():
+            return
+        try:
+            pipe = self._publisher.pipeline(transaction=False)
+            for channels, payload in messages:
+                message = json.dumps(payload)
+                for channel in channels:
+                    pipe.publish(channel, message)
+            pipe.execute()
+        except Exception as exc:
+            logger.error("Publishing %d confirmation updates failed: %s", len(messages), exc)
+
+    # -- lifecycle ----------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._chains.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._chains.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "chains": {
+                chain_id: {"pending": len(entries), "head": self._last_head.get(chain_id)}
+                for chain_id, entries in self._pending.items()
+            },
+        }
+
+
+confirmation_tracker = ConfirmationTracker(AsyncSwapRepository(async_db))
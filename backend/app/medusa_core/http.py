@@ -0,0 +1,76 @@
+"""
+Shared non-blocking HTTP client.
+
+Request handlers must not call ``requests`` from the event loop, and opening
+an ``aiohttp.ClientSession`` per call throws away keep-alive connections and
+DNS caching. :func:`get_session` returns one pooled session per event loop
+(uvicorn runs a single loop, but background jobs may run their own).
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Tuple
+from weakref import WeakKeyDictionary
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "50"))
+DEFAULT_TIMEOUT = 10
+
+_sessions: "WeakKeyDictionary[asyncio.AbstractEventLoop, ClientSession]" = WeakKeyDictionary()
+
+
+def get_session() -> ClientSession:
+    """Return the pooled session bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = ClientSession(
+            connector=TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=300,
+            ),
+            timeout=ClientTimeout(total=DEFAULT_TIMEOUT),
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_session() -> None:
+    """Close the running loop's session; called from the application lifespan."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def request_json(
+    method: str,
+    url: str,
+    *,
+    timeout: float = DEFAULT_TIMEOUT,
+    **kwargs: Any,
+) -> Tuple[int, Any, Dict[str, str]]:
+    """Send a request and return ``(status, body, headers)``.
+
+    ``body`` is the decoded JSON when the response is JSON, otherwise the
+    response text. Network errors propagate to the caller.
+    """
+    session = get_session()
+    async with session.request(
+        method, url, timeout=ClientTimeout(total=timeout), **kwargs
+    ) as resp:
+        if resp.content_type == "application/json":
+            body = await resp.json()
+        else:
+            text = await resp.text()
+            try:
+                body = json.loads(text)
+            except ValueError:
+                body = text
+        return resp.status, body, dict(resp.headers)
@@ -0,0 +1,172 @@
+"""
+Idempotency keys for mutating endpoints.
+
+Clients send an ``Idempotency-Key`` header with ``POST /swap`` and
+``POST /swap/track``; retries carrying the same key get the first response
+back instead of repeating the side effects (Relay quote, Mongo insert,
+poller job). Keys live in Redis so every replica sees them:
+
+* ``begin`` claims the key with ``SET NX`` and a short pending TTL. A retry
+  arriving while the first request is still running waits up to
+  ``IDEMPOTENCY_WAIT_SECONDS`` for its response.
+* ``complete`` stores the response for ``IDEMPOTENCY_TTL_SECONDS``.
+* ``abandon`` drops the claim when the request failed, so it can be retried.
+
+A key reused with a different request body is rejected. While Redis is
+unreachable, keys are kept in process memory.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.instrumentation import cache_result
+from app.db.db import redis_available, redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_PREFIX = "idem:"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a claimed key may stay without a response before it is released
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "60"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+IDEMPOTENCY_LOCAL_MAX = int(os.getenv("IDEMPOTENCY_LOCAL_MAX", "10000"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+_PENDING = "pending"
+_DONE = "done"
+
+
+class IdempotencyError(Exception):
+    """The key cannot be used for this request."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def fingerprint(body: Any) -> str:
+    """Stable hash of a request body, used to spot a key reused for another request."""
+    encoded = json.dumps(body, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Claim, complete and replay idempotency keys."""
+
+    def __init__(
+        self,
+        client=None,
+        ttl: int = IDEMPOTENCY_TTL_SECONDS,
+        pending_ttl: int = IDEMPOTENCY_PENDING_SECONDS,
+        wait: float = IDEMPOTENCY_WAIT_SECONDS,
+    ):
+        self.client = client if client is not None else redis_client
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.wait = wait
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -- storage -----------------------------------------------------------
+
+    def _set_local(self, key: str, value: str, ttl: int, nx: bool) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            current = self._local.get(key)
+            if nx and current is not None and current[0] > now:
+                return False
+            self._local[key] = (now + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > IDEMPOTENCY_LOCAL_MAX:
+                self._local.popitem(last=False)
+        return True
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            current = self._local.get(key)
+            if current is None or current[0] <= time.monotonic():
+                self._local.pop(key, None)
+                return None
+            return current[1]
+
+    def _set(self, key: str, value: str, ttl: int, nx: bool = False) -> bool:
+        if redis_available():
+            try:
+                return bool(self.client.set(key, value, ex=ttl, nx=nx))
+            except Exception as exc:
+                logger.error("Idempotency write failed, keeping %s locally: %s", key, exc)
+        return self._set_local(key, value, ttl, nx)
+
+    def _get(self, key: str) -> Optional[str]:
+        if redis_available():
+            try:
+                value = self.client.get(key)
+                if value is not None:
+                    return value.decode() if isinstance(value, bytes) else value
+            except Exception as exc:
+                logger.error("Idempotency read failed for %s: %s", key, exc)
+        return self._get_local(key)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._local.pop(key, None)
+        if redis_available():
+            try:
+                self.client.delete(key)
+            except Exception as exc:
+                logger.error("Idempotency delete failed for %s: %s", key, exc)
+
+    # -- protocol ----------------------------------------------------------
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"{IDEMPOTENCY_PREFIX}{scope}:{key}"
+
+    async def begin(self, scope: str, key: str, body_hash: str) -> Optional[Dict[str, Any]]:
+        """Claim ``key`` for a request, or return the response it already produced.
+
+        Returns ``None`` when the caller owns the key and should run the
+        request. Raises :class:`IdempotencyError` when the key belongs to a
+        different request or its first request is still running.
+        """
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise IdempotencyError("Idempotency-Key must be 1-255 characters", 422)
+        redis_key = self._key(scope, key)
+        pending = json.dumps({"state": _PENDING, "fingerprint": body_hash})
+        deadline = time.monotonic() + self.wait
+        while True:
+            if await asyncio.to_thread(self._set, redis_key, pending, self.pending_ttl, True):
+                cache_result("idempotency", False)
+                return None
+            raw = await asyncio.to_thread(self._get, redis_key)
+            # ``None`` means the key was released between our SET and GET; claim it again
+            if raw is not None:
+                entry = json.loads(raw)
+                if entry.get("fingerprint") != body_hash:
+                    raise IdempotencyError("Idempotency-Key was already used for a different request", 422)
+                if entry.get("state") == _DONE:
+                    cache_result("idempotency", True)
+                    return entry["response"]
+            if time.monotonic() >= deadline:
+                raise IdempotencyError("A request with this Idempotency-Key is still in progress", 409)
+            await asyncio.sleep(0.1)
+
+    async def complete(self, scope: str, key: str, body_hash: str, response: Any) -> None:
+        """Store the response so retries with ``key`` replay it."""
+        entry = json.dumps({"state": _DONE, "fingerprint": body_hash, "response": response}, default=str)
+        await asyncio.to_thread(self._set, self._key(scope, key), entry, self.ttl)
+
+    async def abandon(self, scope: str, key: str) -> None:
+        """Release a claimed key after the request failed."""
+        await asyncio.to_thread(self._delete, self._key(scope, key))
+
+
+idempotency_store = IdempotencyStore()
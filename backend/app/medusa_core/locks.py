@@ -1,26 +1,228 @@
 import asyncio
-from collections import defaultdict
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict
+
+from app.db.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "lock:"
+DEFAULT_LEASE_MS = int(os.getenv("JOB_LOCK_LEASE_MS", "30000"))
+# Marker for leases granted without Redis
+_LOCAL = "local"
+
+# Delete the lock only if we still own it (value matches our token)
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extend the lease only if we still own it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """A Redis ``SET NX PX`` lease with a monotonically increasing fencing token.
+
+    The fencing token is drawn from a per-lock counter on every successful
+    acquire so downstream writers can reject work from a stale owner.
+    With ``fail_open`` (the default), the lease degrades to always succeeding
+    while Redis is unreachable so work keeps running on the local process;
+    such a local lease takes a real one on its next renew once Redis is back.
+    Leases that must never be held twice, such as leader election, pass
+    ``fail_open=False`` and treat a Redis error as not acquired.
+    """
+
+    def __init__(self, name: str, ttl_ms: int = DEFAULT_LEASE_MS, client=None, fail_open: bool = True):
+        self.name = name
+        self.key = f"{LOCK_PREFIX}{name}"
+        self.ttl_ms = ttl_ms
+        self.client = client if client is not None else redis_client
+        self.fail_open = fail_open
+        self.token: int | None = None
+        self._value: str | None = None
+        # Set after a failed acquire so a Redis outage is logged once, not every retry
+        self._failing = False
+
+    @property
+    def held(self) -> bool:
+        return self._value is not None
+
+    def _set_nx(self) -> bool:
+        value = uuid.uuid4().hex
+        if not self.client.set(self.key, value, nx=True, px=self.ttl_ms):
+            return False
+        self.token = int(self.client.incr(f"{self.key}:fence"))
+        self._value = value
+        return True
+
+    def try_acquire(self) -> bool:
+        """Try once to take the lease. Returns ``True`` on success."""
+        try:
+            acquired = self._set_nx()
+        except Exception as exc:
+            log = logger.debug if self._failing else logger.error
+            self._failing = True
+            if not self.fail_open:
+                log("Lease acquire failed for %s: %s", self.name, exc)
+                return False
+            log("Lease acquire failed for %s, running unfenced: %s", self.name, exc)
+            self.token, self._value = None, _LOCAL
+            return True
+        self._failing = False
+        return acquired
+
+    def renew(self) -> bool:
+        """Extend the lease by ``ttl_ms``. Returns ``False`` if it was lost."""
+        if self._value is None:
+            return False
+        if self._value == _LOCAL:
+            # Granted while Redis was down: take the real lease now, or give it up
+            # if another process got it in the meantime
+            try:
+                if self._set_nx():
+                    return True
+                self.token, self._value = None, None
+                return False
+            except Exception:
+                return self.fail_open
+        try:
+            return bool(self.client.eval(_RENEW_SCRIPT, 1, self.key, self._value, self.ttl_ms))
+        except Exception as exc:
+            logger.error("Lease renew failed for %s: %s", self.name, exc)
+        return False
+
+    def release(self) -> None:
+        if self._value is None:
+            return
+        if self._value != _LOCAL:
+            try:
+                self.client.eval(_RELEASE_SCRIPT, 1, self.key, self._value)
+            except Exception as exc:
+                logger.error("Lease release failed for %s: %s", self.name, exc)
+        self.token, self._value = None, None
+
+
+class _LocalLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
 
 
 class JobLock:
-    """Async context manager providing in-process locking per job."""
+    """Async context manager providing fleet-wide locking per job.
 
-    _locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    Waiters in the same process queue on a local ``asyncio.Lock`` first, so
+    only one coroutine per process competes for the Redis lease. The lease is
+    renewed in the background while held, and the local lock entry is
+    evicted as soon as nobody is using it.
+    """
 
-    def __init__(self, job_id: str):
+    _locks: Dict[str, _LocalLock] = {}
+
+    def __init__(
+        self,
+        job_id: str,
+        *,
+        ttl_ms: int = DEFAULT_LEASE_MS,
+        retry_interval: float = 0.1,
+        timeout: float | None = None,
+    ):
         self.job_id = job_id
-        self._lock = self._locks[job_id]
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.lease = RedisLease(job_id, ttl_ms)
+        self._local: _LocalLock | None = None
+        self._renewer: asyncio.Task | None = None
+
+    @property
+    def fencing_token(self) -> int | None:
+        return self.lease.token
 
     async def __aenter__(self):
-        await self._lock.acquire()
+        await self.acquire()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        self._lock.release()
+        self.release()
+
+    def _checkout(self) -> _LocalLock:
+        local = self._locks.get(self.job_id)
+        if local is None:
+            local = self._locks[self.job_id] = _LocalLock()
+        local.users += 1
+        return local
+
+    def _checkin(self) -> None:
+        local, self._local = self._local, None
+        if local is None:
+            return
+        local.users -= 1
+        if local.users <= 0 and self._locks.get(self.job_id) is local:
+            del self._locks[self.job_id]
 
     async def acquire(self):
-        await self._lock.acquire()
+        self._local = self._checkout()
+        try:
+            await self._local.lock.acquire()
+        except BaseException:
+            self._checkin()
+            raise
+        try:
+            deadline = None if self.timeout is None else time.monotonic() + self.timeout
+            while not await asyncio.to_thread(self.lease.try_acquire):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"could not acquire lock {self.job_id}")
+                await asyncio.sleep(self.retry_interval)
+        except BaseException:
+            self._local.lock.release()
+            self._checkin()
+            raise
+        self._renewer = asyncio.create_task(self._renew_loop())
+
+    async def _renew_loop(self):
+        interval = self.lease.ttl_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            if not await asyncio.to_thread(self.lease.renew):
+                logger.warning("Lost lease for job %s", self.job_id)
+                return
 
     def release(self):
-        if self._lock.locked():
-            self._lock.release()
+        if self._local is None:
+            return
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        self.lease.release()
+        if self._local.lock.locked():
+            self._local.lock.release()
+        self._checkin()
+
+
+def run_once(lock_name: str, hold_ms: int, func: Callable[..., Any], *args: Any) -> Any:
+    """Run ``func`` only if no other process ran ``lock_name`` in the last ``hold_ms``.
+
+    Intended for scheduler callbacks that fire on every replica at the same
+    moment. The lease is not released on completion; it expires after
+    ``hold_ms`` so late-firing replicas skip the same trigger. Pick
+    ``hold_ms`` slightly shorter than the job's interval.
+    """
+    lease = RedisLease(f"run:{lock_name}", hold_ms)
+    if not lease.try_acquire():
+        logger.debug("Skipping %s: already running elsewhere", lock_name)
+        return None
+    return func(*args)
+
@@ -0,0 +1,299 @@
+"""
+USD prices for tokens, batched and cached.
+
+:class:`PriceService` answers price lookups for many ``(chain_id, address)``
+pairs at once. Cached prices are served for ``PRICE_TTL_SECONDS``; everything
+else is fetched in one batched upstream request (split into chunks of
+``PRICE_BATCH_SIZE``). Concurrent lookups of the same token share one fetch.
+Tokens looked up within the last ``PRICE_HOT_SECONDS`` are refreshed in the
+background shortly before they expire, so hot tokens rarely miss.
+
+Prices come from Alchemy's Prices API (``PRICE_SOURCE=alchemy``), or from a
+deterministic in-process table (``PRICE_SOURCE=stub``) for tests and local
+runs. Native currencies are priced through their wrapped token.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.instrumentation import PRICE_REQUEST_SECONDS, cache_result, timed
+from app.core.tracing import traced
+
+from .http import request_json
+
+logger = logging.getLogger(__name__)
+
+ALCHEMY_API_KEY = os.getenv("ALCHEMY_API_KEY")
+PRICES_BASE_URL = os.getenv("PRICES_BASE_URL", "https://api.g.alchemy.com/prices/v1")
+PRICE_SOURCE = os.getenv("PRICE_SOURCE", "alchemy").lower()
+PRICE_TTL_SECONDS = float(os.getenv("PRICE_TTL_SECONDS", "30"))
+# Alchemy accepts at most 25 addresses per request
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "25"))
+PRICE_HOT_SECONDS = float(os.getenv("PRICE_HOT_SECONDS", "300"))
+PRICE_REFRESH_SECONDS = float(os.getenv("PRICE_REFRESH_SECONDS", "10"))
+
+NATIVE_ADDRESSES = {
+    "0x0000000000000000000000000000000000000000",
+    "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
+}
+WRAPPED_NATIVE: Dict[int, str] = {
+    1: "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2",
+    10: "0x4200000000000000000000000000000000000006",
+    56: "0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c",
+    137: "0x0d500b1d8e8ef31e21c99d1db9a6444d3adf1270",
+    8453: "0x4200000000000000000000000000000000000006",
+    42161: "0x82af49447d8a07e3bd95bd0d56f35241523fbab1",
+    43114: "0xb31f66aa3c1e785363f0875a1b74e27b85fd66c7",
+}
+
+# Prices served by the stub source; other tokens get a stable made-up price
+STUB_PRICES: Dict[str, float] = {
+    "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48": 1.0,  # USDC
+    "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913": 1.0,  # USDC on Base
+    "0xaf88d065e77c8cc2239327c5edb3a432268e5831": 1.0,  # USDC on Arbitrum
+    "0xdac17f958d2ee523a2206206994597c13d831ec7": 1.0,  # USDT
+    "0x6b175474e89094c44da98b954eedeac495271d0f": 1.0,  # DAI
+    "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": 3000.0,  # WETH
+    "0x4200000000000000000000000000000000000006": 3000.0,  # WETH on OP stack
+    "0x82af49447d8a07e3bd95bd0d56f35241523fbab1": 3000.0,  # WETH on Arbitrum
+}
+
+PriceKey = Tuple[int, str]
+PriceFetch = Callable[[List[PriceKey]], Awaitable[Dict[PriceKey, Optional[float]]]]
+
+
+def price_key(chain_id: Any, address: str) -> PriceKey:
+    """Normalise a token to the key prices are cached under."""
+    chain_id = int(chain_id)
+    address = str(address)
+    if address.startswith("0x"):
+        address = address.lower()
+    if address in NATIVE_ADDRESSES or (chain_id == 137 and address == "0x0000000000000000000000000000000000001010"):
+        address = WRAPPED_NATIVE.get(chain_id, address)
+    return chain_id, address
+
+
+def stub_price(address: str) -> float:
+    """Deterministic price for ``address``: known tokens, else derived from its hash."""
+    if address in STUB_PRICES:
+        return STUB_PRICES[address]
+    digest = int(hashlib.sha256(address.encode()).hexdigest()[:8], 16)
+    return round(0.5 + digest % 10_000 / 100, 4)
+
+
+def _alchemy_networks() -> Dict[int, str]:
+    """Map chain ids to Alchemy network names (``eth-mainnet``) from alchemy.json."""
+    path = Path(__file__).resolve().parent.parent / "config" / "alchemy.json"
+    with open(path) as handle:
+        config = json.load(handle)
+    networks = {}
+    for chain_id, network in config.items():
+        host = network.get("url", "").split("//", 1)[-1]
+        if host and chain_id.isdigit():
+            networks[int(chain_id)] = host.split(".", 1)[0]
+    return networks
+
+
+_NETWORKS = _alchemy_networks()
+
+
+def _source_status(result: Dict[PriceKey, Optional[float]]) -> str:
+    return "ok" if any(price is not None for price in result.values()) else "error"
+
+
+async def _alchemy_chunk(keys: List[PriceKey]) -> Dict[PriceKey, Optional[float]]:
+    by_address = {}
+    addresses = []
+    for chain_id, address in keys:
+        network = _NETWORKS.get(chain_id)
+        if network is None:
+            continue
+        by_address[(network, address.lower())] = (chain_id, address)
+        addresses.append({"network": network, "address": address})
+    if not addresses:
+        return {}
+    status, body, _ = await request_json(
+        "POST", f"{PRICES_BASE_URL}/{ALCHEMY_API_KEY}/tokens/by-address", json={"addresses": addresses}
+    )
+    if status >= 400 or not isinstance(body, dict):
+        raise RuntimeError(f"price lookup returned HTTP {status}: {body}")
+    prices: Dict[PriceKey, Optional[float]] = {}
+    for entry in body.get("data") or []:
+        key = by_address.get((entry.get("network"), str(entry.get("address", "")).lower()))
+        if key is None:
+            continue
+        usd = next((p for p in entry.get("prices") or [] if p.get("currency") == "usd"), None)
+        prices[key] = float(usd["value"]) if usd else None
+    return prices
+
+
+@timed(PRICE_REQUEST_SECONDS, {"source": "alchemy"}, status=_source_status)
+@traced("prices.fetch", lambda keys: {"price.source": "alchemy", "token.count": len(keys)}, kind="client")
+async def fetch_alchemy_prices(keys: List[PriceKey]) -> Dict[PriceKey, Optional[float]]:
+    """Fetch USD prices from Alchemy, one request per ``PRICE_BATCH_SIZE`` tokens.
+
+    Tokens in a chunk that failed are left out; raises if every chunk failed.
+    """
+    chunks = [keys[i:i + PRICE_BATCH_SIZE] for i in range(0, len(keys), PRICE_BATCH_SIZE)]
+    results = await asyncio.gather(*(_alchemy_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures and len(failures) == len(results):
+        raise failures[0]
+    prices: Dict[PriceKey, Optional[float]] = {}
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning("Price lookup chunk failed: %s", result)
+        else:
+            prices.update(result)
+    return prices
+
+
+@timed(PRICE_REQUEST_SECONDS, {"source": "stub"}, status=_source_status)
+async def fetch_stub_prices(keys: List[PriceKey]) -> Dict[PriceKey, Optional[float]]:
+    return {key: stub_price(key[1]) for key in keys}
+
+
+class PriceService:
+    """Batched, cached USD prices with background refresh of hot tokens."""
+
+    def __init__(self, fetch: Optional[PriceFetch] = None, ttl: float = PRICE_TTL_SECONDS):
+        self._fetch = fetch or (fetch_stub_prices if PRICE_SOURCE == "stub" else fetch_alchemy_prices)
+        self.ttl = ttl
+        # key -> (expires_at, price); unknown tokens are cached as None too
+        self._cache: Dict[PriceKey, Tuple[float, Optional[float]]] = {}
+        self._last_used: Dict[PriceKey, float] = {}
+        self._inflight: Dict[PriceKey, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _refresh(self, keys: List[PriceKey]) -> Dict[PriceKey, Optional[float]]:
+        try:
+            fetched = await self._fetch(keys)
+        except Exception as exc:
+            logger.warning("Price refresh for %d tokens failed: %s", len(keys), exc)
+            fetched = {}
+        expires = time.monotonic() + self.ttl
+        prices = {}
+        for key in keys:
+            if key in fetched:
+                self._cache[key] = (expires, fetched[key])
+                prices[key] = fetched[key]
+            elif key in self._cache:
+                # Lookup failed: better a stale price than none
+                prices[key] = self._cache[key][1]
+        return prices
+
+    async def get_prices(self, tokens: Iterable[Tuple[Any, str]]) -> Dict[PriceKey, Optional[float]]:
+        """Return USD prices keyed by :func:`price_key`; ``None`` when unknown."""
+        now = time.monotonic()
+        prices: Dict[PriceKey, Optional[float]] = {}
+        missing: List[PriceKey] = []
+        waiting: Dict[PriceKey, asyncio.Future] = {}
+        for key in {price_key(chain_id, address) for chain_id, address in tokens}:
+            self._last_used[key] = now
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                prices[key] = entry[1]
+                cache_result("price", True)
+                continue
+            cache_result("price", False)
+            if key in self._inflight:
+                waiting[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            future = asyncio.get_running_loop().create_future()
+            for key in missing:
+                self._inflight[key] = future
+            fetched: Dict[PriceKey, Optional[float]] = {}
+            try:
+                fetched = await self._refresh(missing)
+            finally:
+                for key in missing:
+                    self._inflight.pop(key, None)
+                future.set_result(fetched)
+            for key in missing:
+                prices[key] = fetched.get(key)
+        for key, future in waiting.items():
+            prices[key] = (await future).get(key)
+        return prices
+
+    async def value_balances(self, balances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Price a balance list in one lookup.
+
+        Each entry needs ``chain_id``, ``address`` and ``amount`` and gains
+        ``price_usd`` and ``value_usd`` (``None`` if the price is unknown).
+        """
+        priceable = lambda b: b.get("chain_id") is not None and bool(b.get("address"))
+        prices = await self.get_prices((b["chain_id"], b["address"]) for b in balances if priceable(b))
+        total = 0.0
+        for balance in balances:
+            price = None
+            if priceable(balance):
+                price = prices.get(price_key(balance["chain_id"], balance["address"]))
+            balance["price_usd"] = price
+            balance["value_usd"] = None if price is None else round(float(balance.get("amount", 0)) * price, 2)
+            total += balance["value_usd"] or 0.0
+        return {"balances": balances, "total_usd": round(total, 2)}
+
+    async def value_amounts(self, amounts: Dict[Tuple[Any, str], float]) -> float:
+        """USD value of token amounts keyed by ``(chain_id, address)``, in one lookup."""
+        prices = await self.get_prices(amounts.keys())
+        total = 0.0
+        for (chain_id, address), amount in amounts.items():
+            price = prices.get(price_key(chain_id, address))
+            if price is not None:
+                total += amount * price
+        return round(total, 2)
+
+    async def refresh_hot(self) -> int:
+        """Refresh recently used prices that expire before the next round."""
+        now = time.monotonic()
+        for key in [k for k, used in self._last_used.items() if now - used > PRICE_HOT_SECONDS]:
+            del self._last_used[key]
+            self._cache.pop(key, None)
+        due = [
+            key for key in self._last_used
+            if key not in self._inflight and self._cache.get(key, (0.0, None))[0] - now < PRICE_REFRESH_SECONDS
+        ]
+        if due:
+            await self._refresh(due)
+        return len(due)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(PRICE_REFRESH_SECONDS)
+            try:
+                await self.refresh_hot()
+            except Exception:
+                logger.exception("Hot price refresh failed")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "cached": len(self._cache),
+            "fresh": sum(1 for expires, _ in self._cache.values() if expires > now),
+            "hot": len(self._last_used),
+        }
+
+
+price_service = PriceService()
@@ -1,25 +1,37 @@
 import os
 import time
+import asyncio
 import logging
 import requests
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
+
+from app.core.instrumentation import RELAY_REQUEST_SECONDS, timed
+from app.core.tracing import traced
+from app.log_config.structured import SAMPLED
+
+from .http import request_json
 
 logger = logging.getLogger(__name__)
 
 RELAY_BASE_URL = os.getenv("RELAY_BASE_URL", "https://api.relay.link")
 
 
-def get_quote(
-    data: Dict[str, Any], *, base_url: str | None = None, retries: int = 3
-) -> Dict[str, Any] | None:
-    """Fetch a quote from the Relay API with basic retry logic.
+def _quote_status(result: Any) -> str:
+    # Failed quotes come back as {"status_code": ..., "body": ...}
+    return "error" if result is None or (isinstance(result, dict) and "status_code" in result) else "ok"
 
-    The Relay API expects parameters like ``inputToken`` and ``inputAmount``.
-    This function now assumes callers provide the parameters already formatted
-    according to the Relay documentation.
-    """
-    base_url = base_url or RELAY_BASE_URL
 
+def _not_retryable(status: int) -> bool:
+    # Relay answers 4xx for requests it will never quote (unsupported route,
+    # bad input); asking again only adds the back-off. 429 is worth a retry.
+    return 400 <= status < 500 and status != 429
+
+
+def _chains_status(result: Tuple[int, Any]) -> str:
+    return "ok" if result[0] < 400 else "error"
+
+
+def _relay_payload(data: Dict[str, Any]) -> Dict[str, Any]:
     payload = data.copy()
 
     # Translate legacy field names (used in older Relay API versions) to the
@@ -37,7 +49,23 @@ def get_quote(
         payload["recipient"] = payload.pop("receiverAddress")
     if "receiver" in payload and "recipient" not in payload:
         payload["recipient"] = payload.pop("receiver")
-    logger.info(f"<[PAYLOAD TO RELAY]>  {payload}")
+    return payload
+
+
+@timed(RELAY_REQUEST_SECONDS, {"operation": "quote"}, status=_quote_status)
+@traced("relay.quote", {"relay.operation": "quote"}, kind="client")
+def get_quote(
+    data: Dict[str, Any], *, base_url: str | None = None, retries: int = 3
+) -> Dict[str, Any] | None:
+    """Fetch a quote from the Relay API with basic retry logic.
+
+    The Relay API expects parameters like ``inputToken`` and ``inputAmount``.
+    This function now assumes callers provide the parameters already formatted
+    according to the Relay documentation.
+    """
+    base_url = base_url or RELAY_BASE_URL
+    payload = _relay_payload(data)
+    logger.debug("Relay quote payload %s", payload, extra=SAMPLED)
     for attempt in range(1, retries + 1):
         try:
             response = requests.post(
@@ -60,7 +88,7 @@ def get_quote(
                 attempt,
                 retries,
             )
-            if attempt == retries:
+            if attempt == retries or _not_retryable(response.status_code):
                 return {"status_code": response.status_code, "body": body}
         except Exception as exc:
             logger.exception(
@@ -75,6 +103,100 @@ def get_quote(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "quote"}, status=_quote_status)
+@traced("relay.quote", {"relay.operation": "quote"}, kind="client")
+async def get_quote_async(
+    data: Dict[str, Any], *, base_url: str | None = None, retries: int = 3
+) -> Dict[str, Any] | None:
+    """Non-blocking :func:`get_quote` for request handlers and async jobs."""
+    base_url = base_url or RELAY_BASE_URL
+    payload = _relay_payload(data)
+    logger.debug("Relay quote payload %s", payload, extra=SAMPLED)
+    for attempt in range(1, retries + 1):
+        try:
+            status, body, _ = await request_json("POST", f"{base_url}/quote", json=payload)
+            if status < 400:
+                return body
+
+            logger.error(
+                "Relay quote failed: %s - %s (attempt %d/%d)",
+                status,
+                body,
+                attempt,
+                retries,
+            )
+            if attempt == retries or _not_retryable(status):
+                return {"status_code": status, "body": body}
+        except Exception as exc:
+            logger.exception(
+                "Error fetching quote on attempt %d/%d: %s", attempt, retries, exc
+            )
+            if attempt == retries:
+                return {"status_code": 0, "body": {"error": str(exc)}}
+
+        if attempt < retries:
+            await asyncio.sleep(1 * attempt)
+
+    return None
+
+
+@timed(RELAY_REQUEST_SECONDS, {"operation": "chains"}, status=_chains_status)
+@traced("relay.chains", {"relay.operation": "chains"}, kind="client")
+async def get_chains_async(*, base_url: str | None = None) -> Tuple[int, Any]:
+    """Fetch the Relay ``/chains`` listing. Returns ``(status, body)``."""
+    base_url = base_url or RELAY_BASE_URL
+    status, body, _ = await request_json("GET", f"{base_url}/chains")
+    return status, body
+
+
+def summarize_quote(quote_data: Any) -> Dict[str, Any] | None:
+    """Extract the fields the frontend needs from a Relay quote response.
+
+    Returns ``None`` when the response does not contain a usable quote.
+    """
+    result = None
+    if isinstance(quote_data, dict):
+        if "result" in quote_data:
+            result = quote_data.get("result")
+        elif "steps" in quote_data or "details" in quote_data:
+            # Latest API returns the quote directly with these fields
+            result = quote_data
+        elif quote_data.get("status") == "error" and isinstance(quote_data.get("message"), dict):
+            # Relay sometimes returns status "error" while providing the quote
+            result = quote_data.get("message")
+    if not result:
+        return None
+
+    output_amount = None
+    output_token = None
+    output_value_usd = None
+
+    if isinstance(result, dict):
+        if "outputAmount" in result:
+            output_amount = result.get("outputAmount")
+            output_token = result.get("outputToken")
+            output_value_usd = result.get("outputValueInUsd")
+        elif "details" in result:
+            out = result.get("details", {}).get("currencyOut", {})
+            output_amount = out.get("amount")
+            output_token = out.get("currency")
+            output_value_usd = out.get("amountUsd")
+        elif "output" in result:
+            out = result.get("output", {})
+            output_amount = out.get("amount")
+            output_token = out.get("token")
+            output_value_usd = out.get("valueInUsd")
+
+    simplified = {"outputAmount": output_amount}
+    if output_token is not None:
+        simplified["outputToken"] = output_token
+    if output_value_usd is not None:
+        simplified["outputValueInUsd"] = output_value_usd
+    return simplified
+
+
+@timed(RELAY_REQUEST_SECONDS, {"operation": "execute_route"})
+@traced("relay.execute_route", {"relay.operation": "execute_route"}, kind="client")
 def execute_route(
     data: Dict[str, Any], *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -121,6 +243,8 @@ def execute_route(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "approve"})
+@traced("relay.approve", {"relay.operation": "approve"}, kind="client")
 def approve_token(
     data: Dict[str, Any], *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -142,6 +266,8 @@ def approve_token(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "route_status"})
+@traced("relay.route_status", {"relay.operation": "route_status"}, kind="client")
 def get_route_status(
     route_id: str, *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -185,6 +311,8 @@ def get_route_status(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "intent_status"})
+@traced("relay.intent_status", {"relay.operation": "intent_status"}, kind="client")
 def get_intent_status(
     request_id: str, *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -218,6 +346,8 @@ def get_intent_status(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "execution_status"})
+@traced("relay.execution_status", {"relay.operation": "execution_status"}, kind="client")
 def get_execution_status(
     request_id: str, *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -258,6 +388,8 @@ def get_execution_status(
     return None
 
 
+@timed(RELAY_REQUEST_SECONDS, {"operation": "execute_transaction"})
+@traced("relay.execute_transaction", {"relay.operation": "execute_transaction"}, kind="client")
 def execute_transaction(
     request_id: str, *, base_url: str | None = None
 ) -> Dict[str, Any] | None:
@@ -1,6 +1,8 @@
 import os
-from aiohttp import ClientSession
-from typing import Dict
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from threading import Thread
@@ -9,10 +11,43 @@ from pathlib import Path
 import sys
 from abc import ABC
 import json
+import logging
+
+from app.core.instrumentation import ALCHEMY_REQUEST_SECONDS, PROVIDER_QUOTE_SECONDS, timed
+from app.core.tracing import traced
+from app.log_config.structured import SAMPLED
+
+from .http import get_session
+from .route_index import route_index
+from .relay import RELAY_BASE_URL, get_quote_async, summarize_quote
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 ALCHEMY_API_KEY = os.getenv("ALCHEMY_API_KEY")
+# Overrides the per-network URLs in alchemy.json with ``{base}/{chain_id}/``
+# (local stand-ins, proxies)
+ALCHEMY_BASE_URL = os.getenv("ALCHEMY_BASE_URL")
+
+# How Providers.quote picks between providers:
+#   "best"  - ask every active provider at once, keep the largest output
+#   "hedge" - ask the historically fastest provider first, add the next one
+#             every QUOTE_HEDGE_DELAY_SECONDS, return the first usable quote
+QUOTE_POLICY = os.getenv("QUOTE_POLICY", "best").lower()
+# Providers that have not answered by then are dropped from the result
+QUOTE_DEADLINE_SECONDS = float(os.getenv("QUOTE_DEADLINE_SECONDS", "3"))
+QUOTE_HEDGE_DELAY_SECONDS = float(os.getenv("QUOTE_HEDGE_DELAY_SECONDS", "0.3"))
+# Quotes kept per provider for the latency and success-rate figures
+PROVIDER_STATS_WINDOW = int(os.getenv("PROVIDER_STATS_WINDOW", "200"))
+
+# In-process quote provider for exercising aggregation without a second
+# upstream. Quotes ``inputAmount * MOCK_PROVIDER_RATE`` of the output token.
+MOCK_PROVIDER_ENABLED = os.getenv("MOCK_PROVIDER_ENABLED", "false").lower() == "true"
+MOCK_PROVIDER_RATE = float(os.getenv("MOCK_PROVIDER_RATE", "1"))
+MOCK_PROVIDER_LATENCY = float(os.getenv("MOCK_PROVIDER_LATENCY", "0.05"))
+MOCK_PROVIDER_JITTER = float(os.getenv("MOCK_PROVIDER_JITTER", "0.02"))
+MOCK_PROVIDER_ERROR_RATE = float(os.getenv("MOCK_PROVIDER_ERROR_RATE", "0"))
 
 PROVIDES = {
     'relay':{
@@ -43,6 +78,10 @@ class ConnectorInterface(ABC):
     def supported_chains(Self):
         raise NotImplementedError("`supported_chains` method needs to be implemented!")
 
+    async def quote(self, params: Dict[str, Any]) -> Any:
+        """Return a quote for Relay-style ``params`` in Relay's response format."""
+        raise NotImplementedError("`quote` method needs to be implemented!")
+
 
 class relay(ConnectorInterface):
 
@@ -56,21 +95,20 @@ class relay(ConnectorInterface):
             )
         config = interface(
             active=True,
-            base_url= os.getenv("RELAY_BASE_URL",None),
+            base_url=RELAY_BASE_URL,
             endpoints=available_endpoints
         )
-        print("▶️  RELAY_BASE_URL =", os.getenv("RELAY_BASE_URL"))
+        logger.debug("Relay base URL %s", config.base_url, extra=SAMPLED)
         return config
 
+    @traced("relay.chains", {"relay.operation": "chains"}, kind="client")
     async def _load_supported_chains(self) -> dict:
         try:
             chains_url = self.interface.base_url+self.interface.endpoints.supported_chains
-            print("▶️  Fetching chains from", chains_url)
-            async with ClientSession() as session:
-                async with session.get(url=chains_url) as request:
-                    response = await request.json()
-                    return response
-                print("▶️  chains payload:", response)
+            logger.debug("Fetching chains from %s", chains_url, extra=SAMPLED)
+            async with get_session().get(url=chains_url) as request:
+                response = await request.json()
+                return response
                 
         except Exception as err:
             return
@@ -111,12 +149,93 @@ class relay(ConnectorInterface):
         self.interface = self._boot()
         self.interface.supported_chains = await self.supported_chains()
 
+    async def quote(self, params: Dict[str, Any]) -> Any:
+        data = await get_quote_async(params, base_url=self.interface.base_url)
+        route_index.record(params, data)
+        return data
+
+
+class mock(ConnectorInterface):
+    """Local quote provider with configurable latency and failure rate."""
+
+    def __init__(self):
+        self.interface:interface = None
+
+    def _boot(self):
+        return interface(active=MOCK_PROVIDER_ENABLED, endpoints=Endpoints())
+
+    async def supported_chains(self):
+        return {}
+
+    async def setup(self):
+        self.interface = self._boot()
+
+    async def quote(self, params: Dict[str, Any]) -> Any:
+        latency = MOCK_PROVIDER_LATENCY + random.uniform(-MOCK_PROVIDER_JITTER, MOCK_PROVIDER_JITTER)
+        await asyncio.sleep(max(0.0, latency))
+        if random.random() < MOCK_PROVIDER_ERROR_RATE:
+            return {"status_code": 500, "body": {"message": "mock provider failure"}}
+        amount = int(params["inputAmount"])
+        return {
+            "result": {
+                "output": {
+                    "amount": str(int(amount * MOCK_PROVIDER_RATE)),
+                    "token": {"chainId": params["destinationChainId"], "address": params["outputToken"]},
+                }
+            }
+        }
+
+
+class ProviderStats:
+    """Latency and success rate over a provider's most recent quotes."""
+
+    def __init__(self, window: int = PROVIDER_STATS_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self.requests = 0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.requests += 1
+        self._latencies.append(seconds)
+        self._outcomes.append(ok)
+
+    @property
+    def success_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 1.0
+
+    def latency(self, p: float) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "success_rate": round(self.success_rate, 3),
+            "p50_ms": round(self.latency(0.5) * 1000, 1),
+            "p95_ms": round(self.latency(0.95) * 1000, 1),
+        }
+
+
+def _output_amount(quote: Dict[str, Any]) -> int:
+    try:
+        return int(quote.get("outputAmount") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _quote_error(data: Any) -> Any:
+    if isinstance(data, dict):
+        return data.get("message") or data.get("error") or data
+    return data
 
 
 class Providers:
 
     def __init__(self):
-        self._providers = {'relay': relay()}
+        self._providers = {'relay': relay(), 'mock': mock()}
+        self.stats: Dict[str, ProviderStats] = {name: ProviderStats() for name in self._providers}
 
     async def get_provider(self,provider:str='relay') -> interface:
         if provider not in self._providers:
@@ -132,6 +251,132 @@ class Providers:
         for key,connector in self._providers.items():
             await connector.setup()
 
+    def quote_providers(self, params: Dict[str, Any]) -> List[str]:
+        """Active providers that can quote between the two chains in ``params``."""
+        names = []
+        for name, connector in self._providers.items():
+            if connector.interface is None:
+                # Booting only reads config; the chain list loads with load_providers
+                connector.interface = connector._boot()
+            config = connector.interface
+            if not config.active:
+                continue
+            chains = config.supported_chains or {}
+            if chains and not (params["originChainId"] in chains and params["destinationChainId"] in chains):
+                continue
+            names.append(name)
+        return names
+
+    async def _ask(self, name: str, params: Dict[str, Any]) -> Tuple[str, Any, Optional[Dict[str, Any]]]:
+        start = time.perf_counter()
+        try:
+            data = await self._providers[name].quote(params)
+        except asyncio.CancelledError:
+            # Lost the race or ran past the deadline; the caller records that
+            raise
+        except Exception as exc:
+            logger.warning("Quote from %s failed: %s", name, exc)
+            data = {"message": f"Error getting quote: {exc}"}
+        simplified = summarize_quote(data)
+        self._record(name, time.perf_counter() - start, "ok" if simplified is not None else "error")
+        return name, data, simplified
+
+    def _record(self, name: str, seconds: float, status: str) -> None:
+        PROVIDER_QUOTE_SECONDS.labels(provider=name, status=status).observe(seconds)
+        self.stats[name].record(seconds, status == "ok")
+
+    def _cancel(self, tasks: Dict[asyncio.Task, str], started: Dict[str, float], timed_out: bool) -> None:
+        """Cancel unfinished quotes; past the deadline they count as failures."""
+        now = time.perf_counter()
+        for task, name in tasks.items():
+            if not task.done():
+                task.cancel()
+                if timed_out:
+                    self._record(name, now - started[name], "timeout")
+
+    async def _best(self, names: List[str], params: Dict[str, Any], deadline: float):
+        start = time.perf_counter()
+        tasks = {asyncio.create_task(self._ask(name, params)): name for name in names}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=deadline)
+        finally:
+            self._cancel(tasks, {name: start for name in names}, timed_out=True)
+        return [task.result() for task in done]
+
+    async def _hedge(self, names: List[str], params: Dict[str, Any], deadline: float, delay: float):
+        # Providers that have never answered go last; otherwise most reliable, then fastest
+        queue = sorted(
+            names,
+            key=lambda n: (self.stats[n].requests == 0, -self.stats[n].success_rate, self.stats[n].latency(0.5)),
+        )
+        give_up = time.perf_counter() + deadline
+        tasks: Dict[asyncio.Task, str] = {}
+        started: Dict[str, float] = {}
+        answers = []
+        timed_out = True
+        try:
+            while queue or any(not task.done() for task in tasks):
+                if queue:
+                    name = queue.pop(0)
+                    started[name] = time.perf_counter()
+                    tasks[asyncio.create_task(self._ask(name, params))] = name
+                remaining = give_up - time.perf_counter()
+                if remaining <= 0:
+                    break
+                pending = [task for task in tasks if not task.done()]
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=min(delay, remaining) if queue else remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    answers.append(task.result())
+                    if answers[-1][2] is not None:
+                        timed_out = False
+                        return answers
+        finally:
+            self._cancel(tasks, started, timed_out)
+        return answers
+
+    @traced("providers.quote", lambda self, params, *args, **kwargs: {"quote.policy": kwargs.get("policy") or QUOTE_POLICY})
+    async def quote(
+        self,
+        params: Dict[str, Any],
+        *,
+        policy: Optional[str] = None,
+        deadline: Optional[float] = None,
+        hedge_delay: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Quote ``params`` across every active provider.
+
+        Returns ``{"provider", "quote", "raw"}`` for the chosen quote, or
+        ``{"provider": None, "quote": None, "message"}`` when no provider
+        produced a usable one before the deadline.
+        """
+        policy = policy or QUOTE_POLICY
+        deadline = QUOTE_DEADLINE_SECONDS if deadline is None else deadline
+        names = self.quote_providers(params)
+        if policy == "hedge":
+            answers = await self._hedge(
+                names, params, deadline, QUOTE_HEDGE_DELAY_SECONDS if hedge_delay is None else hedge_delay
+            )
+        else:
+            answers = await self._best(names, params, deadline)
+
+        usable = [answer for answer in answers if answer[2] is not None]
+        if usable:
+            name, data, simplified = max(usable, key=lambda answer: _output_amount(answer[2]))
+            return {"provider": name, "quote": {**simplified, "provider": name}, "raw": data}
+
+        errors = {name: _quote_error(data) for name, data, _ in answers}
+        for name in names:
+            errors.setdefault(name, "no quote before deadline")
+        message = next(iter(errors.values())) if len(errors) == 1 else errors
+        return {"provider": None, "quote": None, "message": message or "no active quote provider"}
+
+    def quote_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
 providers = Providers()
 
 class WalletBalance:
@@ -153,6 +398,8 @@ class WalletBalance:
             if not alchemy_dict:
                 raise ValueError("network not supported")
             url = alchemy_dict.get('url')
+            if ALCHEMY_BASE_URL:
+                url = f"{ALCHEMY_BASE_URL.rstrip('/')}/{chain_id}/"
             return f"{url}{self._project_id}"
         except Exception as err:
             return
@@ -187,7 +434,7 @@ class WalletBalance:
         }
         return payload
 
-    async def _convert_to_currency(self,response:dict):
+    async def _convert_to_currency(self,response:dict,chain_id:int|str|None=None):
         token_balances = response.get('tokenBalances')
         available_balances = []
         for balanceObj in token_balances:
@@ -208,35 +455,38 @@ class WalletBalance:
                 balance_map = {
                     "address": address,
                     "symbol": symbol,
-                    "amount": amount
+                    "amount": amount,
+                    "chain_id": int(chain_id) if chain_id is not None else None,
                 }
                 available_balances.append(balance_map)
         return available_balances
 
 
+    @timed(ALCHEMY_REQUEST_SECONDS, lambda self, chain_id, *args, **kwargs: {"chain_id": chain_id})
+    @traced("alchemy.getTokenBalances", lambda self, chain_id, *args, **kwargs: {"chain_id": chain_id}, kind="client")
     async def call(self, chain_id:int|str, wallet_addr:str, retries=3):
         try:
             req_url = self.build_uris(str(chain_id))
-            # print(req_url)
             if not req_url:
                 return
-            print("▶️  POST-ing to", req_url, "payload:", self.build_payload(wallet_addr))
-            async with ClientSession() as session:
-                for _ in range(retries):
-                    async with session.post(url=req_url,json=self.build_payload(wallet_addr)) as request:
-                        if request.status == 400:
-                            return
-                        elif request.status > 200:
-                            continue
-                        response = await request.json()
-                        print("▶️  got status", request.status, "json:", await request.json())
-
-                        if request.status<=200 and response.get("result"):
-                            available_balances = await self._convert_to_currency(response.get("result"))
-                            return available_balances
+            # The URL embeds the API key, so only the chain is logged
+            logger.debug("Fetching Alchemy balances on chain %s", chain_id, extra=SAMPLED)
+            session = get_session()
+            for _ in range(retries):
+                async with session.post(url=req_url,json=self.build_payload(wallet_addr)) as request:
+                    if request.status == 400:
+                        return
+                    elif request.status > 200:
+                        continue
+                    response = await request.json()
+                    logger.debug("Alchemy chain %s answered HTTP %s", chain_id, request.status, extra=SAMPLED)
+
+                    if request.status<=200 and response.get("result"):
+                        available_balances = await self._convert_to_currency(response.get("result"), chain_id)
+                        return available_balances
         except Exception as err:
+            logger.warning("Alchemy balance lookup on chain %s failed: %s", chain_id, err)
             return
-            # print(err)
         
     async def run_in_pool(self, wallet_addr:str):
         network_pool = []
@@ -249,6 +499,7 @@ class WalletBalance:
             consolidated.append(result)
         return consolidated
 
+    @traced("balances.resolve")
     async def resolve_balances(
         self,
         wallet_addr:str
@@ -0,0 +1,173 @@
+"""
+In-memory index of which quote routes Relay can serve.
+
+A large share of failed quotes ask for a chain or token Relay does not
+support. :class:`RouteIndex` answers that before any upstream call from two
+sources:
+
+* the chain catalog loaded by :mod:`token_map`: a chain missing from it, or a
+  token symbol that did not resolve to an address on its chain, cannot be
+  quoted. Handlers call :meth:`RouteIndex.check_chains` before resolving
+  token symbols, so an unknown chain never triggers a token map refresh;
+* observed quote outcomes: when Relay rejects a route with an error code that
+  does not depend on the amount (``UNSUPPORTED_CURRENCY``,
+  ``NO_SWAP_ROUTES_FOUND``, ...), the route is remembered for
+  ``ROUTE_NEGATIVE_TTL`` seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.instrumentation import cache_result
+from app.utils.addresses import is_address_for_chain
+
+from . import token_map
+
+logger = logging.getLogger(__name__)
+
+ROUTE_NEGATIVE_TTL = float(os.getenv("ROUTE_NEGATIVE_TTL", "600"))
+ROUTE_NEGATIVE_MAX = int(os.getenv("ROUTE_NEGATIVE_MAX", "10000"))
+
+# Relay error codes that hold for every amount on the route
+UNSUPPORTED_ERROR_CODES = {
+    "CHAIN_DISABLED",
+    "NO_SWAP_ROUTES_FOUND",
+    "ROUTE_TEMPORARILY_RESTRICTED",
+    "SANCTIONED_CURRENCY",
+    "UNSUPPORTED_CHAIN",
+    "UNSUPPORTED_CURRENCY",
+    "UNSUPPORTED_ROUTE",
+}
+
+RouteKey = Tuple[int, str, int, str]
+
+
+def _token_key(token: Any) -> str:
+    token = str(token)
+    # EVM addresses are case-insensitive, Solana ones are not
+    return token.lower() if token.startswith("0x") else token
+
+
+def route_key(params: Dict[str, Any]) -> RouteKey:
+    return (
+        int(params["originChainId"]),
+        _token_key(params["inputToken"]),
+        int(params["destinationChainId"]),
+        _token_key(params["outputToken"]),
+    )
+
+
+def _rejection(quote_data: Any) -> Optional[Dict[str, str]]:
+    """Return the error code and message if ``quote_data`` rejects the whole route."""
+    if not isinstance(quote_data, dict) or "status_code" not in quote_data:
+        return None
+    body = quote_data.get("body")
+    if not isinstance(body, dict):
+        return None
+    code = body.get("errorCode")
+    if code not in UNSUPPORTED_ERROR_CODES:
+        return None
+    return {"code": code, "message": body.get("message") or code}
+
+
+class RouteIndex:
+    """Reject quote routes known to be unsupported without calling Relay."""
+
+    def __init__(self, ttl: float = ROUTE_NEGATIVE_TTL, max_entries: int = ROUTE_NEGATIVE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._negative: "OrderedDict[RouteKey, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    @staticmethod
+    def _chain_rejection(chain_id: int) -> Optional[Dict[str, str]]:
+        catalog = token_map.CHAIN_IDS
+        if catalog and chain_id not in catalog:
+            return {"code": "UNSUPPORTED_CHAIN", "message": f"Chain {chain_id} is not supported"}
+        return None
+
+    def _catalog_rejection(self, key: RouteKey) -> Optional[Dict[str, str]]:
+        src_chain, token_in, dst_chain, token_out = key
+        for chain_id, token, side in ((src_chain, token_in, "input"), (dst_chain, token_out, "output")):
+            rejection = self._chain_rejection(chain_id)
+            if rejection is not None:
+                return rejection
+            # Symbols are swapped for addresses before this; one left over is unknown
+            if not is_address_for_chain(token, chain_id):
+                return {
+                    "code": "UNSUPPORTED_CURRENCY",
+                    "message": f"Unknown {side} token {token} on chain {chain_id}",
+                }
+        return None
+
+    def check_chains(self, src_chain: int, dst_chain: int) -> Optional[Dict[str, str]]:
+        """Return ``{"code", "message"}`` if either chain is missing from the catalog."""
+        rejection = self._chain_rejection(src_chain) or self._chain_rejection(dst_chain)
+        if rejection is not None:
+            self._count("catalog_rejections", True)
+        return rejection
+
+    def check(self, params: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Return ``{"code", "message"}`` if the route in ``params`` is known to fail.
+
+        ``params`` are Relay quote params with token symbols already resolved.
+        """
+        key = route_key(params)
+        rejection = self._catalog_rejection(key)
+        if rejection is not None:
+            self._count("catalog_rejections", True)
+            return rejection
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._negative.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._negative[key]
+                entry = None
+        if entry is not None:
+            self._count("negative_hits", True)
+            return entry[1]
+        self._count("passed", False)
+        return None
+
+    def record(self, params: Dict[str, Any], quote_data: Any) -> None:
+        """Remember the route as unsupported if Relay rejected it as a whole."""
+        rejection = _rejection(quote_data)
+        if rejection is None:
+            return
+        key = route_key(params)
+        with self._lock:
+            self._negative[key] = (time.monotonic() + self.ttl, rejection)
+            self._negative.move_to_end(key)
+            while len(self._negative) > self.max_entries:
+                self._negative.popitem(last=False)
+            self._stats["negative_recorded"] += 1
+        logger.info("Route %s marked unsupported for %ss: %s", key, self.ttl, rejection["code"])
+
+    def _count(self, outcome: str, hit: bool) -> None:
+        with self._lock:
+            self._stats["checks"] += 1
+            self._stats[outcome] += 1
+        cache_result("route_index", hit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["negative_entries"] = len(self._negative)
+        checks = stats.get("checks", 0)
+        rejected = stats.get("catalog_rejections", 0) + stats.get("negative_hits", 0)
+        stats["hit_rate"] = round(rejected / checks, 3) if checks else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._negative.clear()
+            self._stats.clear()
+
+
+route_index = RouteIndex()
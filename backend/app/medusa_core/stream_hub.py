@@ -0,0 +1,116 @@
+"""
+Process-wide fan-out of swap and wallet updates to WebSocket clients.
+
+The swap tracker publishes every status change to ``swap:{swap_id}`` and to
+``wallet:{address}`` for the wallets involved. :class:`StreamHub` holds one
+pattern subscription to both per process, read by a single background
+thread, and hands each message to the callbacks registered for its channel
+on the event loop. WebSocket handlers register callbacks instead of opening
+their own pubsub connection and polling thread.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from app.db.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+SWAP_CHANNEL_PREFIX = "swap:"
+WALLET_CHANNEL_PREFIX = "wallet:"
+# Seconds before re-subscribing after the pubsub connection failed
+STREAM_RECONNECT_SECONDS = float(os.getenv("STREAM_RECONNECT_SECONDS", "1"))
+
+Callback = Callable[[str, str], None]
+
+
+def swap_channel(swap_id: str) -> str:
+    return f"{SWAP_CHANNEL_PREFIX}{swap_id}"
+
+
+def wallet_channel(address: str) -> str:
+    # EVM addresses are case-insensitive, Solana ones are not
+    address = str(address)
+    return f"{WALLET_CHANNEL_PREFIX}{address.lower() if address.startswith('0x') else address}"
+
+
+class StreamHub:
+    """Deliver ``swap:*`` and ``wallet:*`` messages to in-process subscribers."""
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else redis_client
+        self._subscribers: Dict[str, Set[Callback]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.delivered = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name="stream-hub", daemon=True)
+                self._thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(f"{SWAP_CHANNEL_PREFIX}*", f"{WALLET_CHANNEL_PREFIX}*")
+                for msg in pubsub.listen():
+                    if not msg or msg.get("type") != "pmessage":
+                        continue
+                    channel, data = msg["channel"], msg["data"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    loop = self._loop
+                    if loop is not None and not loop.is_closed():
+                        loop.call_soon_threadsafe(self._dispatch, channel, str(data))
+            except Exception as exc:
+                logger.error("Stream hub subscription failed: %s", exc)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(STREAM_RECONNECT_SECONDS)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                callback(channel, data)
+                self.delivered += 1
+            except Exception:
+                logger.exception("Stream subscriber failed on %s", channel)
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        """Call ``callback(channel, data)`` on the event loop for each message.
+
+        Must be called from the event loop that should run the callbacks.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._subscribers.setdefault(channel, set()).add(callback)
+        self._ensure_started()
+
+    def unsubscribe(self, channel: str, callback: Callback) -> None:
+        callbacks = self._subscribers.get(channel)
+        if callbacks is None:
+            return
+        callbacks.discard(callback)
+        if not callbacks:
+            del self._subscribers[channel]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._subscribers),
+            "subscriptions": sum(len(c) for c in self._subscribers.values()),
+            "delivered": self.delivered,
+        }
+
+
+hub = StreamHub()
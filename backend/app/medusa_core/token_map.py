@@ -1,9 +1,14 @@
+import asyncio
 import logging
+import os
+import threading
 import time
-from typing import Dict
+from typing import Callable, Dict, List, Tuple
 
 import requests
 
+from app.core.tracing import traced
+
 from .relay import RELAY_BASE_URL
 
 
@@ -49,9 +54,16 @@ TOKEN_MAP = {
 _REMOTE_MAP: Dict[int, Dict[str, str]] = {}
 _CACHE_TIMESTAMP: float = 0.0
 _CACHE_TTL = 3600  # 1 hour
+_LOAD_ATTEMPTED_AT: float = 0.0
+# How long a chain missing from the last load is taken to be missing before reloading
+MISSING_CHAIN_TTL = float(os.getenv("TOKEN_MAP_MISSING_CHAIN_TTL", "300"))
 
 CHAIN_IDS : Dict[int, str] = {}
 
+# A thread lock: resolvers run on the API loop, on the DCA tick's own loop and
+# in worker threads, and an asyncio.Lock can only be shared within one loop
+_refresh_lock = threading.Lock()
+
 def _fetch_tokens_for_chain(chain_id: int) -> Dict[str, str]:
     """Fetch tokens for a single chain via Relay."""
     try:
@@ -74,9 +86,11 @@ def _fetch_tokens_for_chain(chain_id: int) -> Dict[str, str]:
     return {}
 
 
+@traced("token_map.refresh")
 def load_token_map() -> None:
     """Load token mapping from Relay into the in-memory cache."""
-    global _REMOTE_MAP, _CACHE_TIMESTAMP, CHAIN_IDS
+    global _REMOTE_MAP, _CACHE_TIMESTAMP, _LOAD_ATTEMPTED_AT, CHAIN_IDS
+    _LOAD_ATTEMPTED_AT = time.time()
     mapping: Dict[int, Dict[str, str]] = {}
     try:
         resp = requests.get(f"{RELAY_BASE_URL}/chains", timeout=10)
@@ -120,15 +134,62 @@ def load_token_map() -> None:
         _CACHE_TIMESTAMP = time.time()
 
 
+def _is_token_address(token: str) -> bool:
+    return token.lower().startswith("0x") and len(token) == 42
+
+
+def _token_map_stale(chain_id: int) -> bool:
+    now = time.time()
+    if now - _CACHE_TIMESTAMP > _CACHE_TTL:
+        return True
+    # Unknown chains would otherwise reload the whole map on every request
+    return chain_id not in _REMOTE_MAP and now - _LOAD_ATTEMPTED_AT > MISSING_CHAIN_TTL
+
+
+def _refresh_if(stale: Callable[[], bool]) -> None:
+    """Reload the map unless another caller already did while we waited."""
+    with _refresh_lock:
+        if stale():
+            load_token_map()
+
+
 def resolve_token_address(chain_id: int, token: str) -> str:
     """Return the address for a token symbol if available."""
-    if token.lower().startswith("0x") and len(token) == 42:
+    if _is_token_address(token):
         return token
 
-    now = time.time()
-    if now - _CACHE_TIMESTAMP > _CACHE_TTL or chain_id not in _REMOTE_MAP:
-        load_token_map()
+    if _token_map_stale(chain_id):
+        _refresh_if(lambda: _token_map_stale(chain_id))
+    return _lookup_token_address(chain_id, token)
+
+
+@traced("token_map.resolve", lambda chain_id, token: {"chain_id": chain_id, "token": token})
+async def resolve_token_address_async(chain_id: int, token: str) -> str:
+    """:func:`resolve_token_address` that refreshes the map off the event loop."""
+    if _is_token_address(token):
+        return token
+
+    if _token_map_stale(chain_id):
+        # Concurrent requests share one refresh; the others wait for it off the loop
+        await asyncio.to_thread(_refresh_if, lambda: _token_map_stale(chain_id))
+    return _lookup_token_address(chain_id, token)
 
+
+@traced("token_map.resolve_batch", lambda pairs: {"token.count": len(pairs)})
+async def resolve_token_addresses_async(pairs: List[Tuple[int, str]]) -> List[str]:
+    """Resolve many ``(chain_id, token)`` pairs with at most one map refresh."""
+    stale = lambda: any(
+        not _is_token_address(token) and _token_map_stale(chain_id) for chain_id, token in pairs
+    )
+    if stale():
+        await asyncio.to_thread(_refresh_if, stale)
+    return [
+        token if _is_token_address(token) else _lookup_token_address(chain_id, token)
+        for chain_id, token in pairs
+    ]
+
+
+def _lookup_token_address(chain_id: int, token: str) -> str:
     symbol = token.upper()
     addr = _REMOTE_MAP.get(chain_id, {}).get(symbol)
     if addr:
@@ -144,9 +205,8 @@ def resolve_key(dict_in:dict, value:str)-> str:
 
 
 def resolve_token_symbol(chain_id:int, token_addr:str):
-    now = time.time()
-    if now - _CACHE_TIMESTAMP > _CACHE_TTL or chain_id not in _REMOTE_MAP:
-        load_token_map()
+    if _token_map_stale(chain_id):
+        _refresh_if(lambda: _token_map_stale(chain_id))
     tokens_in_chain = _REMOTE_MAP.get(chain_id, {})
     if not tokens_in_chain:
         mapping = TOKEN_MAP.get(chain_id, {})        
@@ -0,0 +1,368 @@
+"""
+Async repositories for request handlers.
+
+These mirror :class:`~app.repositories.swap_repository.SwapRepository` on top
+of PyMongo's async API, so FastAPI handlers await Mongo I/O on the event loop
+instead of holding a threadpool thread. Scheduler jobs keep using the sync
+repository and the ``insert_one_safe``/``update_one_safe`` helpers.
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.asynchronous.collection import AsyncCollection
+
+from app.core.instrumentation import MONGO_OPERATION_SECONDS, mongo_span_attributes, timed
+from app.core.tracing import traced
+from app.repositories.swap_cache import SUMMARY_PROJECTION, swap_cache
+from app.repositories.swap_repository import QUOTE_COLLECTION, decode_quote, encode_quote
+
+
+def _object_id(value: Any) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except Exception:
+        return None
+
+
+def _timed(operation: str):
+    """Record the operation in the Mongo latency histogram and as a trace span."""
+    metric = timed(
+        MONGO_OPERATION_SECONDS,
+        lambda self, *args, **kwargs: {"collection": self.collection_name, "operation": operation},
+    )
+    span = traced(
+        f"mongo.{operation}",
+        lambda self, *args, **kwargs: mongo_span_attributes(self.collection_name, operation),
+        kind="client",
+    )
+    return lambda func: metric(span(func))
+
+
+class _AsyncRepository:
+    collection_name = ""
+
+    def __init__(self, db):
+        self.collection: Optional[AsyncCollection] = None
+        if db is not None:
+            self.collection = db.get_collection(self.collection_name)
+        self.logger = logging.getLogger(__name__)
+
+    @_timed("find_one")
+    async def get(self, doc_id: Any, projection: Dict[str, Any] | None = None) -> Optional[Dict[str, Any]]:
+        """Retrieve a document by ID."""
+        if self.collection is None:
+            return None
+        obj_id = _object_id(doc_id)
+        if obj_id is None:
+            return None
+        return await self.collection.find_one({"_id": obj_id}, projection)
+
+    @_timed("find")
+    async def get_many(
+        self, doc_ids: Iterable[Any], projection: Dict[str, Any] | None = None
+    ) -> Dict[ObjectId, Dict[str, Any]]:
+        """Retrieve several documents by ID in one query, keyed by ID."""
+        if self.collection is None:
+            return {}
+        ids = [i for i in (_object_id(d) for d in doc_ids) if i is not None]
+        if not ids:
+            return {}
+        docs = await self.collection.find({"_id": {"$in": ids}}, projection).to_list(None)
+        return {doc["_id"]: doc for doc in docs}
+
+
+class AsyncSwapRepository(_AsyncRepository):
+    """Async CRUD operations on the ``swaps`` collection."""
+
+    collection_name = "swaps"
+
+    async def ensure_indexes(self) -> None:
+        """Ensure indexes required for the swaps collection exist."""
+        if self.collection is None:
+            return
+        try:
+            await self.collection.create_index(
+                "signatureRequest.hash", unique=True, sparse=True
+            )
+        except Exception as exc:
+            self.logger.error("Failed to create unique index: %s", exc)
+
+    @_timed("insert")
+    async def create(self, data: Dict[str, Any]) -> Optional[str]:
+        """Insert a new swap document and return its ID."""
+        if self.collection is None:
+            return None
+        now = datetime.utcnow()
+        doc = {
+            **data,
+            "created_at": data.get("created_at", now),
+            "updated_at": data.get("updated_at", now),
+        }
+        doc.setdefault("status", "new")
+        doc.setdefault("step_logs", [])
+        result = await self.collection.insert_one(doc)
+        return str(result.inserted_id)
+
+    async def get_summary(self, swap_id: Any) -> Optional[Dict[str, Any]]:
+        """Read-through cached summary of a swap, with an ``etag``; see :mod:`swap_cache`."""
+        if self.collection is None:
+            return None
+        obj_id = _object_id(swap_id)
+        if obj_id is None:
+            return None
+        summary = await swap_cache.get_async(str(obj_id))
+        if summary is not None:
+            return summary
+        doc = await self.get(obj_id, SUMMARY_PROJECTION)
+        if doc is None:
+            return None
+        return await swap_cache.put_async(str(obj_id), doc)
+
+    @_timed("update")
+    async def update(self, swap_id: str, fields: Dict[str, Any]) -> bool:
+        """Update fields of a swap document."""
+        if self.collection is None:
+            return False
+        obj_id = _object_id(swap_id)
+        if obj_id is None:
+            return False
+        fields.setdefault("updated_at", datetime.utcnow())
+        result = await self.collection.update_one({"_id": obj_id}, {"$set": fields})
+        await swap_cache.invalidate_async(obj_id, fields["updated_at"])
+        return result.modified_count > 0
+
+    @_timed("update")
+    async def add_step_log(self, swap_id: str, log: Dict[str, Any]) -> bool:
+        """Append a step log to the swap document."""
+        if self.collection is None:
+            return False
+        obj_id = _object_id(swap_id)
+        if obj_id is None:
+            return False
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"_id": obj_id},
+            {"$push": {"step_logs": log}, "$set": {"updated_at": now}},
+        )
+        await swap_cache.invalidate_async(obj_id, now)
+        return result.modified_count > 0
+
+    @_timed("delete")
+    async def delete(self, swap_id: str) -> bool:
+        """Delete a swap document."""
+        if self.collection is None:
+            return False
+        obj_id = _object_id(swap_id)
+        if obj_id is None:
+            return False
+        result = await self.collection.delete_one({"_id": obj_id})
+        await swap_cache.invalidate_async(obj_id)
+        return result.deleted_count > 0
+
+    @_timed("find")
+    async def pending_confirmations(self, since: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Swaps created after ``since`` whose transaction is not final yet."""
+        if self.collection is None:
+            return []
+        query = {
+            "finalized": {"$ne": True},
+            "created_at": {"$gte": since},
+            "tx_hash": {"$type": "string"},
+            "dst_chain": {"$ne": None},
+        }
+        projection = {"tx_hash": 1, "dst_chain": 1, "block_number": 1, "user": 1, "receiver": 1}
+        return await self.collection.find(query, projection).limit(limit).to_list(None)
+
+    @_timed("bulk_update")
+    async def bulk_update(self, updates: Dict[Any, Dict[str, Any]]) -> int:
+        """Set fields on many swaps in one round trip; ``updates`` maps swap ID to fields."""
+        if self.collection is None or not updates:
+            return 0
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne({"_id": obj_id}, {"$set": {"updated_at": now, **fields}})
+            for obj_id, fields in ((_object_id(k), v) for k, v in updates.items())
+            if obj_id is not None
+        ]
+        if not ops:
+            return 0
+        result = await self.collection.bulk_write(ops, ordered=False)
+        await swap_cache.invalidate_many_async(updates, now)
+        return result.modified_count
+
+    @_timed("find")
+    async def history(self, user: str | None = None, limit: int | None = None) -> List[Dict[str, Any]]:
+        """Return swap summaries, newest first, optionally filtered by user."""
+        if self.collection is None:
+            return []
+        query = {"user": user} if user else {}
+        # Quotes are only ever inline on documents not yet migrated to swap_quotes
+        cursor = self.collection.find(query, {"_id": 0, "quote": 0}).sort("_id", -1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(None)
+
+
+class AsyncSwapQuoteRepository(_AsyncRepository):
+    """Compressed raw Relay quotes, kept out of ``swaps`` to keep swap documents small."""
+
+    collection_name = QUOTE_COLLECTION
+    # Quotes never change once stored, so decoded ones can be kept indefinitely
+    cache_size = 1000
+
+    def __init__(self, db):
+        super().__init__(db)
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @_timed("insert")
+    async def create(self, swap_id: Any, quote: Dict[str, Any]) -> Optional[str]:
+        if self.collection is None:
+            return None
+        result = await self.collection.insert_one({"swap_id": swap_id, **encode_quote(quote)})
+        return str(result.inserted_id)
+
+    async def load(self, swap: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the raw quote of a swap document, fetching it only if stored apart."""
+        if "quote" in swap:
+            return swap["quote"]
+        quote_id = swap.get("quote_id")
+        if not quote_id:
+            return None
+        quote = self._cache.get(quote_id)
+        if quote is None:
+            quote = decode_quote(await self.get(quote_id))
+            if quote is None:
+                return None
+            self._cache[quote_id] = quote
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(quote_id)
+        return quote
+
+
+class AsyncBasketRepository(_AsyncRepository):
+    """Async access to the ``baskets`` collection."""
+
+    collection_name = "baskets"
+
+    @_timed("insert")
+    async def create(self, doc: Dict[str, Any]) -> Optional[str]:
+        if self.collection is None:
+            return None
+        result = await self.collection.insert_one(doc)
+        return str(result.inserted_id)
+
+    @_timed("update")
+    async def set_coins(self, basket_id: Any, coins: List[Dict[str, Any]]) -> bool:
+        if self.collection is None:
+            return False
+        obj_id = _object_id(basket_id)
+        if obj_id is None:
+            return False
+        result = await self.collection.update_one({"_id": obj_id}, {"$set": {"coins": coins}})
+        return result.matched_count > 0
+
+
+class AsyncDcaJobRepository(_AsyncRepository):
+    """Async access to the ``dca_jobs`` collection."""
+
+    collection_name = "dca_jobs"
+
+    @_timed("find")
+    async def find_by_status(
+        self, statuses: Iterable[str], projection: Dict[str, Any] | None = None
+    ) -> List[Dict[str, Any]]:
+        if self.collection is None:
+            return []
+        return await self.collection.find({"status": {"$in": list(statuses)}}, projection).to_list(None)
+
+    @_timed("count")
+    async def count_active(self) -> int:
+        if self.collection is None:
+            return 0
+        return await self.collection.count_documents({"status": "active"})
+
+
+class AsyncEventRepository(_AsyncRepository):
+    """Async access to the ``events`` collection."""
+
+    collection_name = "events"
+
+    @_timed("find")
+    async def page(
+        self,
+        query: Dict[str, Any],
+        projection: Dict[str, Any] | None,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` events matching ``query`` in ``_id`` order."""
+        if self.collection is None:
+            return []
+        return await self.collection.find(query, projection).sort("_id", 1).limit(limit).to_list(None)
+
+
+class AsyncSwapMetricsRepository(_AsyncRepository):
+    """Async access to the ``swap_metrics`` collection."""
+
+    collection_name = "swap_metrics"
+
+    @_timed("insert")
+    async def create(self, doc: Dict[str, Any]) -> Optional[str]:
+        if self.collection is None:
+            return None
+        result = await self.collection.insert_one(doc)
+        return str(result.inserted_id)
+
+    @_timed("upsert")
+    async def create_once(self, key: Dict[str, Any], doc: Dict[str, Any]) -> Tuple[Optional[str], bool]:
+        """Insert ``doc`` unless a document matching ``key`` exists.
+
+        Returns the document ID and whether it was inserted by this call.
+        Relies on a unique index over ``key`` to stay race free.
+        """
+        if self.collection is None:
+            return None, False
+        new_id = ObjectId()
+        doc = {k: v for k, v in doc.items() if k not in key}
+        try:
+            found = await self.collection.find_one_and_update(
+                key,
+                {"$setOnInsert": {**doc, "_id": new_id}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={"_id": 1},
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert won the insert
+            found = await self.collection.find_one(key, {"_id": 1})
+        if found is None:
+            return None, False
+        return str(found["_id"]), found["_id"] == new_id
+
+    @_timed("update")
+    async def update(self, metric_id: Any, fields: Dict[str, Any]) -> bool:
+        if self.collection is None:
+            return False
+        obj_id = _object_id(metric_id)
+        if obj_id is None:
+            return False
+        result = await self.collection.update_one({"_id": obj_id}, {"$set": fields})
+        return result.modified_count > 0
+
+    @_timed("delete")
+    async def delete(self, metric_id: Any) -> bool:
+        if self.collection is None:
+            return False
+        obj_id = _object_id(metric_id)
+        if obj_id is None:
+            return False
+        result = await self.collection.delete_one({"_id": obj_id})
+        return result.deleted_count > 0
@@ -0,0 +1,216 @@
+"""
+Read-through cache of swap summaries for the status endpoints.
+
+Frontends poll ``GET /swap/{id}`` and ``/swap/{id}/status`` every second or
+so. A summary is the small, client-facing part of a swap document (status,
+tx hash, timestamps, ``quote_id``), serialised to JSON together with an ETag.
+It is kept in Redis so every replica shares it, and in a small in-process
+LRU in front of Redis.
+
+Redis entries carry a version, the swap's ``updated_at`` in milliseconds.
+Repository writes (``update``, ``add_step_log``, ``bulk_update``) replace the
+entry with a tombstone holding the version they wrote, and ``put`` only
+stores a summary whose version is not older than the entry already there. A
+reader that fetched the document just before a write can therefore not put
+the stale summary back after the write invalidated it. Other replicas' LRU
+entries are not invalidated, so they only live ``SWAP_CACHE_LOCAL_SECONDS``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.instrumentation import cache_result
+from app.db.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+SWAP_CACHE_KEY = "swap:summary:v2:{swap_id}"
+SWAP_CACHE_TTL = int(os.getenv("SWAP_CACHE_TTL", "300"))
+SWAP_CACHE_LOCAL_SIZE = int(os.getenv("SWAP_CACHE_LOCAL_SIZE", "10000"))
+SWAP_CACHE_LOCAL_SECONDS = float(os.getenv("SWAP_CACHE_LOCAL_SECONDS", "2"))
+
+# Fields of a swap document the status endpoints read
+SUMMARY_FIELDS = (
+    "status",
+    "quote_id",
+    "execution",
+    "tx_hash",
+    "chain_id",
+    "dst_chain",
+    "block_number",
+    "receipt_status",
+    "finalized",
+    "created_at",
+    "executed_at",
+    "updated_at",
+)
+SUMMARY_PROJECTION = {field: 1 for field in SUMMARY_FIELDS}
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Store ARGV[2] unless the entry holds a newer version; values are "<version>|<summary>"
+_PUT_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current then
+    local version = tonumber(string.match(current, '^(%d+)|'))
+    if version and version > tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('set', KEYS[1], ARGV[1] .. '|' .. ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def _json_default(value: Any) -> Any:
+    # Match FastAPI's encoding so cached and uncached responses are identical
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def version_of(updated_at: Any) -> int:
+    """Cache version of a swap last written at ``updated_at`` (Mongo keeps milliseconds)."""
+    if not isinstance(updated_at, datetime):
+        return 0
+    return (updated_at.replace(tzinfo=None) - _EPOCH) // timedelta(milliseconds=1)
+
+
+def encode_summary(doc: Dict[str, Any]) -> str:
+    """Serialise a swap document's summary fields with an ETag of their content."""
+    summary = {"_id": str(doc["_id"]), **{f: doc[f] for f in SUMMARY_FIELDS if f in doc}}
+    body = json.dumps(summary, default=_json_default, sort_keys=True, separators=(",", ":"))
+    summary = json.loads(body)
+    summary["etag"] = hashlib.sha1(body.encode()).hexdigest()[:16]
+    return json.dumps(summary, separators=(",", ":"))
+
+
+class SwapCache:
+    """Redis-backed swap summaries with an in-process LRU in front."""
+
+    def __init__(
+        self,
+        client=None,
+        ttl: int = SWAP_CACHE_TTL,
+        local_size: int = SWAP_CACHE_LOCAL_SIZE,
+        local_seconds: float = SWAP_CACHE_LOCAL_SECONDS,
+    ):
+        self.client = client if client is not None else redis_client
+        self.ttl = ttl
+        self.local_size = local_size
+        self.local_seconds = local_seconds
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, swap_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._local.get(swap_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[swap_id]
+                return None
+            self._local.move_to_end(swap_id)
+            return entry[1]
+
+    def _remember(self, swap_id: str, summary: Dict[str, Any]) -> None:
+        with self._lock:
+            self._local[swap_id] = (time.monotonic() + self.local_seconds, summary)
+            self._local.move_to_end(swap_id)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, swap_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached summary of ``swap_id``, or ``None`` on a miss."""
+        summary = self._get_local(swap_id)
+        if summary is None:
+            try:
+                raw = self.client.get(SWAP_CACHE_KEY.format(swap_id=swap_id))
+            except Exception as exc:
+                logger.error("Swap cache read failed: %s", exc)
+                raw = None
+            if isinstance(raw, bytes):
+                raw = raw.decode()
+            body = raw.partition("|")[2] if raw else ""
+            # An empty body is a tombstone left by a write
+            if body:
+                summary = json.loads(body)
+                self._remember(swap_id, summary)
+        cache_result("swap", summary is not None)
+        return summary
+
+    def put(self, swap_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache the summary of a freshly read swap document and return it.
+
+        The summary is not cached if a write newer than ``doc`` already
+        invalidated the entry.
+        """
+        raw = encode_summary(doc)
+        summary = json.loads(raw)
+        try:
+            stored = self.client.eval(
+                _PUT_SCRIPT, 1, SWAP_CACHE_KEY.format(swap_id=swap_id),
+                version_of(doc.get("updated_at")), raw, self.ttl,
+            )
+        except Exception as exc:
+            logger.error("Swap cache write failed: %s", exc)
+            stored = True
+        if stored:
+            self._remember(swap_id, summary)
+        return summary
+
+    def invalidate(self, swap_id: Any, updated_at: Optional[datetime] = None) -> None:
+        """Drop ``swap_id``'s summary after a write made at ``updated_at``."""
+        self.invalidate_many([swap_id], updated_at)
+
+    def invalidate_many(self, swap_ids: Iterable[Any], updated_at: Optional[datetime] = None) -> None:
+        """Drop the summaries of ``swap_ids``.
+
+        With ``updated_at`` the entries become tombstones that keep summaries
+        read before that write out of the cache; without it they are deleted.
+        """
+        swap_ids = [str(swap_id) for swap_id in swap_ids]
+        if not swap_ids:
+            return
+        with self._lock:
+            for swap_id in swap_ids:
+                self._local.pop(swap_id, None)
+        keys = [SWAP_CACHE_KEY.format(swap_id=swap_id) for swap_id in swap_ids]
+        try:
+            if updated_at is None:
+                self.client.delete(*keys)
+            else:
+                tombstone = f"{version_of(updated_at)}|"
+                pipe = self.client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.set(key, tombstone, ex=self.ttl)
+                pipe.execute()
+        except Exception as exc:
+            logger.error("Swap cache invalidation failed for %d swaps: %s", len(swap_ids), exc)
+
+    async def get_async(self, swap_id: str) -> Optional[Dict[str, Any]]:
+        summary = self._get_local(swap_id)
+        if summary is not None:
+            cache_result("swap", True)
+            return summary
+        return await asyncio.to_thread(self.get, swap_id)
+
+    async def put_async(self, swap_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.put, swap_id, doc)
+
+    async def invalidate_async(self, swap_id: Any, updated_at: Optional[datetime] = None) -> None:
+        await asyncio.to_thread(self.invalidate, swap_id, updated_at)
+
+    async def invalidate_many_async(self, swap_ids: Iterable[Any], updated_at: Optional[datetime] = None) -> None:
+        await asyncio.to_thread(self.invalidate_many, list(swap_ids), updated_at)
+
+
+swap_cache = SwapCache()
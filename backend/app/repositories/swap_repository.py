@@ -1,17 +1,42 @@
+import json
 import logging
+import zlib
 from datetime import datetime
 from typing import Any, Dict, Optional, List
 
-from bson import ObjectId
+from bson import Binary, ObjectId
 from pymongo.collection import Collection
 from pydantic import BaseModel, Field
 
+from app.core.instrumentation import mongo_timed
+from app.repositories.swap_cache import SUMMARY_PROJECTION, swap_cache
+
+
+# Raw Relay quotes live here, compressed, keyed by the swap's ``quote_id``
+QUOTE_COLLECTION = "swap_quotes"
+QUOTE_ENCODING = "zlib+json"
+
+
+def encode_quote(quote: Dict[str, Any]) -> Dict[str, Any]:
+    """Compress a quote into the fields of a ``swap_quotes`` document."""
+    raw = json.dumps(quote, separators=(",", ":"), default=str).encode()
+    return {"encoding": QUOTE_ENCODING, "size": len(raw), "data": Binary(zlib.compress(raw, 6))}
+
+
+def decode_quote(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Inverse of :func:`encode_quote`."""
+    if not doc or doc.get("encoding") != QUOTE_ENCODING:
+        return None
+    return json.loads(zlib.decompress(doc["data"]))
+
 
 class Swap(BaseModel):
     """Schema for swap documents."""
 
     swap_id: Optional[str] = Field(default=None, alias="_id")
-    quote: Dict[str, Any]
+    # Reference into ``swap_quotes``; older documents carry ``quote`` inline
+    quote_id: Optional[str] = None
+    quote: Optional[Dict[str, Any]] = None
     chain_id: Optional[int] = None
     status: str = "new"
     tx_hash: Optional[str] = None
@@ -41,6 +66,7 @@ class SwapRepository:
         except Exception as exc:
             self.logger.error("Failed to create unique index: %s", exc)
 
+    @mongo_timed("swaps", "insert")
     def create(self, data: Dict[str, Any]) -> Optional[str]:
         """Insert a new swap document and return its ID."""
         if self.collection is None:
@@ -56,6 +82,7 @@ class SwapRepository:
         result = self.collection.insert_one(doc)
         return str(result.inserted_id)
 
+    @mongo_timed("swaps", "find_one")
     def get(self, swap_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve a swap document by ID."""
         if self.collection is None:
@@ -66,6 +93,27 @@ class SwapRepository:
             return None
         return self.collection.find_one({"_id": obj_id})
 
+    def get_summary(self, swap_id: str) -> Optional[Dict[str, Any]]:
+        """Read-through cached summary of a swap, with an ``etag``."""
+        if self.collection is None:
+            return None
+        try:
+            obj_id = ObjectId(swap_id)
+        except Exception:
+            return None
+        summary = swap_cache.get(str(obj_id))
+        if summary is not None:
+            return summary
+        doc = self._find_summary(obj_id)
+        if doc is None:
+            return None
+        return swap_cache.put(str(obj_id), doc)
+
+    @mongo_timed("swaps", "find_one")
+    def _find_summary(self, obj_id: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": obj_id}, SUMMARY_PROJECTION)
+
+    @mongo_timed("swaps", "update")
     def update(self, swap_id: str, fields: Dict[str, Any]) -> bool:
         """Update fields of a swap document."""
         if self.collection is None:
@@ -76,8 +124,10 @@ class SwapRepository:
             return False
         fields.setdefault("updated_at", datetime.utcnow())
         result = self.collection.update_one({"_id": obj_id}, {"$set": fields})
+        swap_cache.invalidate(obj_id, fields["updated_at"])
         return result.modified_count > 0
 
+    @mongo_timed("swaps", "update")
     def add_step_log(self, swap_id: str, log: Dict[str, Any]) -> bool:
         """Append a step log to the swap document."""
         if self.collection is None:
@@ -86,12 +136,15 @@ class SwapRepository:
             obj_id = ObjectId(swap_id)
         except Exception:
             return False
+        now = datetime.utcnow()
         result = self.collection.update_one(
             {"_id": obj_id},
-            {"$push": {"step_logs": log}, "$set": {"updated_at": datetime.utcnow()}},
+            {"$push": {"step_logs": log}, "$set": {"updated_at": now}},
         )
+        swap_cache.invalidate(obj_id, now)
         return result.modified_count > 0
 
+    @mongo_timed("swaps", "delete")
     def delete(self, swap_id: str) -> bool:
         """Delete a swap document."""
         if self.collection is None:
@@ -101,4 +154,5 @@ class SwapRepository:
         except Exception:
             return False
         result = self.collection.delete_one({"_id": obj_id})
+        swap_cache.invalidate(obj_id)
         return result.deleted_count > 0
@@ -1,12 +1,20 @@
+from collections import defaultdict
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
-from bson import ObjectId
+from typing import Dict, List
 
-from app.db.db import db
+from app.core.rebalance import REBALANCE_MIN_TRADE_USD, basket_weights, plan_rebalances
+from app.db.db import async_db
+from app.medusa_core.prices import price_key, price_service
+from app.medusa_core.resolve_balance import BalanceProvider
+from app.medusa_core.token_map import resolve_token_addresses_async
+from app.repositories.async_repositories import AsyncBasketRepository
 
 router = APIRouter()
 
+baskets_repo = AsyncBasketRepository(async_db)
+
 
 class Coin(BaseModel):
     symbol: str
@@ -21,7 +29,7 @@ class BasketCreate(BaseModel):
 
 
 @router.post("/baskets")
-def create_basket(basket: BasketCreate):
+async def create_basket(basket: BasketCreate):
     if basket.weighting != "equal":
         total = sum(c.weight or 0 for c in basket.coins)
         if abs(total - 100) > 0.001:
@@ -35,8 +43,7 @@ def create_basket(basket: BasketCreate):
                 c.weight = w
 
     doc = basket.dict()
-    result = db.baskets.insert_one(doc) if db is not None else None
-    return {"id": str(result.inserted_id) if result else None}
+    return {"id": await baskets_repo.create(doc)}
 
 
 class CoinList(BaseModel):
@@ -44,8 +51,8 @@ class CoinList(BaseModel):
 
 
 @router.post("/baskets/{basket_id}/coins")
-def add_coins(basket_id: str, req: CoinList):
-    basket = db.baskets.find_one({"_id": ObjectId(basket_id)}) if db is not None else None
+async def add_coins(basket_id: str, req: CoinList):
+    basket = await baskets_repo.get(basket_id)
     if not basket:
         raise HTTPException(status_code=404, detail="basket not found")
 
@@ -55,5 +62,39 @@ def add_coins(basket_id: str, req: CoinList):
         if abs(total - 100) > 0.001:
             raise HTTPException(status_code=400, detail="weights must sum to 100")
 
-    db.baskets.update_one({"_id": ObjectId(basket_id)}, {"$set": {"coins": coins}})
+    await baskets_repo.set_coins(basket_id, coins)
     return {"status": "updated"}
+
+
+@router.get("/baskets/{basket_id}/rebalance-plan")
+async def rebalance_plan(
+    basket_id: str,
+    wallet: str | None = None,
+    chain_id: int = 1,
+    cash_usd: float = 0.0,
+    min_trade_usd: float = REBALANCE_MIN_TRADE_USD,
+):
+    """Trades that move a wallet's holdings on ``chain_id`` to the basket weights.
+
+    ``wallet`` defaults to the basket owner; ``cash_usd`` is new money to invest.
+    """
+    basket = await baskets_repo.get(basket_id)
+    if not basket:
+        raise HTTPException(status_code=404, detail="basket not found")
+    wallet = wallet or basket.get("user")
+    if not wallet:
+        raise HTTPException(status_code=422, detail="wallet required")
+
+    symbols = list(basket_weights(basket))
+    addresses = await resolve_token_addresses_async([(chain_id, symbol) for symbol in symbols])
+    balances = await BalanceProvider.resolve_balances(wallet)
+    quoted = await price_service.get_prices((chain_id, address) for address in addresses)
+
+    holdings: Dict[str, float] = defaultdict(float)
+    for balance in balances:
+        if balance.get("chain_id") == chain_id and balance.get("symbol"):
+            holdings[balance["symbol"].upper()] += float(balance.get("amount", 0))
+    prices = {symbol: quoted.get(price_key(chain_id, address)) for symbol, address in zip(symbols, addresses)}
+
+    plan = plan_rebalances([basket], [holdings], prices, [cash_usd], min_trade_usd=min_trade_usd)[0]
+    return {"basket_id": basket_id, "wallet": wallet, "chain_id": chain_id, **plan}
@@ -1,19 +1,157 @@
+import asyncio
+import logging
+import threading
+import time
 from datetime import datetime
-from fastapi import APIRouter
+from typing import Any, Dict, List
 
-from app.db.db import db
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+
+from app.db.db import async_db, mongo_available, redis_available, redis_client
+from app.repositories.async_repositories import AsyncEventRepository
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+EVENT_TYPE = "dca_tick"
+EVENTS_CHANNEL = f"events:{EVENT_TYPE}"
 
-@router.get("/events")
-def get_events(since: float | None = None):
-    if db is None:
-        return {"events": []}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_WAIT_SECONDS = 30.0
+# Poll interval used for long-poll when Redis notifications are unavailable
+FALLBACK_POLL_SECONDS = 1.0
+# Re-check Mongo at least this often in case a notification was missed
+RECHECK_SECONDS = 5.0
+
+# Only the fields the frontend charts need
+CHART_PROJECTION = {"_id": 1, "job_id": 1, "timestamp": 1, "latency": 1, "success": 1}
+
+
+class _EventNotifier:
+    """Fan out ``log_event`` notifications from Redis to waiting requests.
+
+    A single background thread holds one pubsub subscription per process and
+    wakes every long-poll waiter when a new event is published, so waiting
+    clients do not each need their own Redis connection.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.seq = 0
+        self._waiters: set[asyncio.Future] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _ensure_started(self) -> bool:
+        if not redis_available():
+            return False
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._listen, name="events-notifier", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                pubsub.subscribe(self.channel)
+                for msg in pubsub.listen():
+                    if msg and msg.get("type") == "message":
+                        self._wake_all()
+            except Exception as exc:
+                logger.error("Events notifier subscription failed: %s", exc)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(FALLBACK_POLL_SECONDS)
+
+    def _wake_all(self) -> None:
+        with self._lock:
+            self.seq += 1
+            waiters, self._waiters = self._waiters, set()
+        for fut in waiters:
+            loop = fut.get_loop()
+            loop.call_soon_threadsafe(lambda f=fut: f.done() or f.set_result(True))
 
-    query = {"type": "dca_tick"}
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a notification newer than ``seq``."""
+        if not self._ensure_started():
+            await asyncio.sleep(min(timeout, FALLBACK_POLL_SECONDS))
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if self.seq != seq:
+                return True
+            self._waiters.add(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(fut)
+
+
+notifier = _EventNotifier(EVENTS_CHANNEL)
+events_repo = AsyncEventRepository(async_db)
+
+
+def _parse_cursor(cursor: str | None) -> ObjectId | None:
+    if not cursor:
+        return None
+    try:
+        return ObjectId(cursor)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+async def _fetch_page(since: float | None, after: ObjectId | None, limit: int) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"type": EVENT_TYPE}
     if since:
         query["timestamp"] = {"$gt": datetime.fromtimestamp(since)}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+
+    # Fetch one extra document to know whether another page follows
+    docs: List[Dict[str, Any]] = await events_repo.page(query, CHART_PROJECTION, limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = str(docs[-1]["_id"]) if docs else (str(after) if after else None)
+    for doc in docs:
+        doc.pop("_id", None)
+    return {"events": docs, "next_cursor": next_cursor, "has_more": has_more}
+
+
+@router.get("/events")
+async def get_events(
+    since: float | None = None,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS),
+):
+    """Return a page of ``dca_tick`` events in insertion order.
 
-    events = list(db.events.find(query, {"_id": 0}).sort("timestamp", 1))
-    return {"events": events}
+    Pass the returned ``next_cursor`` back as ``cursor`` to continue reading.
+    With ``wait`` > 0 the request long-polls: if no events are available yet
+    it blocks for up to ``wait`` seconds until ``log_event`` signals new ones.
+    """
+    after = _parse_cursor(cursor)
+    if not mongo_available():
+        return {"events": [], "next_cursor": cursor, "has_more": False}
+    deadline = time.monotonic() + wait
+    while True:
+        seq = notifier.seq
+        page = await _fetch_page(since, after, limit)
+        remaining = deadline - time.monotonic()
+        if page["events"] or remaining <= 0:
+            return page
+        await notifier.wait(seq, min(remaining, RECHECK_SECONDS))
@@ -1,14 +1,26 @@
 from fastapi import APIRouter, HTTPException
-import os
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 import asyncio
+import os
 from datetime import datetime
-import requests
-from typing import Dict, Any
+from typing import Awaitable, Callable, Dict, Any
 from app.utils.error_handling import handle_agent_error
-
-from app.db.db import mongo_connected, redis_connected, scheduler
-
-RELAY_BASE_URL = os.getenv("RELAY_BASE_URL", "https://api.relay.link")
+from app.medusa_core.http import request_json
+
+from app.db.db import connection_state, scheduler
+from app.core.metrics import metrics_cache
+from app.core.startup import phase_ok, startup_report
+from app.core.health_probe import (
+    HEALTH_CHECK_TIMEOUT_SECONDS,
+    ping_mongo,
+    ping_redis,
+    prober,
+    run_check,
+)
+from app.medusa_core import token_map
+from app.medusa_core.balance import head_tracker
+from app.schedulers.cluster import cluster, job_count as scheduled_job_count
 
 router = APIRouter()
 
@@ -22,52 +34,62 @@ async def check_wallet_connector_health() -> Dict[str, Any]:
 
 
 async def check_swap_router_health() -> Dict[str, Any]:
-    try:
-        res = requests.get(f"{RELAY_BASE_URL}/health", timeout=5)
-        res.raise_for_status()
-        return {"status": "ok"}
-    except Exception as exc:
-        await handle_agent_error("Health", exc)
-        return {"status": "error", "error": str(exc)}
+    # Served from the background prober so /health never waits on Relay
+    result = prober.get("relay")
+    if result["status"] == "error":
+        await handle_agent_error("Health", RuntimeError(result.get("error")))
+    return result
 
 
-async def check_dca_executor_health() -> Dict[str, Any]:
-    scheduler_running = False
-    job_count = 0
-    if scheduler:
-        scheduler_running = scheduler.running
-        job_count = len(scheduler.get_jobs())
+def _scheduler_state() -> Dict[str, Any]:
+    # Job count and queue depth are sync Mongo/Redis reads
+    return {
+        "scheduler_running": scheduler.running,
+        "scheduler_leader": cluster.is_leader,
+        # True while leading without the Redis lease (Redis unreachable)
+        "scheduler_local_leader": cluster.local_leader,
+        "queue_depth": cluster.queue_depth(),
+        "job_count": scheduled_job_count(),
+    }
+
 
+async def check_dca_executor_health() -> Dict[str, Any]:
+    mongo_connected = prober.get("mongo")["status"] == "ok"
     result = {
         "mongo_connected": mongo_connected,
-        "scheduler_running": scheduler_running,
-        "job_count": job_count,
+        **await asyncio.to_thread(_scheduler_state),
     }
-    result["status"] = "ok" if mongo_connected and scheduler_running else "error"
+    result["status"] = "ok" if mongo_connected and result["scheduler_running"] else "error"
     return result
 
 
 async def check_analytics_logger_health() -> Dict[str, Any]:
     result = {
-        "mongo_connected": mongo_connected,
-        "redis_connected": redis_connected,
+        "mongo_connected": prober.get("mongo")["status"] == "ok",
+        "redis_connected": prober.get("redis")["status"] == "ok",
     }
-    result["status"] = "ok" if mongo_connected else "error"
+    result["status"] = "ok" if result["mongo_connected"] else "error"
     return result
 
 
+async def _bounded(check: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    try:
+        return await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"status": "error", "error": f"timed out after {HEALTH_CHECK_TIMEOUT_SECONDS}s"}
+    except Exception as exc:
+        return {"status": "error", "error": str(exc)}
+
+
 async def check_agent_health() -> Dict[str, Any]:
-    wallet_connector = await check_wallet_connector_health()
-    swap_router = await check_swap_router_health()
-    dca_executor = await check_dca_executor_health()
-    analytics_logger = await check_analytics_logger_health()
-
-    checks = {
-        "wallet_connector": wallet_connector,
-        "swap_router": swap_router,
-        "dca_executor": dca_executor,
-        "analytics_logger": analytics_logger,
+    components = {
+        "wallet_connector": check_wallet_connector_health,
+        "swap_router": check_swap_router_health,
+        "dca_executor": check_dca_executor_health,
+        "analytics_logger": check_analytics_logger_health,
     }
+    results = await asyncio.gather(*(_bounded(check) for check in components.values()))
+    checks = dict(zip(components, results))
 
     overall = "ok" if all(c.get("status") == "ok" for c in checks.values()) else "error"
 
@@ -78,27 +100,59 @@ async def check_agent_health() -> Dict[str, Any]:
     }
 
 @router.get("/health/zksync")
-def health_zksync():
+async def health_zksync():
     if not RPC_URL:
         raise HTTPException(status_code=500, detail="SEPOLIA_RPC_URL not configured")
     try:
-        res = requests.post(
+        status, data, _ = await request_json(
+            "POST",
             RPC_URL,
             json={"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []},
             timeout=5,
         )
-        if res.status_code == 429:
+        if status == 429:
             raise HTTPException(status_code=503, detail="rpc rate limited")
-        res.raise_for_status()
-        data = res.json()
-        return {"status": "ok", "result": data.get("result")}
+        if status >= 400:
+            raise RuntimeError(f"rpc returned HTTP {status}")
+        return {"status": "ok", "result": data.get("result") if isinstance(data, dict) else None}
     except HTTPException:
         raise
     except Exception as exc:
-        asyncio.run(handle_agent_error("Health", exc))
+        await handle_agent_error("Health", exc)
         raise HTTPException(status_code=503, detail=str(exc))
 
 
 @router.get("/health")
 async def health_root():
     return await check_agent_health()
+
+
+@router.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and its event loop is responsive."""
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def health_ready():
+    """Readiness: MongoDB answers a ping; cache warmth is reported alongside."""
+    mongo, redis = await asyncio.gather(run_check(ping_mongo), run_check(ping_redis))
+    connection_state["mongo"] = mongo["status"] == "ok"
+    connection_state["redis"] = redis["status"] == "ok"
+    report = startup_report()
+    caches = {
+        "token_map": bool(token_map._REMOTE_MAP),
+        "metrics": bool(metrics_cache),
+        "scheduler": phase_ok("cluster"),
+    }
+    # The static TOKEN_MAP serves quotes until Relay's map loads, and requests retry
+    # the load, so a cold token map is reported but does not block readiness
+    ready = connection_state["mongo"]
+    body = {
+        "ready": ready,
+        "connections": {"mongo": mongo, "redis": redis},
+        "upstream": {"relay": prober.get("relay"), "chain_heads": head_tracker.stats()},
+        "caches": caches,
+        **report,
+    }
+    return JSONResponse(jsonable_encoder(body), status_code=200 if ready else 503)
@@ -1,7 +1,18 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
 
-from app.core.metrics import metrics_cache, compute_tvl
+from fastapi import APIRouter, HTTPException, Response
+
+from app.core.instrumentation import CONTENT_TYPE_LATEST, render_latest
+from app.core.metrics import metrics_cache, compute_tvl_async, compute_tvl_usd_async
+from app.core.tracing import tracer
+from app.medusa_core.confirmations import confirmation_tracker
+from app.medusa_core.prices import price_service
+from app.medusa_core.resolve_balance import providers
+from app.medusa_core.route_index import route_index
+from app.medusa_core.stream_hub import hub as stream_hub
 from app.medusa_core.token_map import TOKEN_MAP
+from app.schedulers.cluster import cluster
+from app.schedulers.dispatch import dispatcher
 
 router = APIRouter()
 
@@ -21,7 +32,66 @@ def metrics_job(job_id: str):
 
 
 @router.get("/metrics/tvl")
-def metrics_tvl():
-    """Return total value locked across tracked tokens."""
-    total = compute_tvl(TOKEN_MAP)
+async def metrics_tvl(usd: bool = False):
+    """Return total value locked across tracked tokens, optionally priced in USD."""
+    if usd:
+        total, total_usd = await asyncio.gather(
+            compute_tvl_async(TOKEN_MAP), compute_tvl_usd_async(TOKEN_MAP)
+        )
+        return {"tvl": total, "tvl_usd": total_usd}
+    total = await compute_tvl_async(TOKEN_MAP)
     return {"tvl": total}
+
+
+@router.get("/metrics/prices")
+def metrics_prices():
+    """Return price cache size and how many tokens are kept warm."""
+    return price_service.stats()
+
+
+@router.get("/metrics/dispatch")
+def metrics_dispatch():
+    """Return cron dispatch queue depth, lag and rate-limit state."""
+    return {
+        **dispatcher.stats(),
+        "worker_queue_depth": cluster.queue_depth(),
+        "leader": cluster.is_leader,
+    }
+
+
+@router.get("/metrics/providers")
+def metrics_providers():
+    """Return recent quote latency and success rate per provider."""
+    return providers.quote_stats()
+
+
+@router.get("/metrics/routes")
+def metrics_routes():
+    """Return route-availability index hits and negative entries."""
+    return route_index.stats()
+
+
+@router.get("/metrics/confirmations")
+def metrics_confirmations():
+    """Return pending transactions per chain and receipt batches sent."""
+    return confirmation_tracker.stats()
+
+
+@router.get("/metrics/stream")
+def metrics_stream():
+    """Return WebSocket stream channels, subscriptions and delivered messages."""
+    return stream_hub.stats()
+
+
+@router.get("/metrics/prometheus")
+async def metrics_prometheus():
+    """Expose Prometheus metrics in the text exposition format."""
+    # Queue-depth gauges read Redis, so render off the event loop
+    body = await asyncio.to_thread(render_latest)
+    return Response(content=body, media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/metrics/traces/slowest")
+def metrics_slowest_traces(reset: bool = False):
+    """Return the slowest recorded request traces as OTLP/JSON documents."""
+    return {"traces": tracer.slowest(reset=reset)}
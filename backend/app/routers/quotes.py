@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.log_config.structured import SAMPLED
+from app.medusa_core.resolve_balance import providers
+from app.medusa_core.route_index import route_index
+from app.medusa_core.token_map import CHAIN_IDS, resolve_token_addresses_async
+from app.utils.addresses import is_address_for_chain
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Largest batch accepted by POST /quotes
+QUOTE_BATCH_MAX_ITEMS = int(os.getenv("QUOTE_BATCH_MAX_ITEMS", "25"))
+# Relay quote calls in flight at once for a single batch
+QUOTE_BATCH_CONCURRENCY = int(os.getenv("QUOTE_BATCH_CONCURRENCY", "8"))
+
+
+class QuoteItem(BaseModel):
+    source_chain: str
+    destination_chain: str
+    token_in: str
+    token_out: str
+    amount: str
+    user_address: str
+    receiver_address: Optional[str] = None
+
+
+class QuoteBatch(BaseModel):
+    quotes: List[QuoteItem]
+
+
+def _error(index: int, code: str, message: Any) -> Dict[str, Any]:
+    return {"index": index, "status": "error", "message": message, "code": code}
+
+
+def _validate(index: int, item: QuoteItem) -> Dict[str, Any]:
+    """Check one item the way GET /quote does; return Relay params or an error."""
+    try:
+        src_chain_id = int(item.source_chain)
+        dst_chain_id = int(item.destination_chain)
+    except ValueError:
+        return _error(index, "INVALID_REQUEST", "source_chain and destination_chain must be chain ids")
+
+    if not is_address_for_chain(item.user_address, src_chain_id):
+        return _error(index, "INVALID_REQUEST", "Invalid user_address for source chain")
+
+    receiver = item.receiver_address
+    if receiver is None:
+        if CHAIN_IDS.get(dst_chain_id, "").lower() == "solana":
+            return _error(index, "INVALID_REQUEST", "receiver_address required for Solana")
+        receiver = item.user_address
+    elif not is_address_for_chain(receiver, dst_chain_id):
+        return _error(index, "INVALID_REQUEST", "Invalid receiver_address for destination chain")
+
+    # Checked before symbols are resolved, which would refresh the token map for an unknown chain
+    rejected = route_index.check_chains(src_chain_id, dst_chain_id)
+    if rejected is not None:
+        return _error(index, rejected["code"], rejected["message"])
+
+    return {
+        "originChainId": src_chain_id,
+        "destinationChainId": dst_chain_id,
+        "inputToken": item.token_in,
+        "outputToken": item.token_out,
+        "inputAmount": item.amount,
+        "user": item.user_address,
+        "receiver": receiver,
+        "tradeType": "EXACT_INPUT",
+    }
+
+
+async def _quote(index: int, params: Dict[str, Any], limit: asyncio.Semaphore) -> Dict[str, Any]:
+    rejected = route_index.check(params)
+    if rejected is not None:
+        return _error(index, rejected["code"], rejected["message"])
+    async with limit:
+        try:
+            aggregated = await providers.quote(params)
+        except Exception as exc:
+            logger.exception("Error getting quote %d of batch", index)
+            return _error(index, "QUOTE_FAILED", f"Error getting quote: {exc}")
+
+    if aggregated["quote"] is not None:
+        return {"index": index, "status": "success", "quote": aggregated["quote"]}
+    return _error(index, "QUOTE_FAILED", aggregated["message"])
+
+
+async def _prepare(batch: QuoteBatch) -> tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """Validate every item and resolve all token symbols in one pass.
+
+    Returns the per-item errors found so far and the Relay params of the
+    items that passed, keyed by position in the batch.
+    """
+    errors: List[Dict[str, Any]] = []
+    valid: Dict[int, Dict[str, Any]] = {}
+    for index, item in enumerate(batch.quotes):
+        checked = _validate(index, item)
+        if checked.get("status") == "error":
+            errors.append(checked)
+        else:
+            valid[index] = checked
+
+    pairs = []
+    for params in valid.values():
+        pairs.append((params["originChainId"], params["inputToken"]))
+        pairs.append((params["destinationChainId"], params["outputToken"]))
+    resolved = iter(await resolve_token_addresses_async(pairs))
+    for params in valid.values():
+        params["inputToken"] = next(resolved)
+        params["outputToken"] = next(resolved)
+    return errors, valid
+
+
+async def _stream(errors: List[Dict[str, Any]], tasks: List[asyncio.Task]) -> AsyncIterator[bytes]:
+    for error in errors:
+        yield (json.dumps(error) + "\n").encode()
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield (json.dumps(await finished, default=str) + "\n").encode()
+    finally:
+        # Client went away: don't leave Relay calls running for nobody
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/quotes")
+async def get_quotes(batch: QuoteBatch, stream: bool = False):
+    """Quote several swaps at once.
+
+    Results come back in request order, each with its ``index`` and either a
+    ``quote`` or an error ``code``. With ``?stream=true`` the response is
+    newline-delimited JSON, one line per item in completion order.
+    """
+    if not batch.quotes:
+        raise HTTPException(status_code=422, detail="quotes must not be empty")
+    if len(batch.quotes) > QUOTE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422, detail=f"at most {QUOTE_BATCH_MAX_ITEMS} quotes per request"
+        )
+    logger.debug("Quote batch of %d items", len(batch.quotes), extra=SAMPLED)
+
+    errors, valid = await _prepare(batch)
+    limit = asyncio.Semaphore(QUOTE_BATCH_CONCURRENCY)
+
+    if stream:
+        tasks = [asyncio.create_task(_quote(i, p, limit)) for i, p in valid.items()]
+        return StreamingResponse(_stream(errors, tasks), media_type="application/x-ndjson")
+
+    quoted = await asyncio.gather(*(_quote(i, p, limit) for i, p in valid.items()))
+    results = sorted([*errors, *quoted], key=lambda r: r["index"])
+    return {"status": "success", "results": results}
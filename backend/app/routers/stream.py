@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Set, Tuple
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.core.instrumentation import WEBSOCKET_CONNECTIONS
+from app.medusa_core.stream_hub import hub, swap_channel, wallet_channel
+from app.utils.addresses import is_wallet_address
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Updates arriving within this window go out together in one frame
+STREAM_BATCH_SECONDS = float(os.getenv("STREAM_BATCH_SECONDS", "0.25"))
+# Swaps plus wallets one connection may follow
+STREAM_MAX_SUBSCRIPTIONS = int(os.getenv("STREAM_MAX_SUBSCRIPTIONS", "200"))
+SWAP_ID_MAX_LENGTH = 64
+
+
+class _StreamClient:
+    """Subscriptions and pending updates of one ``/ws/stream`` connection."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.channels: Set[str] = set()
+        # Latest update per swap; a newer status replaces one not yet sent
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.wake = asyncio.Event()
+
+    def on_message(self, channel: str, data: str) -> None:
+        try:
+            update = json.loads(data)
+        except ValueError:
+            update = {"data": data}
+        if not isinstance(update, dict):
+            update = {"data": update}
+        key = str(update.get("swap_id") or channel)
+        previous = self.pending.get(key)
+        # Keep fields such as txHash that only an earlier update carried
+        self.pending[key] = {**previous, **update} if previous else update
+        self.wake.set()
+
+    async def send_batches(self) -> None:
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(STREAM_BATCH_SECONDS)
+            self.wake.clear()
+            batch, self.pending = self.pending, {}
+            if not batch:
+                continue
+            try:
+                await self.websocket.send_json({"type": "updates", "updates": list(batch.values())})
+            except Exception:
+                # Closed under us; the receive loop notices and cleans up
+                return
+
+    def _channels(self, message: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        swaps = message.get("swaps") or []
+        wallets = message.get("wallets") or []
+        if not isinstance(swaps, list) or not isinstance(wallets, list):
+            raise ValueError("swaps and wallets must be lists")
+        for swap_id in swaps:
+            if not isinstance(swap_id, str) or not 0 < len(swap_id) <= SWAP_ID_MAX_LENGTH:
+                raise ValueError(f"invalid swap id {swap_id!r}")
+        for wallet in wallets:
+            if not isinstance(wallet, str) or not is_wallet_address(wallet):
+                raise ValueError(f"invalid wallet {wallet!r}")
+        return swaps, wallets
+
+    def handle(self, message: Any) -> Dict[str, Any]:
+        """Apply a subscribe/unsubscribe message and return the reply frame."""
+        if not isinstance(message, dict) or message.get("action") not in {"subscribe", "unsubscribe"}:
+            raise ValueError("expected {\"action\": \"subscribe\"|\"unsubscribe\", \"swaps\": [...], \"wallets\": [...]}")
+        swaps, wallets = self._channels(message)
+        channels = [swap_channel(s) for s in swaps] + [wallet_channel(w) for w in wallets]
+        if message["action"] == "subscribe":
+            added = [c for c in dict.fromkeys(channels) if c not in self.channels]
+            if len(self.channels) + len(added) > STREAM_MAX_SUBSCRIPTIONS:
+                raise ValueError(f"at most {STREAM_MAX_SUBSCRIPTIONS} subscriptions per connection")
+            for channel in added:
+                self.channels.add(channel)
+                hub.subscribe(channel, self.on_message)
+        else:
+            for channel in channels:
+                if channel in self.channels:
+                    self.channels.discard(channel)
+                    hub.unsubscribe(channel, self.on_message)
+        return {"type": "subscriptions", "channels": sorted(self.channels)}
+
+    def close(self) -> None:
+        for channel in self.channels:
+            hub.unsubscribe(channel, self.on_message)
+        self.channels.clear()
+
+
+@router.websocket("/ws/stream")
+async def stream_ws(websocket: WebSocket):
+    """Stream updates for many swaps and wallets over one connection.
+
+    Clients send ``{"action": "subscribe", "swaps": [...], "wallets": [...]}``
+    (or ``"unsubscribe"``) at any time and receive ``{"type": "updates",
+    "updates": [...]}`` frames. Updates are batched over
+    ``STREAM_BATCH_SECONDS``, keeping only the latest one per swap.
+    """
+    await websocket.accept()
+    client = _StreamClient(websocket)
+    sender = asyncio.create_task(client.send_batches())
+    connections = WEBSOCKET_CONNECTIONS.labels(endpoint="/ws/stream")
+    connections.inc()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                reply = client.handle(json.loads(message))
+            except ValueError as exc:
+                reply = {"type": "error", "message": str(exc)}
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connections.dec()
+        sender.cancel()
+        client.close()
@@ -0,0 +1,304 @@
+"""
+Leader election and work distribution for the shared APScheduler.
+
+Every replica opens the same MongoDB-backed job store, but the scheduler
+starts paused and only the elected leader resumes it, so triggers fire once
+across the fleet. Fired jobs are not executed by the leader: ``dispatch``
+pushes them onto a Redis list and worker threads in every process pop and
+run them.
+
+Leadership is held through a Redis lease that fails closed, so two replicas
+never lead at once while Redis answers. While Redis is unreachable a replica
+falls back to leading on its own and ``dispatch`` runs jobs inline, so a
+single-node deployment keeps firing jobs; once Redis is back it takes the
+real lease or steps down. Multi-replica deployments that prefer no jobs to
+duplicate jobs during an outage set ``SCHEDULER_LOCAL_FALLBACK=false``.
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List
+
+from apscheduler.job import Job
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp, obj_to_ref, ref_to_obj
+from bson.binary import Binary
+from pymongo.errors import BulkWriteError
+
+from app.db.db import redis_available, redis_client, scheduler
+from app.medusa_core.locks import RedisLease, run_once
+from app.schedulers.dispatch import DISPATCH_POLL_SECONDS, dispatcher
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK = "scheduler:leader"
+QUEUE_KEY = "scheduler:queue"
+
+LEADER_LEASE_MS = int(os.getenv("SCHEDULER_LEADER_LEASE_MS", "15000"))
+ELECTION_INTERVAL = LEADER_LEASE_MS / 3000
+WORKER_COUNT = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Seconds a worker blocks on the queue before re-checking for shutdown
+WORKER_POLL_SECONDS = 5
+# Lead without the lease while Redis is unreachable (see module docstring)
+LOCAL_FALLBACK = os.getenv("SCHEDULER_LOCAL_FALLBACK", "true").lower() in {"1", "true", "yes"}
+BULK_CHUNK = 1000
+
+
+def _execute(func_ref: str, args: List[Any], once: List[Any] | None = None) -> None:
+    try:
+        func = ref_to_obj(func_ref)
+        if once:
+            run_once(once[0], int(once[1]), func, *args)
+        else:
+            func(*args)
+    except Exception:
+        logger.exception("Scheduled job %s failed", func_ref)
+
+
+def dispatch(func_ref: str, args: List[Any], once: List[Any] | None = None) -> None:
+    """APScheduler entry point: hand the fired job to the worker queue."""
+    if redis_available():
+        try:
+            redis_client.rpush(QUEUE_KEY, json.dumps({"func": func_ref, "args": args, "once": once}))
+            return
+        except Exception as exc:
+            logger.error("Failed to enqueue %s, running inline: %s", func_ref, exc)
+    _execute(func_ref, args, once)
+
+
+def _job_kwargs(func: Callable[..., Any], args: Iterable[Any], once_ms: int | None, job_id: str) -> Dict[str, Any]:
+    once = [job_id, once_ms] if once_ms else None
+    return {"func": dispatch, "args": [obj_to_ref(func), list(args), once]}
+
+
+def add_distributed_job(
+    func: Callable[..., Any],
+    trigger: str,
+    job_id: str,
+    args: Iterable[Any] = (),
+    *,
+    once_ms: int | None = None,
+    **trigger_args: Any,
+) -> Job | None:
+    """Add (or replace) a job in the shared store.
+
+    ``func`` must be an importable module-level callable and ``args`` must be
+    JSON serialisable, since both travel through the job store and the work
+    queue. ``once_ms`` additionally guards each run with :func:`run_once`.
+    """
+    return scheduler.add_job(
+        id=job_id,
+        trigger=trigger,
+        replace_existing=True,
+        **_job_kwargs(func, args, once_ms, job_id),
+        **trigger_args,
+    )
+
+
+def _default_store():
+    return scheduler._lookup_jobstore("default")
+
+
+def scheduled_job_ids(prefix: str = "") -> set[str]:
+    """Return the ids of jobs in the shared store, without unpickling them."""
+    store = _default_store()
+    if not hasattr(store, "collection"):
+        return {job.id for job in scheduler.get_jobs()}
+    query = {"_id": {"$regex": f"^{prefix}"}} if prefix else {}
+    return {doc["_id"] for doc in store.collection.find(query, {"_id": 1})}
+
+
+def job_count() -> int:
+    store = _default_store()
+    if hasattr(store, "collection"):
+        return store.collection.estimated_document_count()
+    return len(scheduler.get_jobs())
+
+
+def bulk_add_cron_jobs(
+    specs: Iterable[Dict[str, Any]], func: Callable[..., Any], *, once_ms: int | None = None
+) -> Dict[str, datetime | None]:
+    """Insert many cron jobs into the shared store with batched writes.
+
+    Each spec needs ``id``, ``args`` and ``cron`` (kwargs for ``CronTrigger``).
+    Jobs that already exist are left untouched. Returns next run times by id.
+    """
+    store = _default_store()
+    next_runs: Dict[str, datetime | None] = {}
+    if not hasattr(store, "collection"):
+        for spec in specs:
+            job = add_distributed_job(func, "cron", spec["id"], spec["args"], once_ms=once_ms, **spec["cron"])
+            next_runs[spec["id"]] = job.next_run_time if job else None
+        return next_runs
+
+    now = datetime.now(scheduler.timezone)
+    defaults = scheduler._job_defaults
+    batch: List[Dict[str, Any]] = []
+    # Most users share a handful of schedules; build each trigger only once
+    triggers: Dict[tuple, tuple] = {}
+
+    def flush():
+        if not batch:
+            return
+        try:
+            store.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            # Duplicate ids mean the job is already scheduled
+            if any(err.get("code") != 11000 for err in exc.details.get("writeErrors", [])):
+                logger.error("Bulk job insert failed: %s", exc.details)
+        batch.clear()
+
+    for spec in specs:
+        try:
+            cron_key = tuple(sorted(spec["cron"].items()))
+            if cron_key not in triggers:
+                trigger = CronTrigger(timezone=scheduler.timezone, **spec["cron"])
+                triggers[cron_key] = (trigger, trigger.get_next_fire_time(None, now))
+            trigger, next_run_time = triggers[cron_key]
+            job = Job(
+                scheduler,
+                id=spec["id"],
+                name=spec["id"],
+                trigger=trigger,
+                executor="default",
+                kwargs={},
+                next_run_time=next_run_time,
+                **defaults,
+                **_job_kwargs(func, spec["args"], once_ms, spec["id"]),
+            )
+        except Exception as exc:
+            logger.error("Invalid cron job %s: %s", spec.get("id"), exc)
+            continue
+        next_runs[job.id] = job.next_run_time
+        batch.append({
+            "_id": job.id,
+            "next_run_time": datetime_to_utc_timestamp(job.next_run_time),
+            "job_state": Binary(pickle.dumps(job.__getstate__(), store.pickle_protocol)),
+        })
+        if len(batch) >= BULK_CHUNK:
+            flush()
+    flush()
+    scheduler.wakeup()
+    return next_runs
+
+
+class SchedulerCluster:
+    """Runs leader election and queue workers for this process."""
+
+    def __init__(self):
+        self.is_leader = False
+        # Leading without the lease because Redis is unreachable
+        self.local_leader = False
+        self._lease = RedisLease(LEADER_LOCK, LEADER_LEASE_MS, fail_open=False)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        self._spawn(self._election_loop, "scheduler-election")
+        self._spawn(self._dispatch_loop, "scheduler-dispatch")
+        for i in range(WORKER_COUNT):
+            self._spawn(self._worker_loop, f"scheduler-worker-{i}")
+
+    def _spawn(self, target: Callable[[], None], name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop election and workers, handing leadership over immediately."""
+        self._stop.set()
+        self.is_leader = False
+        self.local_leader = False
+        self._lease.release()
+        self._threads = []
+
+    def _become_leader(self, local: bool = False) -> None:
+        try:
+            scheduler.resume()
+        except Exception as exc:
+            logger.error("Failed to resume scheduler: %s", exc)
+            self._lease.release()
+            return
+        self.is_leader = True
+        self.local_leader = local
+        if local:
+            logger.warning("Redis unreachable, leading the scheduler locally")
+        else:
+            logger.info("Scheduler leadership acquired")
+
+    def _step_down(self) -> None:
+        self.is_leader = False
+        self.local_leader = False
+        logger.warning("Scheduler leadership lost")
+        try:
+            scheduler.pause()
+        except Exception as exc:
+            logger.error("Failed to pause scheduler: %s", exc)
+
+    def _election_loop(self) -> None:
+        while not self._stop.is_set():
+            if self.local_leader:
+                # Redis is back: take the real lease, or leave it to whoever got it
+                if redis_available():
+                    if self._lease.try_acquire():
+                        self.local_leader = False
+                        logger.info("Scheduler leadership moved to the Redis lease")
+                    else:
+                        self._step_down()
+            elif self.is_leader:
+                if self._lease.renew():
+                    # Pick up jobs other replicas added to the shared store
+                    scheduler.wakeup()
+                else:
+                    self._step_down()
+            elif self._lease.try_acquire():
+                self._become_leader()
+            elif LOCAL_FALLBACK and not redis_available():
+                self._become_leader(local=True)
+            self._stop.wait(ELECTION_INTERVAL)
+
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            if self.is_leader:
+                try:
+                    dispatcher.dispatch_due()
+                except Exception:
+                    logger.exception("Dispatch round failed")
+            self._stop.wait(DISPATCH_POLL_SECONDS)
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            # Jobs run inline in dispatch() while Redis is down
+            if not redis_available():
+                self._stop.wait(WORKER_POLL_SECONDS)
+                continue
+            try:
+                item = redis_client.blpop(QUEUE_KEY, timeout=WORKER_POLL_SECONDS)
+            except Exception as exc:
+                logger.error("Scheduler queue read failed: %s", exc)
+                self._stop.wait(1)
+                continue
+            if not item:
+                continue
+            try:
+                payload = json.loads(item[1])
+            except ValueError:
+                logger.error("Dropping malformed scheduler payload: %r", item[1])
+                continue
+            _execute(payload["func"], payload.get("args") or [], payload.get("once"))
+
+    def queue_depth(self) -> int:
+        try:
+            return int(redis_client.llen(QUEUE_KEY))
+        except Exception:
+            return 0
+
+
+cluster = SchedulerCluster()
@@ -0,0 +1,220 @@
+"""
+Jittered, rate-shaped dispatch for cron-triggered jobs.
+
+Users overwhelmingly pick round schedules ("every hour"), so their cron
+triggers fire in the same second. Instead of calling the job callback
+directly, a trigger calls :func:`submit`, which parks the job in a pending
+set until ``now + jitter(job_id)``. The jitter is derived from the job id, so
+each job keeps a stable offset inside ``JITTER_WINDOW_SECONDS`` from run to
+run. A dispatcher thread on the scheduler leader then releases due jobs
+through a token bucket sized to the upstream Relay/RPC budget.
+"""
+
+import hashlib
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from apscheduler.util import ref_to_obj
+
+from app.db.db import redis_available, redis_client
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "dispatch:pending"
+
+JITTER_WINDOW_SECONDS = float(os.getenv("DISPATCH_JITTER_WINDOW_SECONDS", "60"))
+# Jobs released per second, and the burst allowed after an idle period.
+# Each DCA job costs at most a few Relay quotes, so keep this within the
+# Relay and RPC rate limits.
+DISPATCH_RATE_PER_SEC = float(os.getenv("DISPATCH_RATE_PER_SEC", "20"))
+DISPATCH_BURST = int(os.getenv("DISPATCH_BURST", "40"))
+DISPATCH_POLL_SECONDS = 0.2
+DISPATCH_BATCH = 200
+LAG_SAMPLES = 1000
+
+
+def jitter_offset(job_id: str, window: float = JITTER_WINDOW_SECONDS) -> float:
+    """Deterministic offset in ``[0, window)`` seconds for ``job_id``."""
+    if window <= 0:
+        return 0.0
+    digest = hashlib.sha1(job_id.encode()).digest()
+    return (int.from_bytes(digest[:8], "big") % int(window * 1000)) / 1000
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` tokens/s."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def refund(self, tokens: float = 1) -> None:
+        """Return tokens taken for work that did not happen."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+def _member(func_ref: str, job_id: str) -> str:
+    return f"{func_ref}#{job_id}"
+
+
+class Dispatcher:
+    """Holds pending jobs and releases them when due and within the rate budget."""
+
+    def __init__(
+        self,
+        rate: float = DISPATCH_RATE_PER_SEC,
+        burst: int = DISPATCH_BURST,
+        window: float = JITTER_WINDOW_SECONDS,
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.window = window
+        # Fallback pending heap of (due, member) when Redis is not available
+        self._local: List[Tuple[float, str]] = []
+        self._local_lock = threading.Lock()
+        self._lags: deque = deque(maxlen=LAG_SAMPLES)
+        self.dispatched = 0
+        self.last_dispatch: float | None = None
+
+    def submit(self, func_ref: str, job_id: str) -> float:
+        """Park ``job_id`` until its jittered due time. Returns the due timestamp."""
+        due = time.time() + jitter_offset(job_id, self.window)
+        member = _member(func_ref, job_id)
+        if redis_available():
+            try:
+                redis_client.zadd(PENDING_KEY, {member: due})
+                return due
+            except Exception as exc:
+                logger.error("Failed to park job %s, keeping it locally: %s", job_id, exc)
+        with self._local_lock:
+            heapq.heappush(self._local, (due, member))
+        return due
+
+    def _due(self, now: float) -> List[Tuple[str, float]]:
+        items: List[Tuple[str, float]] = []
+        if redis_available():
+            try:
+                for member, score in redis_client.zrangebyscore(
+                    PENDING_KEY, "-inf", now, start=0, num=DISPATCH_BATCH, withscores=True
+                ):
+                    items.append((member.decode() if isinstance(member, bytes) else member, score))
+            except Exception as exc:
+                logger.error("Failed to read pending dispatch set: %s", exc)
+        with self._local_lock:
+            items.extend((m, d) for d, m in self._local if d <= now)
+        return items
+
+    def _claim(self, member: str) -> bool:
+        with self._local_lock:
+            for i, (_, m) in enumerate(self._local):
+                if m == member:
+                    self._local.pop(i)
+                    heapq.heapify(self._local)
+                    return True
+        if not redis_available():
+            return False
+        try:
+            return bool(redis_client.zrem(PENDING_KEY, member))
+        except Exception as exc:
+            logger.error("Failed to claim %s: %s", member, exc)
+        return False
+
+    def dispatch_due(self) -> int:
+        """Release due jobs while tokens last. Returns the number dispatched.
+
+        Callbacks run on the dispatcher thread, so they should only hand the
+        job off (e.g. ``dca_engine.enqueue_due_job``) rather than do the work.
+        """
+        now = time.time()
+        count = 0
+        for member, due in self._due(now):
+            if not self.bucket.try_take():
+                break
+            if not self._claim(member):
+                # Another replica dispatched it; the upstream call was not ours to pay for
+                self.bucket.refund()
+                continue
+            func_ref, _, job_id = member.rpartition("#")
+            try:
+                ref_to_obj(func_ref)(job_id)
+            except Exception:
+                logger.exception("Dispatched job %s failed", member)
+            self._lags.append(max(time.time() - due, 0.0))
+            count += 1
+        if count:
+            self.dispatched += count
+            self.last_dispatch = time.time()
+        return count
+
+    def queue_depth(self) -> Dict[str, int]:
+        now = time.time()
+        depth = {"pending": 0, "due": 0}
+        if redis_available():
+            try:
+                pipe = redis_client.pipeline()
+                pipe.zcard(PENDING_KEY)
+                pipe.zcount(PENDING_KEY, "-inf", now)
+                depth["pending"], depth["due"] = (int(v) for v in pipe.execute())
+            except Exception as exc:
+                logger.error("Failed to read dispatch queue depth: %s", exc)
+        with self._local_lock:
+            depth["pending"] += len(self._local)
+            depth["due"] += sum(1 for d, _ in self._local if d <= now)
+        return depth
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+
+        def pct(p: float) -> float:
+            return lags[min(int(len(lags) * p), len(lags) - 1)] if lags else 0.0
+
+        return {
+            **self.queue_depth(),
+            "dispatched": self.dispatched,
+            "last_dispatch": self.last_dispatch,
+            "tokens_available": round(self.bucket.available, 2),
+            "rate_per_sec": self.bucket.rate,
+            "jitter_window_seconds": self.window,
+            "lag_seconds": {
+                "avg": sum(lags) / len(lags) if lags else 0.0,
+                "p50": pct(0.5),
+                "p99": pct(0.99),
+                "max": lags[-1] if lags else 0.0,
+            },
+        }
+
+
+dispatcher = Dispatcher()
+
+
+def submit(func_ref: str, job_id: str) -> None:
+    """Cron entry point: defer ``func_ref(job_id)`` by the job's jitter."""
+    dispatcher.submit(func_ref, job_id)
@@ -1,24 +1,48 @@
 import logging
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, List
 
-from app.db.db import db, scheduler
+from apscheduler.util import obj_to_ref
+from pymongo import UpdateOne
+
+from app.db.db import db, mongo_available, scheduler
+from app.schedulers.cluster import add_distributed_job, bulk_add_cron_jobs, scheduled_job_ids
+from app.schedulers.dispatch import submit
 
 logger = logging.getLogger(__name__)
 
+# Cron triggers have minute granularity; hold the run lease a bit less than that
+CRON_RUN_HOLD_MS = 50_000
+CRON_KEYS = ["minute", "hour", "day", "month", "day_of_week"]
+BULK_CHUNK = 1000
+
+
+def _aps_id(job_id: Any) -> str:
+    return f"dca_{job_id}"
+
+
+def _cron_kwargs(cron: str) -> Dict[str, str]:
+    return {k: v for k, v in zip(CRON_KEYS, (cron or "").split())}
+
 
 def register_cron_job(job_doc: Dict[str, Any], callback: Callable[[str], None]) -> str | None:
-    """Add a cron job to APS and store the APS id back to MongoDB."""
-    if scheduler is None or db is None:
+    """Add a cron job to APS and store the APS id back to MongoDB.
+
+    ``callback`` must be an importable module-level function; it is stored by
+    reference in the shared job store. When the trigger fires, the job is
+    handed to the jittered dispatcher (see app.schedulers.dispatch), which
+    calls ``callback(job_id)`` after the job's fixed offset.
+    """
+    if not mongo_available():
         return None
     try:
-        cron_parts = job_doc.get("cron", "").split()
-        cron_keys = ["minute", "hour", "day", "month", "day_of_week"]
-        cron_kwargs = {k: v for k, v in zip(cron_keys, cron_parts)}
-        aps_job = scheduler.add_job(
-            callback,
-            trigger="cron",
-            args=[str(job_doc["_id"])],
-            **cron_kwargs,
+        job_id = str(job_doc["_id"])
+        aps_job = add_distributed_job(
+            submit,
+            "cron",
+            _aps_id(job_id),
+            [obj_to_ref(callback), job_id],
+            once_ms=CRON_RUN_HOLD_MS,
+            **_cron_kwargs(job_doc.get("cron", "")),
         )
         db.dca_jobs.update_one(
             {"_id": job_doc["_id"]},
@@ -31,16 +55,44 @@ def register_cron_job(job_doc: Dict[str, Any], callback: Callable[[str], None])
 
 
 def rehydrate_on_startup(callback: Callable[[str], None]):
-    """Re-add all active jobs from MongoDB to APS scheduler on startup."""
-    if scheduler is None or db is None:
+    """Schedule active jobs from MongoDB that are missing from the job store.
+
+    Jobs persist in the shared store across restarts, so normally nothing
+    needs adding. Missing jobs are inserted and written back in batches.
+    """
+    if not mongo_available():
+        return
+    existing = scheduled_job_ids(prefix="dca_")
+    callback_ref = obj_to_ref(callback)
+    specs: List[Dict[str, Any]] = []
+    for job_doc in db.dca_jobs.find({"status": "active"}, {"cron": 1}):
+        aps_id = _aps_id(job_doc["_id"])
+        if aps_id in existing:
+            continue
+        specs.append({
+            "id": aps_id,
+            "args": [callback_ref, str(job_doc["_id"])],
+            "cron": _cron_kwargs(job_doc.get("cron", "")),
+            "_id": job_doc["_id"],
+        })
+    if not specs:
         return
-    for job_doc in db.dca_jobs.find({"status": "active"}):
-        register_cron_job(job_doc, callback)
+
+    next_runs = bulk_add_cron_jobs(specs, submit, once_ms=CRON_RUN_HOLD_MS)
+    ops = [
+        UpdateOne(
+            {"_id": spec["_id"]},
+            {"$set": {"aps_id": spec["id"], "next_run": next_runs[spec["id"]], "status": "active"}},
+        )
+        for spec in specs
+        if spec["id"] in next_runs
+    ]
+    for i in range(0, len(ops), BULK_CHUNK):
+        db.dca_jobs.bulk_write(ops[i:i + BULK_CHUNK], ordered=False)
+    logger.info("Rehydrated %d DCA jobs", len(ops))
 
 
 def pause_job(job_id: str) -> bool:
-    if scheduler is None:
-        return False
     try:
         scheduler.pause_job(job_id)
         return True
@@ -50,8 +102,6 @@ def pause_job(job_id: str) -> bool:
 
 
 def resume_job(job_id: str) -> bool:
-    if scheduler is None:
-        return False
     try:
         scheduler.resume_job(job_id)
         return True
@@ -61,12 +111,9 @@ def resume_job(job_id: str) -> bool:
 
 
 def remove_job(job_id: str) -> bool:
-    if scheduler is None:
-        return False
     try:
         scheduler.remove_job(job_id)
         return True
     except Exception as exc:
         logger.error("Remove job failed: %s", exc)
     return False
-
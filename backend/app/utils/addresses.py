@@ -0,0 +1,40 @@
+"""Address format checks shared by the swap and quote endpoints."""
+
+import re
+
+from app.medusa_core.token_map import CHAIN_IDS
+
+
+def _is_evm_address(address: str) -> bool:
+    """Return True if the address looks like an EVM address."""
+    return bool(re.fullmatch(r"0x[a-fA-F0-9]{40}", address or ""))
+
+
+def _is_solana_address(address: str) -> bool:
+    """Return True if the address looks like a Solana address."""
+    if not isinstance(address, str) or address.startswith("0x"):
+        return False
+    try:
+        import base58
+        decoded = base58.b58decode(address)
+    except Exception:
+        return False
+    return len(decoded) == 32
+
+
+def is_address(address: str) -> bool:
+    """Basic non-empty address check."""
+    return isinstance(address, str) and len(address) > 0
+
+
+def is_wallet_address(address: str) -> bool:
+    """Return True if the address is an EVM or a Solana address."""
+    return _is_evm_address(address) or _is_solana_address(address)
+
+
+def is_address_for_chain(address: str, chain_id: int) -> bool:
+    """Validate the address format for the given chain."""
+    chain_name = CHAIN_IDS.get(chain_id, "").lower()
+    if chain_name == "solana":
+        return _is_solana_address(address)
+    return _is_evm_address(address)
@@ -47,3 +47,17 @@ async def handle_agent_error(agent_name: str, error: Exception) -> None:
 
     if should_retry(error):
         await retry_operation(agent_name, error)
+
+
+def handle_agent_error_sync(agent_name: str, error: Exception) -> None:
+    """:func:`handle_agent_error` for scheduler threads and other sync code.
+
+    Avoids ``asyncio.run`` (a new event loop per error) when no loop is running.
+    """
+    logging.getLogger(agent_name).error("%s", error)
+
+    if is_critical_error(error):
+        ALERTS.append(f"Critical error in {agent_name}: {error}")
+
+    if should_retry(error):
+        RETRY_COUNTS[agent_name] = RETRY_COUNTS.get(agent_name, 0) + 1
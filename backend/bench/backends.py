@@ -0,0 +1,109 @@
+"""
+Database backends for bench scenarios.
+
+Scenarios that run the app in-process (swap tracking, DCA ticks) use a local
+mongod and Redis when ``--mongo-url`` / ``--redis-url`` are given, and
+otherwise swap in mongomock and fakeredis. :func:`configure` must run before
+anything under ``app`` is imported, because ``app.db.db`` creates its clients
+at import time.
+
+Scenarios that talk to the app over HTTP run it in a separate process, which
+cannot share an in-memory backend; they need the real services.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def mongo_reachable(url: str, timeout_ms: int = 1000) -> bool:
+    from pymongo import MongoClient
+
+    client = MongoClient(url, serverSelectionTimeoutMS=timeout_ms)
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception:
+        return False
+    finally:
+        client.close()
+
+
+def redis_reachable(url: str, timeout: float = 1.0) -> bool:
+    import redis
+
+    try:
+        return bool(redis.Redis.from_url(url, socket_connect_timeout=timeout).ping())
+    except Exception:
+        return False
+
+
+def _bulk_write_compat(collection_cls) -> None:
+    """Apply pymongo 4.x ``UpdateOne``/``InsertOne`` ops one by one.
+
+    mongomock's ``bulk_write`` rejects the ``sort`` argument newer pymongo
+    passes to its operation objects.
+    """
+    from pymongo import InsertOne, UpdateOne
+    from pymongo.results import BulkWriteResult
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        matched = modified = inserted = upserted = 0
+        for op in requests:
+            if isinstance(op, UpdateOne):
+                result = self.update_one(op._filter, op._doc, upsert=bool(op._upsert))
+                matched += result.matched_count
+                modified += result.modified_count
+                upserted += int(result.upserted_id is not None)
+            elif isinstance(op, InsertOne):
+                self.insert_one(op._doc)
+                inserted += 1
+            else:
+                raise NotImplementedError(f"bench bulk_write does not handle {type(op).__name__}")
+        return BulkWriteResult(
+            {
+                "nInserted": inserted,
+                "nMatched": matched,
+                "nModified": modified,
+                "nUpserted": upserted,
+                "upserted": [],
+            },
+            acknowledged=True,
+        )
+
+    collection_cls.bulk_write = bulk_write
+
+
+def configure(mongo_url: Optional[str] = None, redis_url: Optional[str] = None) -> Dict[str, str]:
+    """Select backends for in-process scenarios and describe the choice."""
+    import pymongo
+    import redis
+
+    chosen: Dict[str, str] = {}
+    if mongo_url:
+        os.environ["MONGO_URL"] = mongo_url
+        chosen["mongo"] = mongo_url
+    else:
+        import mongomock
+
+        _bulk_write_compat(mongomock.collection.Collection)
+        pymongo.MongoClient = mongomock.MongoClient
+        chosen["mongo"] = f"mongomock {mongomock.__version__}"
+
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+        chosen["redis"] = redis_url
+    else:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+
+        def from_url(url, **kwargs):
+            kwargs.pop("socket_connect_timeout", None)
+            return fakeredis.FakeRedis(server=server, **kwargs)
+
+        redis.Redis.from_url = staticmethod(from_url)
+        chosen["redis"] = f"fakeredis {fakeredis.__version__}"
+    return chosen
@@ -0,0 +1,121 @@
+"""
+Concurrency load test for the async request path.
+
+Starts the mock Relay API from :mod:`bench.mock_servers`, answering after
+``--latency`` seconds, serves the app with uvicorn pointed at it, and fires
+``--concurrency`` simultaneous requests at ``/chains`` and ``/quote``. Sync handlers would be capped by
+Starlette's threadpool (40 threads by default), so a burst of N requests
+would take at least ``ceil(N / 40) * latency``; async handlers should finish
+the burst in roughly one upstream latency.
+
+The mock upstream and the app each run in their own process so the client
+does not compete with them for the event loop.
+
+Usage (from ``backend``)::
+
+    python -m bench.load_test --concurrency 200 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import statistics
+import time
+from typing import List
+
+from aiohttp import ClientError, ClientSession, TCPConnector
+
+from bench.mock_servers import serve as serve_mocks
+from bench.report import percentile
+from bench.run import serve_app
+
+THREADPOOL_SIZE = 40
+USER = "0x" + "1" * 40
+
+
+async def _wait_ready(session: ClientSession, url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as resp:
+                await resp.read()
+                return
+        except ClientError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def _burst(session: ClientSession, url: str, n: int) -> List[float]:
+    async def one() -> float:
+        start = time.perf_counter()
+        async with session.get(url) as resp:
+            await resp.read()
+            resp.raise_for_status()
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def run(args: argparse.Namespace) -> None:
+    base = f"http://127.0.0.1:{args.port}"
+    targets = {
+        "/chains": f"{base}/chains",
+        "/quote": (
+            f"{base}/quote?source_chain=1&destination_chain=1&token_in=USDC"
+            f"&token_out=ETH&amount=1000000&user_address={USER}"
+        ),
+    }
+    floor = math.ceil(args.concurrency / THREADPOOL_SIZE) * args.latency
+    print(
+        f"concurrency={args.concurrency} upstream latency={args.latency:.3f}s "
+        f"threadpool-bound floor={floor:.3f}s"
+    )
+    async with ClientSession(connector=TCPConnector(limit=0)) as session:
+        await _wait_ready(session, f"{base}/")
+        # Warm the token map and connection pools before measuring
+        for url in targets.values():
+            await _burst(session, url, 1)
+        for name, url in targets.items():
+            start = time.perf_counter()
+            samples = await _burst(session, url, args.concurrency)
+            wall = time.perf_counter() - start
+            print(
+                f"{name:8s} wall={wall:.3f}s rps={args.concurrency / wall:.0f} "
+                f"p50={percentile(samples, 0.5):.3f}s p99={percentile(samples, 0.99):.3f}s "
+                f"mean={statistics.mean(samples):.3f}s "
+                f"vs floor={floor / wall:.1f}x"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--relay-port", type=int, default=8766)
+    args = parser.parse_args()
+
+    env = {
+        "RELAY_BASE_URL": f"http://127.0.0.1:{args.relay_port}",
+        # Let the upstream pool hold the whole burst so only the handlers are measured
+        "HTTP_POOL_LIMIT": str(args.concurrency),
+        "HTTP_POOL_LIMIT_PER_HOST": str(args.concurrency),
+    }
+    procs = [
+        multiprocessing.Process(target=serve_mocks, args=(args.relay_port, args.latency), daemon=True),
+        multiprocessing.Process(target=serve_app, args=(args.port, env), daemon=True),
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        asyncio.run(run(args))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.join(5)
+
+
+if __name__ == "__main__":
+    main()
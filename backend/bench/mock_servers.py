@@ -0,0 +1,254 @@
+"""
+Local stand-ins for Relay, Alchemy and chain JSON-RPC.
+
+One aiohttp app serves every upstream the backend talks to, replaying the
+recorded payloads in ``bench/fixtures``:
+
+* ``GET /chains``, ``POST /quote``, ``GET /intents/status``, ``GET /health``
+  (Relay). ``httpRpcUrl`` in ``/chains`` points back at this server.
+* ``POST /alchemy/{chain_id}/{api_key}``: ``alchemy_getTokenBalances``. Point
+  the app at it with ``ALCHEMY_BASE_URL=http://host:port/alchemy``.
+* ``POST /prices/{api_key}/tokens/by-address``: Alchemy Prices API, with the
+  stub prices of :mod:`app.medusa_core.prices`. Point the app at it with
+  ``PRICES_BASE_URL=http://host:port/prices``.
+* ``POST /rpc/{chain_id}``: ``eth_blockNumber`` (advancing at the chain's
+  block time), ``eth_getTransactionReceipt``, ``eth_getBalance``, ``eth_call``.
+  Batched requests are supported.
+* ``GET /__stats``: request counts per route, for checking call amplification.
+
+Every upstream route sleeps ``latency`` seconds, plus or minus up to
+``jitter``, and fails with a 500 or 429 at ``error_rate``.
+
+Run standalone (from ``backend``)::
+
+    python -m bench.mock_servers --port 8766 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from app.medusa_core.prices import stub_price
+
+logger = logging.getLogger(__name__)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+STATUS_ROUTE = "/__stats"
+ERROR_STATUSES = (500, 429)
+# Block times used to advance ``eth_blockNumber``; others use DEFAULT_BLOCK_TIME
+BLOCK_TIMES = {1: 12.0, 8453: 2.0, 42161: 0.25}
+DEFAULT_BLOCK_TIME = 2.0
+
+
+def load_fixture(name: str) -> Any:
+    with open(FIXTURES / f"{name}.json") as handle:
+        return json.load(handle)
+
+
+def _substitute(value: Any, replacements: Dict[str, str]) -> Any:
+    """Replace ``{placeholder}`` strings anywhere in a fixture."""
+    if isinstance(value, str):
+        for key, repl in replacements.items():
+            value = value.replace("{" + key + "}", repl)
+        return value
+    if isinstance(value, list):
+        return [_substitute(v, replacements) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, replacements) for k, v in value.items()}
+    return value
+
+
+class MockUpstream:
+    """Serve recorded upstream payloads with injected latency and errors."""
+
+    def __init__(
+        self,
+        base_url: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.started = time.time()
+        self.chains = _substitute(load_fixture("relay_chains"), {"rpc": self.base_url})
+        self.quote = load_fixture("relay_quote")
+        # Currencies Relay would quote, per chain; anything else gets a 400
+        self.currencies = {
+            chain["id"]: {token["address"].lower() for token in chain.get("featuredTokens", [])}
+            for chain in self.chains["chains"]
+        }
+        self.statuses: List[Dict[str, Any]] = load_fixture("relay_status")
+        self.balances = load_fixture("alchemy_token_balances")
+        self.rpc = load_fixture("rpc_responses")
+        self.block_base = int(self.rpc["eth_blockNumber"], 16)
+        # Status polls seen per request id; each poll advances one stage
+        self.status_polls: Counter = Counter()
+
+    # -- fault injection -------------------------------------------------
+
+    @web.middleware
+    async def faults(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path == STATUS_ROUTE:
+            return await handler(request)
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else "unmatched"
+        self.requests[name] += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors[name] += 1
+            status = self.random.choice(ERROR_STATUSES)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return web.json_response({"message": "injected failure"}, status=status, headers=headers)
+        return await handler(request)
+
+    # -- Relay -----------------------------------------------------------
+
+    async def chains_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self.chains)
+
+    async def quote_handler(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"message": "invalid body"}, status=400)
+        for side in ("origin", "destination"):
+            chain_id = body.get(f"{side}ChainId")
+            currency = str(body.get(f"{side}Currency", "")).lower()
+            if chain_id is not None and currency not in self.currencies.get(chain_id, ()):
+                return web.json_response(
+                    {"message": f"Unsupported {side} currency", "errorCode": "UNSUPPORTED_CURRENCY"},
+                    status=400,
+                )
+        quote = _substitute(copy.deepcopy(self.quote), {"user": str(body.get("user", ""))})
+        amount = str(body.get("amount") or body.get("inputAmount") or "")
+        if amount.isdigit():
+            details = quote["details"]
+            details["currencyIn"]["amount"] = amount
+            # Keep the recorded rate: 1 USDC -> 0.000295 ETH
+            details["currencyOut"]["amount"] = str(int(amount) * 295_000_000)
+        return web.json_response(quote)
+
+    async def status_handler(self, request: web.Request) -> web.Response:
+        request_id = request.query.get("requestId", "")
+        stage = min(self.status_polls[request_id], len(self.statuses) - 1)
+        self.status_polls[request_id] += 1
+        return web.json_response(self.statuses[stage])
+
+    async def health_handler(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    # -- Alchemy / JSON-RPC ----------------------------------------------
+
+    def _block_number(self, chain_id: int) -> int:
+        elapsed = time.time() - self.started
+        return self.block_base + int(elapsed / BLOCK_TIMES.get(chain_id, DEFAULT_BLOCK_TIME))
+
+    def _rpc_result(self, chain_id: int, call: Dict[str, Any]) -> Dict[str, Any]:
+        method = call.get("method")
+        params = call.get("params") or []
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": call.get("id")}
+        if method == "alchemy_getTokenBalances":
+            result = copy.deepcopy(self.balances["result"])
+            result["address"] = params[0] if params else ""
+        elif method == "eth_blockNumber":
+            result = hex(self._block_number(chain_id))
+        elif method == "eth_getTransactionReceipt":
+            result = dict(self.rpc["eth_getTransactionReceipt"])
+            if params:
+                result["transactionHash"] = params[0]
+        elif method in self.rpc:
+            result = self.rpc[method]
+        else:
+            response["error"] = {"code": -32601, "message": f"method {method} not found"}
+            return response
+        response["result"] = result
+        return response
+
+    async def rpc_handler(self, request: web.Request) -> web.Response:
+        chain_id = int(request.match_info["chain_id"])
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response(
+                {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "parse error"}}
+            )
+        if isinstance(body, list):
+            return web.json_response([self._rpc_result(chain_id, call) for call in body])
+        return web.json_response(self._rpc_result(chain_id, body))
+
+    async def prices_handler(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"message": "invalid body"}, status=400)
+        data = [
+            {
+                "network": entry.get("network"),
+                "address": entry.get("address"),
+                "prices": [{"currency": "usd", "value": f"{stub_price(str(entry.get('address', '')).lower()):.6f}"}],
+                "error": None,
+            }
+            for entry in body.get("addresses") or []
+        ]
+        return web.json_response({"data": data})
+
+    async def stats_handler(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": dict(self.requests), "errors": dict(self.errors)})
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.faults])
+        app.router.add_get("/chains", self.chains_handler)
+        app.router.add_post("/quote", self.quote_handler)
+        app.router.add_get("/intents/status", self.status_handler)
+        app.router.add_get("/health", self.health_handler)
+        app.router.add_post("/alchemy/{chain_id}/{api_key}", self.rpc_handler)
+        app.router.add_post("/rpc/{chain_id}", self.rpc_handler)
+        app.router.add_post("/prices/{api_key}/tokens/by-address", self.prices_handler)
+        app.router.add_get(STATUS_ROUTE, self.stats_handler)
+        return app
+
+
+def serve(
+    port: int,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+    host: str = "127.0.0.1",
+) -> None:
+    """Run the mock upstreams until the process is stopped."""
+    upstream = MockUpstream(f"http://{host}:{port}", latency, jitter, error_rate, seed)
+    web.run_app(upstream.build_app(), host=host, port=port, backlog=4096, print=None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.jitter, args.error_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
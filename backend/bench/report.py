@@ -0,0 +1,141 @@
+"""
+Latency recording and reporting for bench scenarios.
+
+Each scenario fills a :class:`LatencyRecorder`; :func:`format_report` prints
+throughput and percentiles, and :func:`compare` diffs a run against a JSON
+report saved by an earlier run (``--json`` / ``--baseline`` in ``bench.run``).
+"""
+
+import json
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+# Changes smaller than this are reported as noise
+NOISE_THRESHOLD = 0.05
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+class LatencyRecorder:
+    """Collect per-operation latencies and the scenario's wall time."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors = 0
+        self.notes: Dict[str, Any] = {}
+        self._started: Optional[float] = None
+        self._wall: float = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        if self._started is not None:
+            self._wall += time.perf_counter() - self._started
+            self._started = None
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        self.samples.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """Time the enclosed block; an exception counts as an error and propagates."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(time.perf_counter() - start, ok=False)
+            raise
+        self.record(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.samples)
+        wall = self._wall
+        return {
+            "scenario": self.name,
+            "count": count,
+            "errors": self.errors,
+            "wall_seconds": round(wall, 3),
+            "throughput": round(count / wall, 1) if wall else 0.0,
+            "mean_ms": round(statistics.mean(self.samples) * 1000, 2) if count else 0.0,
+            "p50_ms": round(percentile(self.samples, 0.50) * 1000, 2),
+            "p90_ms": round(percentile(self.samples, 0.90) * 1000, 2),
+            "p99_ms": round(percentile(self.samples, 0.99) * 1000, 2),
+            "max_ms": round(max(self.samples) * 1000, 2) if count else 0.0,
+            **self.notes,
+        }
+
+
+COLUMNS = ("scenario", "count", "errors", "wall_seconds", "throughput", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    measured = [r for r in results if not r.get("skipped")]
+    rows = [[str(r.get(col, "")) for col in COLUMNS] for r in measured]
+    widths = [max(len(col), *(len(row[i]) for row in rows)) for i, col in enumerate(COLUMNS)]
+    lines = ["  ".join(col.ljust(w) for col, w in zip(COLUMNS, widths))]
+    lines += ["  ".join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows]
+    for r in measured:
+        extra = {k: v for k, v in r.items() if k not in COLUMNS and k != "mean_ms"}
+        if extra:
+            lines.append(f"  {r['scenario']}: " + ", ".join(f"{k}={v}" for k, v in extra.items()))
+    lines += [f"{r['scenario']}: skipped, {r['skipped']}" for r in results if r.get("skipped")]
+    return "\n".join(lines)
+
+
+def _change(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return (current - previous) / previous
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> str:
+    """Describe throughput and p99 changes against a saved report."""
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    lines = [f"vs baseline from {baseline.get('created_at', 'unknown')}:"]
+    for r in results:
+        old = previous.get(r["scenario"])
+        if old is None or r.get("skipped") or old.get("skipped"):
+            lines.append(f"  {r['scenario']}: no comparable baseline")
+            continue
+        parts = []
+        # Higher throughput is better, lower p99 is better
+        for key, better_if_higher in (("throughput", True), ("p99_ms", False)):
+            delta = _change(r.get(key, 0), old.get(key, 0))
+            if delta is None:
+                continue
+            verdict = "~"
+            if abs(delta) >= NOISE_THRESHOLD:
+                verdict = "better" if (delta > 0) == better_if_higher else "worse"
+            parts.append(f"{key} {old.get(key)} -> {r.get(key)} ({delta:+.0%}, {verdict})")
+        lines.append(f"  {r['scenario']}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+def write_json(path: str, results: List[Dict[str, Any]], config: Dict[str, Any]) -> None:
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as handle:
+        json.dump(report, handle, indent=2, default=str)
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path) as handle:
+        return json.load(handle)
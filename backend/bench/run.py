@@ -0,0 +1,724 @@
+"""
+Benchmark and load-test scenarios against local upstream stand-ins.
+
+Starts :mod:`bench.mock_servers` (Relay, Alchemy and JSON-RPC) in its own
+process, then runs the selected scenarios:
+
+HTTP scenarios, against the app served by uvicorn in a separate process:
+
+* ``quote_storm``   concurrent ``GET /quote``
+* ``quote_unsupported`` concurrent ``GET /quote`` for a token Relay rejects
+* ``balances``      concurrent ``GET /balances/{wallet}`` (Relay + Alchemy)
+* ``balances_usd``  the same with ``?usd=true`` (adds batched price lookups)
+* ``swap_create``   concurrent ``POST /swap`` (needs MongoDB)
+* ``history``       concurrent ``GET /history`` (needs MongoDB)
+* ``ws_clients``    5k ``/ws/swaps/{id}`` clients and Redis fan-out (needs Redis)
+* ``ws_stream``     1k ``/ws/stream`` clients on 20 swaps each, batched frames (needs Redis)
+
+In-process scenarios, against mongomock/fakeredis or ``--mongo-url``/``--redis-url``:
+
+* ``tracked_swaps`` 10k tracked swaps polled through ``poll_swap_status``
+  until Relay reports them final
+* ``dca_rehydrate`` registering 50k DCA jobs in the scheduler job store
+* ``dca_tick``      one engine tick over 50k due DCA jobs
+* ``rebalance_plan`` rebalance plans for 10k random baskets in batches of
+  1000, against planning them one basket at a time
+* ``quotes_best``   aggregated quotes from Relay and the in-process mock
+  provider, waiting for both and keeping the larger output
+* ``quotes_hedge``  the same quotes, returning the first usable answer
+
+Scenarios whose backing service is unreachable are reported as skipped.
+With ``--mongo-url`` the in-process scenarios write to the ``medusa``
+database; documents they seed are marked and removed afterwards, but use a
+scratch mongod.
+
+Usage (from ``backend``)::
+
+    python -m bench.run                                # everything, default sizes
+    python -m bench.run quote_storm tracked_swaps --scale 0.1
+    python -m bench.run --latency 0.1 --error-rate 0.02 --json after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, WSMsgType
+
+from bench import backends, report
+from bench.mock_servers import serve as serve_mocks
+
+logger = logging.getLogger("bench")
+
+USER = "0x" + "1" * 40
+DEFAULT_MONGO_URL = "mongodb://localhost:27017"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+# Chains and tokens present in fixtures/relay_chains.json
+DCA_ROUTES = {1: ["ETH", "APE", "ANIME", "USDT"], 8453: ["ETH", "WETH"], 42161: ["WETH"]}
+DCA_BASKETS = 200
+BENCH_MARKER = {"bench": True}
+
+
+def serve_app(port: int, env: Dict[str, str]) -> None:
+    """Run the API with uvicorn after applying ``env`` (process target)."""
+    os.environ.update(env)
+    os.environ.setdefault("DB_VALIDATION_ON_STARTUP", "false")
+
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def _app_env(args: argparse.Namespace, relay: str) -> Dict[str, str]:
+    env = {
+        "RELAY_BASE_URL": relay,
+        "ALCHEMY_BASE_URL": f"{relay}/alchemy",
+        "ALCHEMY_API_KEY": "bench",
+        "PRICES_BASE_URL": f"{relay}/prices",
+        "MONGO_URL": args.mongo_url or DEFAULT_MONGO_URL,
+        "REDIS_URL": args.redis_url or DEFAULT_REDIS_URL,
+        # Let the upstream pool hold a whole burst so the handlers are measured
+        "HTTP_POOL_LIMIT": str(max(args.concurrency, 100)),
+        "HTTP_POOL_LIMIT_PER_HOST": str(max(args.concurrency, 50)),
+    }
+    return env
+
+
+async def _wait_ready(session: ClientSession, url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as resp:
+                await resp.read()
+                return
+        except ClientError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def _fire(
+    recorder: report.LatencyRecorder,
+    count: int,
+    concurrency: int,
+    request: Callable[[int], Any],
+) -> None:
+    """Run ``request(i)`` ``count`` times with at most ``concurrency`` in flight."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with sem:
+            start = time.perf_counter()
+            try:
+                ok = await request(i)
+            except (ClientError, asyncio.TimeoutError):
+                ok = False
+            recorder.record(time.perf_counter() - start, ok)
+
+    recorder.start()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    recorder.stop()
+
+
+def _status_ok(session: ClientSession, method: str, url: str, **kwargs) -> Callable[[], Any]:
+    async def call() -> bool:
+        async with session.request(method, url, **kwargs) as resp:
+            await resp.read()
+            return resp.status < 400
+    return call
+
+
+# -- HTTP scenarios ------------------------------------------------------
+
+
+async def quote_storm(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    recorder = report.LatencyRecorder("quote_storm")
+    url = (
+        f"{base}/quote?source_chain=1&destination_chain=8453&token_in=USDC"
+        f"&token_out=ETH&amount=1000000&user_address={USER}"
+    )
+    await _status_ok(session, "GET", url)()
+    await _fire(recorder, count, args.concurrency, lambda i: _status_ok(session, "GET", url)())
+    return recorder
+
+
+async def quote_unsupported(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    recorder = report.LatencyRecorder("quote_unsupported")
+    url = (
+        f"{base}/quote?source_chain=1&destination_chain=8453&token_in=0x{'e' * 40}"
+        f"&token_out=ETH&amount=1000000&user_address={USER}"
+    )
+
+    async def rejected(_: int) -> bool:
+        async with session.get(url) as response:
+            body = await response.json()
+            # The first wave reaches Relay before the rejection is recorded
+            return body.get("status") == "error"
+
+    await _fire(recorder, count, args.concurrency, rejected)
+    async with session.get(f"{base}/metrics/routes") as response:
+        recorder.notes["route_index"] = await response.json()
+    return recorder
+
+
+async def balances(session: ClientSession, base: str, args: argparse.Namespace, count: int, usd: bool = False):
+    recorder = report.LatencyRecorder("balances_usd" if usd else "balances")
+    url = f"{base}/balances/{USER}" + ("?usd=true" if usd else "")
+    await _status_ok(session, "GET", url)()
+    await _fire(recorder, count, args.concurrency, lambda i: _status_ok(session, "GET", url)())
+    return recorder
+
+
+async def balances_usd(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    return await balances(session, base, args, count, usd=True)
+
+
+async def swap_create(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    recorder = report.LatencyRecorder("swap_create")
+    body = {
+        "user": USER,
+        "receiver": USER,
+        "source_chain": "1",
+        "destination_chain": "8453",
+        "token_in": "USDC",
+        "token_out": "ETH",
+        "amount": "1000000",
+    }
+    await _fire(
+        recorder, count, args.concurrency,
+        lambda i: _status_ok(session, "POST", f"{base}/swap", json=body)(),
+    )
+    return recorder
+
+
+async def history(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    recorder = report.LatencyRecorder("history")
+    users = [f"0x{i:040x}" for i in range(1, 51)]
+    await _fire(
+        recorder, count, args.concurrency,
+        lambda i: _status_ok(session, "GET", f"{base}/history", params={"user": users[i % len(users)]})(),
+    )
+    return recorder
+
+
+async def ws_clients(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    """Connect ``count`` clients over 100 swaps and time one published update to each."""
+    import redis
+
+    recorder = report.LatencyRecorder("ws_clients")
+    swap_ids = [f"bench{i:04d}" for i in range(100)]
+    ws_base = base.replace("http://", "ws://")
+    sockets = []
+    connect_times: List[float] = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def connect(i: int) -> None:
+        async with sem:
+            start = time.perf_counter()
+            try:
+                ws = await session.ws_connect(f"{ws_base}/ws/swaps/{swap_ids[i % len(swap_ids)]}")
+            except (ClientError, asyncio.TimeoutError):
+                recorder.errors += 1
+                return
+            connect_times.append(time.perf_counter() - start)
+            sockets.append(ws)
+
+    await asyncio.gather(*(connect(i) for i in range(count)))
+    # Give every handler time to subscribe before publishing
+    await asyncio.sleep(2)
+
+    client = redis.Redis.from_url(args.redis_url or DEFAULT_REDIS_URL)
+    published = time.perf_counter()
+
+    async def receive(ws) -> None:
+        try:
+            msg = await ws.receive(timeout=30)
+            recorder.record(time.perf_counter() - published, msg.type == WSMsgType.TEXT)
+        except asyncio.TimeoutError:
+            recorder.record(time.perf_counter() - published, False)
+
+    waiters = [asyncio.create_task(receive(ws)) for ws in sockets]
+    recorder.start()
+    for swap_id in swap_ids:
+        client.publish(f"swap:{swap_id}", json.dumps({"swap_id": swap_id, "status": "success"}))
+    await asyncio.gather(*waiters)
+    recorder.stop()
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    recorder.notes.update({
+        "connected": len(sockets),
+        "connect_p50_ms": round(report.percentile(connect_times, 0.5) * 1000, 2),
+        "connect_p99_ms": round(report.percentile(connect_times, 0.99) * 1000, 2),
+    })
+    return recorder
+
+
+async def ws_stream(session: ClientSession, base: str, args: argparse.Namespace, count: int):
+    """``count`` ``/ws/stream`` clients following 20 of 100 swaps each; three rapid updates per swap."""
+    import redis
+
+    recorder = report.LatencyRecorder("ws_stream")
+    swap_ids = [f"bench{i:04d}" for i in range(100)]
+    ws_base = base.replace("http://", "ws://")
+    sockets = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def connect(i: int) -> None:
+        async with sem:
+            try:
+                ws = await session.ws_connect(f"{ws_base}/ws/stream")
+                await ws.send_json({"action": "subscribe", "swaps": [swap_ids[(i + k) % 100] for k in range(20)]})
+                await ws.receive(timeout=30)
+            except (ClientError, asyncio.TimeoutError):
+                recorder.errors += 1
+                return
+            sockets.append(ws)
+
+    await asyncio.gather(*(connect(i) for i in range(count)))
+    await asyncio.sleep(1)
+
+    client = redis.Redis.from_url(args.redis_url or DEFAULT_REDIS_URL)
+    frames = updates = 0
+    published = time.perf_counter()
+
+    async def receive(ws) -> None:
+        nonlocal frames, updates
+        final: set = set()
+        while len(final) < 20:
+            try:
+                msg = await ws.receive(timeout=30)
+            except asyncio.TimeoutError:
+                recorder.record(time.perf_counter() - published, False)
+                return
+            if msg.type != WSMsgType.TEXT:
+                recorder.record(time.perf_counter() - published, False)
+                return
+            batch = json.loads(msg.data).get("updates", [])
+            frames += 1
+            updates += len(batch)
+            final.update(u["swap_id"] for u in batch if u.get("final"))
+        recorder.record(time.perf_counter() - published, True)
+
+    waiters = [asyncio.create_task(receive(ws)) for ws in sockets]
+    recorder.start()
+    pipe = client.pipeline(transaction=False)
+    for status in ("pending", "submitted", "success"):
+        for swap_id in swap_ids:
+            payload = {"swap_id": swap_id, "status": status}
+            if status == "success":
+                payload["final"] = True
+            pipe.publish(f"swap:{swap_id}", json.dumps(payload))
+    pipe.execute()
+    await asyncio.gather(*waiters)
+    recorder.stop()
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    # Without batching each client would get 60 frames (20 swaps x 3 updates)
+    recorder.notes.update({
+        "connected": len(sockets),
+        "frames_per_client": round(frames / max(len(sockets), 1), 1),
+        "updates_per_client": round(updates / max(len(sockets), 1), 1),
+    })
+    return recorder
+
+
+HTTP_SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "quote_storm": {"run": quote_storm, "count": 2000, "needs": ()},
+    "quote_unsupported": {"run": quote_unsupported, "count": 2000, "needs": ()},
+    "balances": {"run": balances, "count": 500, "needs": ()},
+    "balances_usd": {"run": balances_usd, "count": 500, "needs": ()},
+    "swap_create": {"run": swap_create, "count": 1000, "needs": ("mongo",)},
+    "history": {"run": history, "count": 2000, "needs": ("mongo",)},
+    "ws_clients": {"run": ws_clients, "count": 5000, "needs": ("redis",)},
+    "ws_stream": {"run": ws_stream, "count": 1000, "needs": ("redis",)},
+}
+
+
+async def run_http(names: List[str], args: argparse.Namespace, port: int) -> List[Any]:
+    base = f"http://127.0.0.1:{port}"
+    results = []
+    timeout = ClientTimeout(total=120)
+    async with ClientSession(connector=TCPConnector(limit=0), timeout=timeout) as session:
+        await _wait_ready(session, f"{base}/")
+        for name in names:
+            spec = HTTP_SCENARIOS[name]
+            logger.info("running %s", name)
+            results.append(await spec["run"](session, base, args, _scaled(spec["count"], args)))
+    return results
+
+
+# -- In-process scenarios ------------------------------------------------
+
+
+def tracked_swaps(args: argparse.Namespace, relay: str, count: int) -> report.LatencyRecorder:
+    """Poll ``count`` tracked swaps until Relay reports each one final."""
+    from bson import ObjectId
+
+    import app.main as main
+    from app.db.db import db
+
+    recorder = report.LatencyRecorder("tracked_swaps")
+    # Jobs are not registered with the scheduler here; nothing to remove
+    main.scheduler = None
+    docs = [
+        {
+            **BENCH_MARKER,
+            "swap_id": str(ObjectId()),
+            "endpoint": f"{relay}/intents/status?requestId=0x{i:064x}",
+            "status": "pending",
+            "poll_count": 0,
+            "completed_at": None,
+        }
+        for i in range(count)
+    ]
+    db.swap_metrics.insert_many(docs)
+    pending = [(str(doc["_id"]), doc["endpoint"]) for doc in docs]
+
+    def poll(job) -> None:
+        start = time.perf_counter()
+        main.poll_swap_status(*job)
+        recorder.record(time.perf_counter() - start)
+
+    rounds = 0
+    recorder.start()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        while pending and rounds < 12:
+            rounds += 1
+            list(pool.map(poll, pending))
+            ids = [ObjectId(metric_id) for metric_id, _ in pending]
+            done = {
+                str(d["_id"])
+                for d in db.swap_metrics.find({"_id": {"$in": ids}, "completed_at": {"$ne": None}}, {"_id": 1})
+            }
+            pending = [job for job in pending if job[0] not in done]
+    recorder.stop()
+    final = db.swap_metrics.count_documents({**BENCH_MARKER, "completed_at": {"$ne": None}})
+    recorder.errors += count - final
+    recorder.notes.update({"swaps": count, "rounds": rounds, "workers": args.workers})
+    db.swap_metrics.delete_many(BENCH_MARKER)
+    return recorder
+
+
+def _seed_dca_jobs(count: int) -> List[Any]:
+    from app.db.db import db
+
+    rng = random.Random(7)
+    baskets = []
+    for i in range(DCA_BASKETS):
+        chain = list(DCA_ROUTES)[i % len(DCA_ROUTES)]
+        coins = rng.sample(DCA_ROUTES[chain], k=min(2, len(DCA_ROUTES[chain])))
+        weight = 100 / len(coins)
+        baskets.append({
+            **BENCH_MARKER,
+            "chain": chain,
+            "coins": [{"symbol": s, "weight": weight} for s in coins],
+        })
+    db.baskets.insert_many(baskets)
+    jobs = []
+    for i in range(count):
+        basket = baskets[i % len(baskets)]
+        jobs.append({
+            **BENCH_MARKER,
+            "user": f"0x{i + 1:040x}",
+            "basket_id": basket["_id"],
+            "src_chain": basket["chain"],
+            "dst_chain": basket["chain"],
+            "token_in": "USDC",
+            "budget_per_tick": 10,
+            "cron": "*/5 * * * *",
+            "status": "active",
+        })
+    db.dca_jobs.insert_many(jobs)
+    return [job["_id"] for job in jobs]
+
+
+def _cleanup_dca(job_ids: List[Any]) -> None:
+    from app.db.db import db
+
+    str_ids = [str(i) for i in job_ids]
+    db.events.delete_many({"type": "dca_tick", "job_id": {"$in": str_ids}})
+    db.apscheduler_jobs.delete_many({"_id": {"$in": [f"dca_{i}" for i in str_ids]}})
+    db.dca_jobs.delete_many(BENCH_MARKER)
+    db.baskets.delete_many(BENCH_MARKER)
+
+
+def dca_jobs(args: argparse.Namespace, relay: str, count: int) -> List[report.LatencyRecorder]:
+    """Register ``count`` DCA jobs, then run one tick with all of them due."""
+    from app.core import dca_engine
+    from app.db.db import db, scheduler
+    from app.medusa_core.relay import get_quote
+    from app.schedulers.scheduler import rehydrate_on_startup
+
+    job_ids = _seed_dca_jobs(count)
+    try:
+        rehydrate = report.LatencyRecorder("dca_rehydrate")
+        scheduler.start(paused=True)
+        rehydrate.start()
+        with rehydrate.measure():
+            rehydrate_on_startup(dca_engine.enqueue_due_job)
+        rehydrate.stop()
+        registered = db.apscheduler_jobs.count_documents({"_id": {"$regex": "^dca_"}})
+        rehydrate.notes.update({
+            "jobs": count,
+            "registered": registered,
+            "jobs_per_second": round(count / rehydrate.samples[0], 1),
+        })
+        scheduler.shutdown(wait=False)
+
+        tick = report.LatencyRecorder("dca_tick")
+
+        def timed_quote(params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            start = time.perf_counter()
+            quote = get_quote(params)
+            tick.record(time.perf_counter() - start, quote is not None)
+            return quote
+
+        for job_id in job_ids:
+            dca_engine.enqueue_due_job(str(job_id))
+        engine = dca_engine.DcaEngine(quote_fn=timed_quote)
+        tick.start()
+        summary = asyncio.run(engine.run(dca_engine._drain_due()))
+        tick.stop()
+        tick.notes.update({
+            "jobs": summary["jobs"],
+            "routes": summary["routes"],
+            "jobs_per_second": round(summary["jobs"] / summary["latency"], 1),
+        })
+        return [rehydrate, tick]
+    finally:
+        _cleanup_dca(job_ids)
+
+
+def provider_quotes(args: argparse.Namespace, relay: str, count: int) -> List[report.LatencyRecorder]:
+    """Aggregate ``count`` quotes across Relay and the mock provider, per policy.
+
+    The mock quotes 0.1% more than the Relay stand-in, so "best" picks it
+    whenever it answers in time; "hedge" goes with whichever provider has
+    been answering faster.
+    """
+    from app.medusa_core import resolve_balance
+    from app.medusa_core.http import close_session
+
+    resolve_balance.MOCK_PROVIDER_ENABLED = True
+    resolve_balance.MOCK_PROVIDER_RATE = 295_000_000 * 1.001
+    resolve_balance.MOCK_PROVIDER_LATENCY = args.latency * 1.5
+    resolve_balance.MOCK_PROVIDER_JITTER = args.jitter
+    resolve_balance.MOCK_PROVIDER_ERROR_RATE = args.error_rate
+    registry = resolve_balance.Providers()
+    params = {
+        "originChainId": 1,
+        "destinationChainId": 8453,
+        "inputToken": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48",
+        "outputToken": "0x0000000000000000000000000000000000000000",
+        "inputAmount": "1000000",
+        "user": USER,
+        "receiver": USER,
+        "tradeType": "EXACT_INPUT",
+    }
+
+    async def run_policy(policy: str) -> report.LatencyRecorder:
+        recorder = report.LatencyRecorder(f"quotes_{policy}")
+        winners: Dict[str, int] = {}
+
+        async def one(_: int) -> bool:
+            result = await registry.quote(params, policy=policy)
+            winner = result["provider"] or "none"
+            winners[winner] = winners.get(winner, 0) + 1
+            return result["quote"] is not None
+
+        await _fire(recorder, count, args.concurrency, one)
+        recorder.notes["winners"] = winners
+        return recorder
+
+    async def run_all() -> List[report.LatencyRecorder]:
+        try:
+            return [await run_policy("best"), await run_policy("hedge")]
+        finally:
+            await close_session()
+
+    recorders = asyncio.run(run_all())
+    recorders[-1].notes["providers"] = registry.quote_stats()
+    return recorders
+
+
+REBALANCE_BATCH = 1000
+
+
+def rebalance_plan(args: argparse.Namespace, relay: str, count: int) -> report.LatencyRecorder:
+    """Plan ``count`` random baskets, ``REBALANCE_BATCH`` per call."""
+    from app.core.rebalance import plan_rebalances
+
+    rng = random.Random(args.seed)
+    universe = [f"TKN{i}" for i in range(40)]
+    prices = {symbol: rng.uniform(0.01, 5000) for symbol in universe}
+    baskets, holdings = [], []
+    for _ in range(count):
+        coins = rng.sample(universe, rng.randint(3, 8))
+        baskets.append({"coins": [{"symbol": c, "weight": rng.uniform(1, 10)} for c in coins]})
+        holdings.append({c: rng.uniform(0, 10_000) / prices[c] for c in coins if rng.random() < 0.8})
+    cash = [rng.uniform(0, 500) for _ in range(count)]
+
+    recorder = report.LatencyRecorder("rebalance_plan")
+    trades = 0
+    recorder.start()
+    for i in range(0, count, REBALANCE_BATCH):
+        with recorder.measure():
+            plans = plan_rebalances(
+                baskets[i:i + REBALANCE_BATCH], holdings[i:i + REBALANCE_BATCH], prices, cash[i:i + REBALANCE_BATCH]
+            )
+        trades += sum(len(plan["trades"]) for plan in plans)
+    recorder.stop()
+
+    sample = min(count, REBALANCE_BATCH)
+    start = time.perf_counter()
+    for i in range(sample):
+        plan_rebalances([baskets[i]], [holdings[i]], prices, [cash[i]])
+    one_at_a_time = (time.perf_counter() - start) / sample
+    batched = sum(recorder.samples) / count
+    recorder.notes.update({
+        "baskets": count,
+        "trades": trades,
+        "baskets_per_second": round(1 / batched, 1),
+        "speedup_vs_single": round(one_at_a_time / batched, 1),
+    })
+    return recorder
+
+
+INPROCESS_SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "tracked_swaps": {"run": tracked_swaps, "count": 10_000},
+    "dca_rehydrate": {"run": dca_jobs, "count": 50_000},
+    "dca_tick": {"run": dca_jobs, "count": 50_000},
+    "rebalance_plan": {"run": rebalance_plan, "count": 10_000},
+    "quotes_best": {"run": provider_quotes, "count": 2000},
+    "quotes_hedge": {"run": provider_quotes, "count": 2000},
+}
+ALL_SCENARIOS = list(HTTP_SCENARIOS) + list(INPROCESS_SCENARIOS)
+
+
+def _scaled(count: int, args: argparse.Namespace) -> int:
+    return max(1, int(count * args.scale))
+
+
+def run_inprocess(names: List[str], args: argparse.Namespace, relay: str) -> List[Any]:
+    os.environ.update({"RELAY_BASE_URL": relay, "DB_VALIDATION_ON_STARTUP": "false"})
+    chosen = backends.configure(args.mongo_url, args.redis_url)
+    logger.info("in-process backends: %s", chosen)
+    results: List[Any] = []
+    seen = set()
+    for name in names:
+        spec = INPROCESS_SCENARIOS[name]
+        if spec["run"] in seen:
+            continue
+        seen.add(spec["run"])
+        logger.info("running %s", name)
+        out = spec["run"](args, relay, _scaled(spec["count"], args))
+        for recorder in out if isinstance(out, list) else [out]:
+            if recorder.name in names:
+                recorder.notes["backends"] = "/".join(chosen.values())
+                results.append(recorder)
+    return results
+
+
+async def _wait_mocks(relay: str) -> None:
+    async with ClientSession() as session:
+        await _wait_ready(session, f"{relay}/health")
+
+
+def _unavailable(needs, args: argparse.Namespace) -> Optional[str]:
+    if "mongo" in needs and not backends.mongo_reachable(args.mongo_url or DEFAULT_MONGO_URL):
+        return "MongoDB unreachable (pass --mongo-url)"
+    if "redis" in needs and not backends.redis_reachable(args.redis_url or DEFAULT_REDIS_URL):
+        return "Redis unreachable (pass --redis-url)"
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0], formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"one or more of {', '.join(ALL_SCENARIOS)} (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario size")
+    parser.add_argument("--concurrency", type=int, default=200, help="in-flight HTTP requests")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SCHEDULER_WORKERS", "4")),
+                        help="threads running swap polls (SCHEDULER_WORKERS)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock upstream latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="+/- latency jitter (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream calls failing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", default=None, help="local mongod (default: mongomock in-process)")
+    parser.add_argument("--redis-url", default=None, help="local Redis (default: fakeredis in-process)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mock-port", type=int, default=8766)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written by --json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    names = args.scenarios or ALL_SCENARIOS
+    unknown = set(names) - set(ALL_SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    relay = f"http://127.0.0.1:{args.mock_port}"
+    results: List[Dict[str, Any]] = []
+    # Spawn, not fork: children must not inherit in-process backend patches
+    ctx = multiprocessing.get_context("spawn")
+    mocks = ctx.Process(
+        target=serve_mocks,
+        args=(args.mock_port, args.latency, args.jitter, args.error_rate, args.seed),
+        daemon=True,
+    )
+
+    http_names, skipped = [], {}
+    for name in names:
+        if name in HTTP_SCENARIOS:
+            reason = _unavailable(HTTP_SCENARIOS[name]["needs"], args)
+            if reason:
+                skipped[name] = reason
+            else:
+                http_names.append(name)
+    mocks.start()
+
+    try:
+        asyncio.run(_wait_mocks(relay))
+        recorders = []
+        if http_names:
+            app_proc = ctx.Process(target=serve_app, args=(args.port, _app_env(args, relay)), daemon=True)
+            app_proc.start()
+            try:
+                recorders += asyncio.run(run_http(http_names, args, args.port))
+            finally:
+                # Keep the app from competing with in-process scenarios for CPU
+                app_proc.terminate()
+                app_proc.join(5)
+        inprocess = [n for n in names if n in INPROCESS_SCENARIOS]
+        if inprocess:
+            recorders += run_inprocess(inprocess, args, relay)
+        by_name = {r.name: r.summary() for r in recorders}
+        for name in names:
+            if name in by_name:
+                results.append(by_name[name])
+            elif name in skipped:
+                results.append({"scenario": name, "skipped": skipped[name]})
+    finally:
+        mocks.terminate()
+        mocks.join(5)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("json_path", "baseline")}
+    print(report.format_report(results))
+    if args.baseline:
+        print(report.compare(results, report.load_json(args.baseline)))
+    if args.json_path:
+        report.write_json(args.json_path, results, config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())